@@ -8,6 +8,8 @@ const LAUNCH_DATE = new Date('2025-05-27').getTime() / 1000;
 const SNAPSHOT_DEADLINE = LAUNCH_DATE + (24 * 60 * 60);
 const BOX_CURRENT_SHEET = 'box_current';
 const BOX_DAILY_SHEET = 'box_daily';
+// 마지막으로 반영한 업로드 버전 (델타 업로드 기준 확인용)
+const UPLOAD_VERSION_PROPERTY = 'UPLOAD_VERSION';
 
 // ==================== Web App 엔드포인트 ====================
 
@@ -25,10 +27,10 @@ function doPost(e) {
       logSheet.getRange(1, 1, 1, 5).setFontWeight('bold');
     }
 
-    // JSON 데이터 파싱
+    // JSON 데이터 파싱 (압축 봉투면 해제)
     let postData;
     try {
-      postData = JSON.parse(e.postData.contents);
+      postData = decodeUploadBody(e.postData.contents);
     } catch (parseError) {
       console.error('❌ JSON 파싱 실패:', parseError);
       // 🆕 에러도 로그에 기록
@@ -51,6 +53,16 @@ function doPost(e) {
       return processBoxSync(postData);
     }
 
+    // 🆕 청크 업로드 (세션 단위, 순서 무관)
+    if (postData.is_chunk) {
+      return processChunkData(postData);
+    }
+
+    // 🆕 델타 업로드 (변경분만)
+    if (postData.delta) {
+      return processDeltaUpload(postData, logSheet);
+    }
+
     // 🆕 업데이트 모드 확인
     const updateMode = postData.mode || 'full';  // 기본값: full
     console.log(`📊 업데이트 모드: ${updateMode}`);
@@ -154,6 +166,9 @@ function doPost(e) {
     }
     console.log(`✅ ${updateMode} 모드 처리 완료`);
 
+    // 🆕 전체 데이터 반영 후 기준 버전 기록 (버전 없는 업로드면 초기화 → 다음 델타는 재동기화)
+    setUploadVersion(postData.version || '');
+
     // 결과 변수 준비
     let processedRows = 0;
     if (updateMode === 'incremental') {
@@ -186,6 +201,24 @@ function doPost(e) {
   }
 }
 
+// 업로드 본문 디코딩
+// 압축 전송(UPLOAD_COMPRESSION=gzip) 시 본문은 다음 봉투이며, 그 외에는 요청 JSON 그대로다.
+//   { encoding: 'gzip+base64', raw_size: 압축 전 바이트 수, payload: base64(gzip(UTF-8 JSON)) }
+// 해제한 JSON은 일반 요청과 같은 형식 (mode/data, delta, is_chunk 등)
+function decodeUploadBody(contents) {
+  const body = JSON.parse(contents);
+  if (!body || body.encoding === undefined) {
+    return body;
+  }
+  if (body.encoding !== 'gzip+base64') {
+    throw new Error(`지원하지 않는 인코딩: ${body.encoding}`);
+  }
+  const bytes = Utilities.base64Decode(body.payload);
+  const json = Utilities.ungzip(Utilities.newBlob(bytes, 'application/x-gzip')).getDataAsString('UTF-8');
+  console.log(`📦 압축 해제: ${contents.length} → ${body.raw_size}바이트`);
+  return JSON.parse(json);
+}
+
 function doGet(e) {
   try {
     console.log('📤 GET 요청 받음');
@@ -756,6 +789,170 @@ function updateLiveSheet(dataArray) {
   }
 }
 
+// ==================== 델타 업로드 ====================
+// 요청: { delta: true, mode, base_version, version, total_rows,
+//         inserted: [행...], changed: [{address, 바뀐 필드...}], removed: [address...] }
+// 응답: status 'success' | 'resync' (expected_version = 현재 기준) | 'error'
+
+function getUploadVersion() {
+  return PropertiesService.getScriptProperties().getProperty(UPLOAD_VERSION_PROPERTY) || '';
+}
+
+function setUploadVersion(version) {
+  PropertiesService.getScriptProperties().setProperty(UPLOAD_VERSION_PROPERTY, version);
+}
+
+function processDeltaUpload(postData, logSheet) {
+  const lock = LockService.getScriptLock();
+  lock.waitLock(30000);
+  try {
+    const currentVersion = getUploadVersion();
+    if (!currentVersion || currentVersion !== postData.base_version) {
+      logSheet.appendRow([new Date(), postData.mode || 'delta', 0, '델타 기준 불일치',
+        `현재 ${currentVersion || '(없음)'} / 요청 ${postData.base_version}`]);
+      return ContentService
+        .createTextOutput(JSON.stringify({
+          status: 'resync',
+          expected_version: currentVersion,
+          timestamp: new Date().toISOString()
+        }))
+        .setMimeType(ContentService.MimeType.JSON);
+    }
+
+    const result = applyDeltaToSheet(getLiveSheet(), postData);
+    const touched = postData.inserted.map(item => item.address)
+      .concat(postData.changed.map(item => item.address));
+    const enhanceResult = processIncrementalEnhancement(result.targetSheet, touched);
+    setUploadVersion(postData.version);
+
+    logSheet.appendRow([new Date(), postData.mode || 'delta', touched.length + postData.removed.length,
+      '델타 반영 완료',
+      `추가 ${result.insertedRows} / 변경 ${result.changedRows} / 삭제 ${result.removedRows}`]);
+
+    return ContentService
+      .createTextOutput(JSON.stringify({
+        status: 'success',
+        message: 'STAKE 델타 반영 완료',
+        mode: postData.mode,
+        version: postData.version,
+        inserted: result.insertedRows,
+        changed: result.changedRows,
+        removed: result.removedRows,
+        enhanced_columns: enhanceResult.processedRows || 0,
+        timestamp: new Date().toISOString()
+      }))
+      .setMimeType(ContentService.MimeType.JSON);
+
+  } catch (error) {
+    console.error('❌ 델타 반영 실패:', error);
+    logSheet.appendRow([new Date(), postData.mode || 'delta', 0, '델타 반영 에러', error.toString()]);
+    return ContentService
+      .createTextOutput(JSON.stringify({
+        status: 'error',
+        message: error.toString(),
+        timestamp: new Date().toISOString()
+      }))
+      .setMimeType(ContentService.MimeType.JSON);
+  } finally {
+    lock.releaseLock();
+  }
+}
+
+function applyDeltaToSheet(sheet, delta) {
+  const lastRow = sheet.getLastRow();
+  const headers = sheet.getRange(1, 1, 1, sheet.getLastColumn()).getValues()[0];
+  const addressCol = headers.indexOf('address') + 1;
+  const addresses = lastRow > 1
+    ? sheet.getRange(2, addressCol, lastRow - 1, 1).getValues().map(row => row[0])
+    : [];
+  const rowIndex = new Map();
+  addresses.forEach((address, i) => rowIndex.set(address, i));
+
+  // 변경: 필드(열)별로 한 번에 읽고 써서 셀 단위 호출을 피함
+  const patchesByField = {};
+  let changedRows = 0;
+  delta.changed.forEach(patch => {
+    const i = rowIndex.get(patch.address);
+    if (i === undefined) {
+      delta.inserted.push(patch);  // 시트에 없으면 추가로 처리
+      return;
+    }
+    changedRows++;
+    Object.keys(patch).forEach(field => {
+      if (field === 'address' || headers.indexOf(field) < 0) return;
+      (patchesByField[field] = patchesByField[field] || []).push([i, patch[field]]);
+    });
+  });
+  Object.keys(patchesByField).forEach(field => {
+    const range = sheet.getRange(2, headers.indexOf(field) + 1, addresses.length, 1);
+    const values = range.getValues();
+    patchesByField[field].forEach(([i, value]) => { values[i][0] = value === null ? '' : value; });
+    range.setValues(values);
+  });
+
+  // 추가: 마지막 행 다음에 한 번에 기록
+  if (delta.inserted.length > 0) {
+    const newRows = delta.inserted.map(item => headers.map(header =>
+      item[header] === undefined || item[header] === null ? '' : item[header]));
+    sheet.getRange(lastRow + 1, 1, newRows.length, headers.length).setValues(newRows);
+  }
+
+  // 삭제: 아래 행부터 지워 앞 행 번호가 바뀌지 않게 함
+  const removeRows = delta.removed
+    .map(address => rowIndex.get(address))
+    .filter(i => i !== undefined)
+    .sort((a, b) => b - a);
+  removeRows.forEach(i => sheet.deleteRow(i + 2));
+
+  // 시간 파생 열은 델타에 없으므로 as_of 기준으로 전체 행을 다시 계산
+  if (delta.as_of) {
+    recomputeTimeColumns(sheet, delta.as_of, delta.total_phases || 6);
+  }
+
+  return {
+    targetSheet: sheet,
+    insertedRows: delta.inserted.length,
+    changedRows: changedRows,
+    removedRows: removeRows.length
+  };
+}
+
+// 시간 파생 열 재계산 (python-scripts score_wallets와 같은 식)
+// holding_days = (as_of - first_stake_time) / 1일, time_score = total_staked × holding_days,
+// airdrop_share_phase = 활성 지갑 time_score 합 대비 비율(%)
+function recomputeTimeColumns(sheet, asOf, totalPhases) {
+  const rowCount = sheet.getLastRow() - 1;
+  if (rowCount < 1) return;
+  const headers = sheet.getRange(1, 1, 1, sheet.getLastColumn()).getValues()[0];
+  if (['total_staked', 'first_stake_time', 'is_active'].some(name => headers.indexOf(name) < 0)) return;
+  const column = name => sheet.getRange(2, headers.indexOf(name) + 1, rowCount, 1);
+  const readColumn = name => column(name).getValues().map(row => row[0]);
+  const round = (value, digits) => Math.round(value * Math.pow(10, digits)) / Math.pow(10, digits);
+
+  const staked = readColumn('total_staked').map(value => Number(value) || 0);
+  const first = readColumn('first_stake_time').map(value => Number(value) || 0);
+  const active = readColumn('is_active').map(value => value === true || value === 'TRUE' || value === 'true');
+
+  const holdingDays = first.map(time => time > 0 ? (asOf - time) / 86400 : 0);
+  const timeScores = staked.map((amount, i) => amount * holdingDays[i]);
+  const totalTimeScore = timeScores.reduce((sum, score, i) => active[i] && first[i] > 0 ? sum + score : sum, 0);
+  const sharePhase = timeScores.map((score, i) =>
+    active[i] && totalTimeScore > 0 ? score / totalTimeScore * 100 : 0);
+
+  const columns = {
+    holding_days: holdingDays.map(days => round(days, 1)),
+    time_score: timeScores.map(score => round(score, 2)),
+    phase_score: timeScores.map(score => round(score, 2)),
+    total_score_all_phases: timeScores.map(score => round(score, 2)),
+    airdrop_share_phase: sharePhase.map(share => round(share, 6)),
+    airdrop_share_total: sharePhase.map(share => round(share * totalPhases, 6))
+  };
+  Object.keys(columns).forEach(name => {
+    if (headers.indexOf(name) < 0) return;
+    column(name).setValues(columns[name].map(value => [value]));
+  });
+}
+
 // 전체 업데이트: Master 업데이트 후 Live에 복사
 function updateMasterAndLiveSheets(dataArray) {
   try {
@@ -843,7 +1040,7 @@ function updateMasterAndLiveSheets(dataArray) {
 
     return {
       success: true,
-      updatedRows: updateRows.length + newRows.length,
+      updatedRows: newRows.length,
       targetSheet: liveSheet,
       mode: 'incremental'  // 🆕 모드 정보 추가
     };
@@ -1405,118 +1602,202 @@ function generateCompleteJSON() {
 }
 
 // ==================== 청크 처리 함수 ====================
+// 요청: { is_chunk: true, session_id, chunk_number (1부터), total_chunks, mode, version, data: [행...] }
+// 응답: { status: 'success', session_id, chunk_number, received, state, complete }
+// 청크는 순서와 관계없이 동시에 도착할 수 있고, 같은 청크를 다시 보내도 한 번만 반영된다.
+// 모든 청크가 모이면 그 요청에서 전체 데이터를 일반 업로드와 같은 방식으로 처리한다.
+// state: 'receiving' (수신 중) → 'finalizing' (마지막 청크 요청이 전체 처리 중) → 'done'
+// 확인 요청: { is_chunk: true, poll: true, session_id } → { status: 'success', session_id, state, complete }
+//   (마지막 청크 응답을 받지 못한 클라이언트가 처리 완료를 기다릴 때, 세션이 없으면 state: 'missing')
+
+const UPLOAD_STAGING_SHEET = 'upload_staging';
+const UPLOAD_SESSION_PREFIX = 'UPLOAD_SESSION_';
+// 이 시간이 지나도 'finalizing'이면 실행이 중단된 것으로 보고 정리 (Apps Script 실행 한도 6분)
+const UPLOAD_FINALIZE_TIMEOUT_MS = 10 * 60 * 1000;
+
+function getUploadStagingSheet() {
+  const spreadsheet = SpreadsheetApp.openById(SHEET_ID);
+  let sheet = spreadsheet.getSheetByName(UPLOAD_STAGING_SHEET);
+  if (!sheet) {
+    sheet = spreadsheet.insertSheet(UPLOAD_STAGING_SHEET);
+    sheet.getRange(1, 1, 1, 3).setValues([['session_id', 'chunk_number', 'row_json']]);
+  }
+  return sheet;
+}
 
-function processChunkData(chunkData) {
-  try {
-    console.log(`📦 청크 처리: ${chunkData.chunk_number}/${chunkData.total_chunks}`);
-
-    // 첫 번째 청크인 경우 기존 데이터 삭제
-    if (chunkData.chunk_number === 1) {
-      const sheet = getTargetSheet();
-      ensure39ColumnHeaders(sheet);
-
-      // 기존 데이터 삭제 (헤더 제외)
-      const lastRow = sheet.getLastRow();
-      if (lastRow > 1) {
-        sheet.deleteRows(2, lastRow - 1);
-      }
-      console.log('🗑️ 기존 데이터 삭제 완료');
-    }
-
-    // 청크 데이터 추가
-    const result = appendChunkToSheet(chunkData.data);
+function chunkResponse(payload) {
+  return ContentService
+    .createTextOutput(JSON.stringify(Object.assign({ timestamp: new Date().toISOString() }, payload)))
+    .setMimeType(ContentService.MimeType.JSON);
+}
 
-    // 마지막 청크인 경우 전체 처리 수행
-    if (chunkData.chunk_number === chunkData.total_chunks) {
-      console.log('🔄 마지막 청크 - 전체 처리 시작');
+// 스테이징 시트에서 predicate(session_id)가 참인 행 제거
+function removeStagedRows(sheet, predicate) {
+  const lastRow = sheet.getLastRow();
+  if (lastRow < 2) return;
+  const values = sheet.getRange(2, 1, lastRow - 1, 3).getValues();
+  const kept = values.filter(row => !predicate(row[0]));
+  if (kept.length === values.length) return;
+  sheet.getRange(2, 1, lastRow - 1, 3).clearContent();
+  if (kept.length > 0) {
+    sheet.getRange(2, 1, kept.length, 3).setValues(kept);
+  }
+}
 
-      const enhanceResult = updateNewColumnsInBatch(getTargetSheet());
-      generateCompleteJSON();
+// 전체 처리 중인 세션인지 (실행 한도를 넘겨 중단된 세션은 제외)
+function isFinalizingSession(session) {
+  return session && session.state === 'finalizing' &&
+    Date.now() - (session.finalizing_since || 0) < UPLOAD_FINALIZE_TIMEOUT_MS;
+}
 
-      return ContentService
-        .createTextOutput(JSON.stringify({
-          status: 'success',
-          message: '청크 업로드 및 전체 처리 완료',
-          total_chunks: chunkData.total_chunks,
-          enhanced_columns: enhanceResult.processedRows || 0,
-          timestamp: new Date().toISOString()
-        }))
-        .setMimeType(ContentService.MimeType.JSON);
-    } else {
-      return ContentService
-        .createTextOutput(JSON.stringify({
-          status: 'success',
-          message: `청크 ${chunkData.chunk_number} 처리 완료`,
-          chunk_number: chunkData.chunk_number,
-          timestamp: new Date().toISOString()
-        }))
-        .setMimeType(ContentService.MimeType.JSON);
-    }
+function pollChunkSession(sessionId) {
+  const session = JSON.parse(PropertiesService.getScriptProperties().getProperty(UPLOAD_SESSION_PREFIX + sessionId) || 'null');
+  const state = session ? session.state : 'missing';
+  return chunkResponse({
+    status: 'success',
+    session_id: sessionId,
+    state: state,
+    received: session ? session.received.length : 0,
+    complete: state === 'done'
+  });
+}
 
-  } catch (error) {
-    console.error('❌ 청크 처리 실패:', error);
+function processChunkData(chunkData) {
+  const sessionId = chunkData.session_id;
+  const chunkNumber = chunkData.chunk_number;
+  const props = PropertiesService.getScriptProperties();
+  const key = UPLOAD_SESSION_PREFIX + sessionId;
+  const lock = LockService.getScriptLock();
+  let session;
 
-    return ContentService
-      .createTextOutput(JSON.stringify({
-        status: 'error',
-        message: `청크 처리 실패: ${error.toString()}`,
-        chunk_number: chunkData.chunk_number,
-        timestamp: new Date().toISOString()
-      }))
-      .setMimeType(ContentService.MimeType.JSON);
+  if (chunkData.poll && sessionId) {
+    return pollChunkSession(sessionId);
   }
-}
 
-function appendChunkToSheet(chunkDataArray) {
   try {
-    const sheet = getTargetSheet();
+    console.log(`📦 청크 처리: ${chunkNumber}/${chunkData.total_chunks} (세션 ${sessionId})`);
+    if (!sessionId) {
+      throw new Error('session_id 없음');
+    }
 
-    // 🔥 청크 데이터도 Jeeted 처리 적용
-    const processedData = processJeetedAndRanking(chunkDataArray);
+    // 1. 청크 기록 (잠금 안에서 중복 확인 + 스테이징)
+    lock.waitLock(30000);
+    try {
+      session = JSON.parse(props.getProperty(key) || 'null');
+      if (!session) {
+        // 새 세션: 이전 세션의 남은 스테이징/상태 정리 (전체 처리 중인 세션은 끝날 때까지 유지)
+        const allProps = props.getProperties();
+        const keep = [sessionId];
+        Object.keys(allProps).filter(k => k.indexOf(UPLOAD_SESSION_PREFIX) === 0).forEach(k => {
+          if (isFinalizingSession(JSON.parse(allProps[k]))) {
+            keep.push(k.substring(UPLOAD_SESSION_PREFIX.length));
+          } else {
+            props.deleteProperty(k);
+          }
+        });
+        removeStagedRows(getUploadStagingSheet(), id => keep.indexOf(id) < 0);
+        session = { total: chunkData.total_chunks, mode: chunkData.mode || 'full',
+                    version: chunkData.version || '', received: [], state: 'receiving' };
+      }
 
-    const basicHeaders = [
-      'address', 'rank', 'grade', 'grade_emoji', 'percentile',
-      'total_staked', 'time_score', 'holding_days', 'stake_count', 'unstake_count',
-      'is_active', 'current_phase', 'phase_score', 'total_score_all_phases',
-      'airdrop_share_phase', 'airdrop_share_total', 'first_stake_time', 'last_action_time',
-      'rank_change_24h', 'score_change_24h', 'phase_rank_history'
-    ];
+      if (session.received.indexOf(chunkNumber) < 0 && session.state === 'receiving') {
+        const rows = (chunkData.data || []).map(item => [sessionId, chunkNumber, JSON.stringify(item)]);
+        const staging = getUploadStagingSheet();
+        if (rows.length > 0) {
+          staging.getRange(staging.getLastRow() + 1, 1, rows.length, 3).setValues(rows);
+        }
+        session.received.push(chunkNumber);
+      }
 
-    const newRows = [];
-    processedData.forEach(item => {
-      const row = [];
-      basicHeaders.forEach(header => {
-        row.push(item[header] || '');
-      });
-      // 신규 18개 컬럼은 빈값으로 초기화
-      for (let i = 0; i < 18; i++) {
-        row.push('');
+      const complete = session.received.length >= session.total;
+      const finalize = complete && session.state === 'receiving';
+      if (finalize) {
+        session.state = 'finalizing';
+        session.finalizing_since = Date.now();
       }
-      newRows.push(row);
-    });
+      props.setProperty(key, JSON.stringify(session));
 
-    // 현재 마지막 행 다음에 추가
-    const lastRow = sheet.getLastRow();
-    const startRow = lastRow + 1;
+      if (!finalize) {
+        return chunkResponse({
+          status: 'success',
+          session_id: sessionId,
+          chunk_number: chunkNumber,
+          received: session.received.length,
+          state: session.state,
+          complete: session.state === 'done'
+        });
+      }
+    } finally {
+      lock.releaseLock();
+    }
 
-    if (newRows.length > 0) {
-      const range = sheet.getRange(startRow, 1, newRows.length, 39);
-      range.setValues(newRows);
+    // 2. 마지막 청크: 전체 데이터 조립 후 처리 (잠금 밖, 다른 청크 응답을 막지 않음)
+    console.log('🔄 모든 청크 수신 - 전체 처리 시작');
+    const staging = getUploadStagingSheet();
+    const lastRow = staging.getLastRow();
+    const staged = lastRow > 1 ? staging.getRange(2, 1, lastRow - 1, 3).getValues() : [];
+    const dataArray = staged
+      .filter(row => row[0] === sessionId)
+      .map((row, i) => ({ chunk: Number(row[1]), i: i, item: JSON.parse(row[2]) }))
+      .sort((a, b) => a.chunk - b.chunk || a.i - b.i)
+      .map(entry => entry.item);
+
+    let enhancedRows = 0;
+    try {
+      if (session.mode === 'incremental') {
+        const updateResult = updateLiveSheet(dataArray);
+        if (updateResult.success) {
+          enhancedRows = processIncrementalEnhancement(updateResult.targetSheet, updateResult.updatedAddresses).processedRows || 0;
+        }
+      } else {
+        const updateResult = updateMasterAndLiveSheets(dataArray);
+        enhancedRows = updateNewColumnsInBatch(updateResult.targetSheet || getTargetSheet()).processedRows || 0;
+        generateCompleteJSON();
+      }
+    } catch (error) {
+      // 처리 실패 시 수신 상태로 되돌려 같은 청크 재전송으로 다시 시도
+      lock.waitLock(30000);
+      try {
+        session.state = 'receiving';
+        props.setProperty(key, JSON.stringify(session));
+      } finally {
+        lock.releaseLock();
+      }
+      throw error;
     }
 
-    console.log(`✅ 청크 데이터 ${newRows.length}개 행 추가 완료`);
+    lock.waitLock(30000);
+    try {
+      session.state = 'done';
+      props.setProperty(key, JSON.stringify(session));
+      setUploadVersion(session.version || '');
+      removeStagedRows(staging, id => id === sessionId);
+    } finally {
+      lock.releaseLock();
+    }
 
-    return {
-      success: true,
-      addedRows: newRows.length
-    };
+    return chunkResponse({
+      status: 'success',
+      message: '청크 업로드 및 전체 처리 완료',
+      session_id: sessionId,
+      chunk_number: chunkNumber,
+      total_chunks: session.total,
+      received: session.received.length,
+      state: 'done',
+      complete: true,
+      total_rows: dataArray.length,
+      enhanced_columns: enhancedRows
+    });
 
   } catch (error) {
-    console.error('❌ 청크 데이터 추가 실패:', error);
-    return {
-      success: false,
-      error: error.toString()
-    };
+    console.error('❌ 청크 처리 실패:', error);
+
+    return chunkResponse({
+      status: 'error',
+      message: `청크 처리 실패: ${error.toString()}`,
+      session_id: sessionId,
+      chunk_number: chunkNumber
+    });
   }
 }
 
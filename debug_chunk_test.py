@@ -1,5 +1,12 @@
 # 청크 크기 확인 테스트
-import requests
+import os
+import sys
+
+# 공용 RPC 전송 계층 (python-scripts/rpc_transport.py)
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'python-scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+from rpc_transport import get_transport
+from chunk_scanner import ChunkSizeController
 
 def test_chunk_sizes():
     """청크 크기 실제 테스트"""
@@ -10,13 +17,7 @@ def test_chunk_sizes():
     
     def rpc_call(method, params):
         try:
-            response = requests.post(rpc_url, json={
-                "jsonrpc": "2.0",
-                "method": method,
-                "params": params,
-                "id": 1
-            }, timeout=15)
-            return response.json()
+            return get_transport().call(rpc_url, method, params, timeout=15)
         except Exception as e:
             print(f"RPC 오류: {e}")
             return None
@@ -69,13 +70,7 @@ def simple_scan_test():
     
     def rpc_call(method, params):
         try:
-            response = requests.post(rpc_url, json={
-                "jsonrpc": "2.0",
-                "method": method,
-                "params": params,
-                "id": 1
-            }, timeout=15)
-            return response.json()
+            return get_transport().call(rpc_url, method, params, timeout=15)
         except Exception as e:
             return None
     
@@ -122,13 +117,7 @@ def find_max_safe_chunk():
     
     def rpc_call(method, params):
         try:
-            response = requests.post(rpc_url, json={
-                "jsonrpc": "2.0",
-                "method": method,
-                "params": params,
-                "id": 1
-            }, timeout=15)
-            return response.json()
+            return get_transport().call(rpc_url, method, params, timeout=15)
         except Exception as e:
             return None
     
@@ -165,6 +154,13 @@ def find_max_safe_chunk():
             high = mid - 1
     
     print(f"\n🎯 안전한 최대 크기: {max_safe_size}블록")
+    
+    # 스캐너가 다음 실행부터 이 크기로 시작하도록 저장
+    if max_safe_size:
+        controller = ChunkSizeController(rpc_url, path=os.path.join(SCRIPTS_DIR, 'chunk_sizes.json'))
+        controller.seed(max_safe_size)
+        print(f"💾 python-scripts/chunk_sizes.json에 저장 완료")
+    
     return max_safe_size
 
 def main():
@@ -0,0 +1,43 @@
+# === 원자적 파일 쓰기 (임시 파일 + fsync + rename) ===
+import json
+import os
+import tempfile
+
+
+def atomic_write(path, write, binary=False):
+    """write(f)로 내용을 쓰고 원자적으로 교체
+
+    같은 디렉토리의 임시 파일에 쓰고 fsync 후 rename하므로,
+    쓰는 도중 프로세스가 죽어도 기존 파일이나 새 파일 중 하나만 남는다.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with (os.fdopen(fd, 'wb') if binary else os.fdopen(fd, 'w', encoding='utf-8')) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    # rename 자체도 디스크에 반영 (지원하지 않는 플랫폼은 무시)
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """JSON을 원자적으로 저장"""
+    atomic_write(path, lambda f: json.dump(data, f, **dump_kwargs))
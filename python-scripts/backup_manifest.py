@@ -0,0 +1,177 @@
+# === 백업 매니페스트 (스냅샷 목록 + 보존/압축 정책) ===
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+
+from atomic_file import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+BACKUP_DIR = os.environ.get('BACKUP_DIR', 'backup')
+BACKUP_MANIFEST_NAME = 'manifest.json'
+# 보존할 백업 실행 수 (초과분은 파일과 함께 삭제)
+BACKUP_RETENTION = int(os.environ.get('BACKUP_RETENTION', '10'))
+# 최근 몇 개 실행까지 JSON/CSV/NDJSON을 압축하지 않고 둘지 (그 이전은 .gz로 압축)
+BACKUP_KEEP_UNCOMPRESSED = int(os.environ.get('BACKUP_KEEP_UNCOMPRESSED', '2'))
+# 매니페스트 도입 이전 파일 이름 (매니페스트에 없는 것은 정리 대상)
+LEGACY_BACKUP_PREFIX = 'stake_leaderboard_'
+
+COMPRESSIBLE_KINDS = ('json', 'csv', 'ndjson')
+
+
+def file_sha256(path):
+    """파일 내용 SHA-256 (hex)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BackupManifest:
+    """backup/ 디렉토리의 실행별 백업 목록
+
+    실행마다 하나의 항목(블록 높이, 지갑 수, 파일별 경로/크기/해시)을 오래된 순으로
+    기록한다. 최신 스냅샷은 목록 끝에서 바로 찾으므로 디렉토리를 검색하지 않고,
+    보존 개수를 넘은 실행은 삭제, 오래된 JSON/CSV/NDJSON은 gzip으로 압축한다.
+    """
+
+    def __init__(self, directory=BACKUP_DIR, retention=BACKUP_RETENTION,
+                 keep_uncompressed=BACKUP_KEEP_UNCOMPRESSED):
+        self.directory = directory
+        self.path = os.path.join(directory, BACKUP_MANIFEST_NAME)
+        self.retention = max(1, retention)
+        self.keep_uncompressed = max(1, keep_uncompressed)
+        self._lock = threading.Lock()
+        self.entries = self._load()
+
+    def _load(self):
+        """저장된 매니페스트 로드"""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f).get('entries', [])
+        except FileNotFoundError:
+            return []
+        except ValueError as e:
+            logger.warning(f"⚠️ 백업 매니페스트 손상, 새로 작성합니다: {e}")
+            return []
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write_json(self.path, {'version': 1, 'entries': self.entries}, indent=2)
+
+    def _abs(self, name):
+        return os.path.join(self.directory, name)
+
+    def _describe(self, path):
+        """파일 → 매니페스트 파일 정보"""
+        return {
+            'path': os.path.relpath(path, self.directory),
+            'size': os.path.getsize(path),
+            'sha256': file_sha256(path)
+        }
+
+    # === 기록 ===
+
+    def record(self, run_id, files, block=None, wallets=None):
+        """백업 실행 기록: files = {종류: 경로} ('snapshot', 'json', 'csv', 'ndjson') → 항목"""
+        with self._lock:
+            entry = {
+                'id': run_id,
+                'block': block,
+                'wallets': wallets,
+                'files': {kind: self._describe(path) for kind, path in files.items() if path}
+            }
+            # 같은 id를 다시 기록하면 새 항목에 없는 이전 파일은 삭제
+            reused = {info['path'] for info in entry['files'].values()}
+            for previous in (e for e in self.entries if e['id'] == run_id):
+                for info in previous['files'].values():
+                    if info['path'] not in reused:
+                        self._remove_file(info)
+            self.entries = [e for e in self.entries if e['id'] != run_id] + [entry]
+            self._compact()
+            self._save()
+            self._sweep_unmanaged()
+        return entry
+
+    def _remove_file(self, info):
+        try:
+            os.remove(self._abs(info['path']))
+        except FileNotFoundError:
+            pass
+
+    def _compact(self):
+        """보존 개수 초과 항목 삭제, 오래된 항목의 JSON/CSV/NDJSON 압축"""
+        expired, self.entries = self.entries[:-self.retention], self.entries[-self.retention:]
+        for entry in expired:
+            for info in entry['files'].values():
+                self._remove_file(info)
+        if expired:
+            logger.info(f"🧹 오래된 백업 {len(expired)}개 삭제")
+
+        for entry in self.entries[:-self.keep_uncompressed]:
+            for kind in COMPRESSIBLE_KINDS:
+                info = entry['files'].get(kind)
+                if not info or info['path'].endswith('.gz'):
+                    continue
+                source = self._abs(info['path'])
+                if not os.path.exists(source):
+                    continue
+                target = source + '.gz'
+                with open(source, 'rb') as f_in, gzip.open(target, 'wb') as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+                entry['files'][kind] = self._describe(target)
+                os.remove(source)
+
+    def _sweep_unmanaged(self):
+        """매니페스트 도입 이전의 타임스탬프 백업 파일 정리 (스냅샷이 하나라도 있을 때만)"""
+        if not any('snapshot' in e['files'] for e in self.entries):
+            return
+        managed = {info['path'] for e in self.entries for info in e['files'].values()}
+        removed = 0
+        for name in os.listdir(self.directory):
+            if name.startswith(LEGACY_BACKUP_PREFIX) and name not in managed:
+                os.remove(self._abs(name))
+                removed += 1
+        if removed:
+            logger.info(f"🧹 매니페스트에 없는 이전 백업 파일 {removed}개 정리")
+
+    # === 조회 ===
+
+    def latest_snapshot(self, verify=True):
+        """가장 최근의 유효한 스냅샷 → (절대 경로, 항목) (없으면 (None, None))
+
+        파일이 없거나 해시가 다르면 그 이전 항목으로 넘어간다.
+        """
+        with self._lock:
+            for entry in reversed(self.entries):
+                info = entry['files'].get('snapshot')
+                if not info:
+                    continue
+                path = self._abs(info['path'])
+                if not os.path.exists(path):
+                    logger.warning(f"⚠️ 백업 스냅샷 없음: {info['path']}")
+                    continue
+                if verify and file_sha256(path) != info['sha256']:
+                    logger.warning(f"⚠️ 백업 스냅샷 해시 불일치: {info['path']}")
+                    continue
+                return path, entry
+        return None, None
+
+
+_default_manifest = None
+_default_lock = threading.Lock()
+
+
+def get_backup_manifest():
+    """프로세스 공용 백업 매니페스트"""
+    global _default_manifest
+    if _default_manifest is None:
+        with _default_lock:
+            if _default_manifest is None:
+                _default_manifest = BackupManifest()
+    return _default_manifest
@@ -0,0 +1,153 @@
+# === 블록 번호 → 타임스탬프 캐시 (메모리 LRU + 디스크 SQLite) ===
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# checkpoint.json과 같은 디렉토리에 저장 (GitHub Actions 캐시로 보존)
+BLOCK_CACHE_FILE = os.environ.get('BLOCK_CACHE_FILE', 'block_timestamps.sqlite')
+BLOCK_CACHE_LRU_SIZE = int(os.environ.get('BLOCK_CACHE_LRU_SIZE', '50000'))
+# 다른 프로세스가 쓰는 중일 때 잠금 대기 시간 (초)
+BLOCK_CACHE_TIMEOUT = float(os.environ.get('BLOCK_CACHE_TIMEOUT', '30'))
+
+
+class BlockTimestampCache:
+    """블록 타임스탬프 캐시 - 조회 순서: 메모리 LRU → 디스크
+
+    base_path를 주면 그 파일을 읽기 전용으로 함께 조회하고 쓰기는 path에만 한다
+    (샤드 워커: 공용 캐시는 읽기만, 새 타임스탬프는 샤드 파일에 기록 → 부모가 merge_from).
+    """
+
+    def __init__(self, path=BLOCK_CACHE_FILE, capacity=BLOCK_CACHE_LRU_SIZE, base_path=None):
+        self.path = path
+        self.base_path = base_path
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._tables = ['block_timestamps']
+
+    def _db(self):
+        """디스크 저장소 연결 (지연 생성)"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=BLOCK_CACHE_TIMEOUT, check_same_thread=False, uri=True)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS block_timestamps ("
+                "number INTEGER PRIMARY KEY, timestamp INTEGER NOT NULL)"
+            )
+            self._conn.commit()
+            if self.base_path and os.path.exists(self.base_path):
+                try:
+                    self._conn.execute("ATTACH DATABASE ? AS base", (f"{Path(self.base_path).resolve().as_uri()}?mode=ro",))
+                    self._conn.execute("SELECT 1 FROM base.block_timestamps LIMIT 1")
+                    self._tables.append('base.block_timestamps')
+                except sqlite3.Error as e:
+                    logger.warning(f"⚠️ 공용 블록 캐시를 읽을 수 없어 건너뜁니다: {e}")
+        return self._conn
+
+    def _remember(self, block_num, timestamp):
+        """LRU에 기록 (용량 초과 시 가장 오래된 항목 제거)"""
+        self._lru[block_num] = timestamp
+        self._lru.move_to_end(block_num)
+        if len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def get_many(self, block_numbers):
+        """캐시에 있는 블록만 {block_num: timestamp}로 반환"""
+        found = {}
+        unique = set(block_numbers)
+        with self._lock:
+            missing = []
+            for block_num in unique:
+                if block_num in self._lru:
+                    self._lru.move_to_end(block_num)
+                    found[block_num] = self._lru[block_num]
+                else:
+                    missing.append(block_num)
+
+            # SQLite 변수 개수 제한 대비 500개씩 조회 (자기 파일 → 공용 캐시 순)
+            db = self._db()
+            for table in self._tables:
+                for i in range(0, len(missing), 500):
+                    group = missing[i:i + 500]
+                    placeholders = ','.join('?' * len(group))
+                    rows = db.execute(
+                        f"SELECT number, timestamp FROM {table} WHERE number IN ({placeholders})",
+                        group
+                    ).fetchall()
+                    for block_num, timestamp in rows:
+                        found[block_num] = timestamp
+                        self._remember(block_num, timestamp)
+                missing = [block_num for block_num in missing if block_num not in found]
+
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def get(self, block_num):
+        """단일 블록 조회 (없으면 None)"""
+        return self.get_many([block_num]).get(block_num)
+
+    def put_many(self, timestamps):
+        """{block_num: timestamp} 저장"""
+        if not timestamps:
+            return
+        with self._lock:
+            for block_num, timestamp in timestamps.items():
+                self._remember(block_num, timestamp)
+            db = self._db()
+            db.executemany(
+                "INSERT OR REPLACE INTO block_timestamps (number, timestamp) VALUES (?, ?)",
+                list(timestamps.items())
+            )
+            db.commit()
+
+    def merge_from(self, path):
+        """다른 캐시 파일(샤드 워커 기록분)의 타임스탬프를 모두 가져옴 → 가져온 수"""
+        with self._lock:
+            db = self._db()
+            db.execute("ATTACH DATABASE ? AS shard", (path,))
+            try:
+                merged = db.execute(
+                    "INSERT OR REPLACE INTO block_timestamps (number, timestamp) "
+                    "SELECT number, timestamp FROM shard.block_timestamps"
+                ).rowcount
+                db.commit()
+            finally:
+                db.execute("DETACH DATABASE shard")
+        return merged
+
+    def close(self):
+        """디스크 연결 종료"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                self._tables = ['block_timestamps']
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def set_block_cache(cache):
+    """프로세스 공용 블록 캐시 교체 (샤드 워커가 자기 파일에 기록할 때)"""
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
+
+
+def get_block_cache():
+    """프로세스 공용 블록 캐시"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = BlockTimestampCache()
+    return _default_cache
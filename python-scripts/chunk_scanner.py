@@ -0,0 +1,238 @@
+# === 블록 범위 동시 스캐너 (asyncio + 순서 보장 적용) ===
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from atomic_file import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+SCAN_CONCURRENCY = int(os.environ.get('SCAN_CONCURRENCY', '4'))
+SCAN_CHUNK_SIZE = 1500
+
+# 청크 크기 자동 조정 설정 (엔드포인트별 학습값은 checkpoint.json 옆에 저장)
+CHUNK_SIZE_FILE = os.environ.get('CHUNK_SIZE_FILE', 'chunk_sizes.json')
+CHUNK_SIZE_MIN = int(os.environ.get('CHUNK_SIZE_MIN', '10'))
+CHUNK_SIZE_MAX = int(os.environ.get('CHUNK_SIZE_MAX', '20000'))
+CHUNK_FAST_SECONDS = 2.0      # 이보다 빠르면 창 확대
+CHUNK_SLOW_SECONDS = 10.0     # 이보다 느리면 창 축소
+CHUNK_SMALL_RESPONSE = 1000   # 이보다 로그가 적으면 창 확대
+
+# "block range too large, max is 1000" / "query returned more than 10000 results" 등 크기 초과 메시지만
+# ("rate limit exceeded", "too many requests", "invalid block range"처럼 창 크기와 무관한 오류는 제외)
+RANGE_ERROR_PATTERN = re.compile(
+    r'range (?:is )?too (?:large|wide|big)|max is \d+|more than \d+ results|too many (?:results|logs|blocks)'
+    r'|exceeds? (?:the )?max(?:imum)? block range|limited to a [\d,]+ (?:block )?range|response size exceeded', re.I)
+RANGE_LIMIT_PATTERN = re.compile(r'max(?:imum)?(?: block range)? is (\d+)', re.I)
+
+
+class ChunkScanError(Exception):
+    """재시도 후에도 청크를 가져오지 못함 (빈 결과로 넘기면 구간이 영구히 빠지므로 스캔 중단)"""
+
+
+def is_range_error(error):
+    """eth_getLogs 범위 초과 오류 여부"""
+    message = error.get('message', '') if isinstance(error, dict) else str(error)
+    return bool(RANGE_ERROR_PATTERN.search(message))
+
+
+class ChunkSizeController:
+    """eth_getLogs 블록 창 크기를 엔드포인트별로 자동 조정
+
+    작고 빠른 응답이면 창을 키우고, 범위 초과/타임아웃이면 줄인다.
+    범위 초과로 확인된 크기는 상한(ceiling)으로 기억해 다시 넘지 않는다.
+    base_path를 주면 그 파일의 학습값에서 시작하고 저장은 path에만 한다 (샤드 워커).
+    """
+
+    def __init__(self, rpc_url, path=CHUNK_SIZE_FILE, initial_size=SCAN_CHUNK_SIZE,
+                 min_size=CHUNK_SIZE_MIN, max_size=CHUNK_SIZE_MAX, base_path=None):
+        self.rpc_url = rpc_url
+        self.path = path
+        self.min_size = min_size
+        self.max_size = max_size
+        self.size = initial_size
+        self.ceiling = max_size
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load(base_path or path)
+
+    def _load(self, path):
+        """저장된 학습값 로드"""
+        try:
+            with open(path, 'r') as f:
+                learned = json.load(f).get(self.rpc_url)
+        except (FileNotFoundError, ValueError):
+            learned = None
+        if learned:
+            self.ceiling = min(learned.get('ceiling', self.max_size), self.max_size)
+            self.size = max(self.min_size, min(learned.get('size', self.size), self.ceiling))
+            logger.info(f"📏 학습된 청크 크기 로드: {self.size:,}블록 (상한 {self.ceiling:,})")
+
+    def save(self):
+        """학습값 저장 (다른 엔드포인트 값은 유지)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                with open(self.path, 'r') as f:
+                    saved = json.load(f)
+            except (FileNotFoundError, ValueError):
+                saved = {}
+            saved[self.rpc_url] = {'size': self.size, 'ceiling': self.ceiling}
+            atomic_write_json(self.path, saved, indent=2)
+            self._dirty = False
+
+    def merge(self, learned):
+        """다른 프로세스(샤드 워커)의 학습값 반영: 상한은 작은 쪽, 크기는 나중 값"""
+        with self._lock:
+            ceiling = max(self.min_size, min(self.ceiling, learned.get('ceiling', self.max_size)))
+            size = max(self.min_size, min(learned.get('size', self.size), ceiling))
+            if (size, ceiling) != (self.size, self.ceiling):
+                self.size, self.ceiling = size, ceiling
+                self._dirty = True
+
+    def seed(self, safe_size):
+        """외부에서 측정한 안전 크기로 초기화 (debug_chunk_test.py 등)"""
+        with self._lock:
+            self.ceiling = max(self.min_size, min(safe_size, self.max_size))
+            self.size = self.ceiling
+            self._dirty = True
+        self.save()
+
+    def next_size(self):
+        """다음 청크에 사용할 창 크기"""
+        return self.size
+
+    def record_success(self, size, log_count, elapsed):
+        """성공 응답 반영"""
+        with self._lock:
+            if elapsed > CHUNK_SLOW_SECONDS:
+                new_size = max(self.min_size, int(size * 0.75))
+            elif elapsed < CHUNK_FAST_SECONDS and log_count < CHUNK_SMALL_RESPONSE and size >= self.size:
+                new_size = min(self.ceiling, int(size * 1.5))
+            else:
+                return
+            if new_size != self.size:
+                self.size = new_size
+                self._dirty = True
+
+    def record_failure(self, size, error=None, timeout=False):
+        """범위 초과/타임아웃 반영 → 새 창 크기"""
+        with self._lock:
+            limit = None
+            if error is not None:
+                match = RANGE_LIMIT_PATTERN.search(error.get('message', '') if isinstance(error, dict) else str(error))
+                if match:
+                    limit = int(match.group(1))
+
+            if limit:
+                self.ceiling = max(self.min_size, min(self.ceiling, limit))
+            elif not timeout:
+                self.ceiling = max(self.min_size, min(self.ceiling, size - 1))
+
+            self.size = max(self.min_size, min(self.ceiling, size // 2 if not limit else limit))
+            self._dirty = True
+            logger.info(f"📏 청크 크기 축소: {size:,} → {self.size:,}블록"
+                        f"{' (타임아웃)' if timeout else ''}")
+            return self.size
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+_controllers_paths = (CHUNK_SIZE_FILE, None)   # (저장 파일, 시작 학습값 파일)
+
+
+def set_chunk_size_file(path, base_path=None):
+    """컨트롤러 저장 파일 교체 (샤드 워커: 공용 학습값에서 시작해 샤드 파일에 기록)"""
+    global _controllers_paths
+    with _controllers_lock:
+        _controllers.clear()
+        _controllers_paths = (path, base_path)
+
+
+def get_chunk_controller(rpc_url):
+    """엔드포인트별 공용 청크 크기 컨트롤러"""
+    with _controllers_lock:
+        if rpc_url not in _controllers:
+            path, base_path = _controllers_paths
+            _controllers[rpc_url] = ChunkSizeController(rpc_url, path=path, base_path=base_path)
+        return _controllers[rpc_url]
+
+
+def merge_chunk_sizes(path):
+    """다른 학습값 파일(샤드 워커 기록분)을 엔드포인트별로 반영 → 반영한 엔드포인트 수"""
+    try:
+        with open(path, 'r') as f:
+            learned = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return 0
+    for rpc_url, values in learned.items():
+        get_chunk_controller(rpc_url).merge(values)
+    return len(learned)
+
+
+def save_chunk_controllers():
+    """모든 엔드포인트의 학습값 저장"""
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    for controller in controllers:
+        controller.save()
+
+
+def iter_chunks(start_block, end_block, chunk_size=SCAN_CHUNK_SIZE):
+    """[start_block, end_block] → (청크 시작, 청크 끝) 목록
+
+    chunk_size가 함수면 청크마다 호출해 현재 창 크기를 사용한다.
+    """
+    current = start_block
+    while current <= end_block:
+        size = chunk_size() if callable(chunk_size) else chunk_size
+        chunk_end = min(current + size - 1, end_block)
+        yield current, chunk_end
+        current = chunk_end + 1
+
+
+async def scan_range_async(start_block, end_block, fetch_chunk, apply_chunk,
+                           chunk_size=SCAN_CHUNK_SIZE, concurrency=SCAN_CONCURRENCY):
+    """최대 concurrency개 청크를 동시에 가져오고, 결과는 블록 순서대로 적용
+
+    fetch_chunk(start, end)는 워커 스레드에서 실행되는 블로킹 함수,
+    apply_chunk(start, end, result)는 이벤트 루프 스레드에서 순서대로 호출된다.
+    """
+    loop = asyncio.get_running_loop()
+    chunks = iter_chunks(start_block, end_block, chunk_size)
+    window = deque()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='scan') as executor:
+        def launch():
+            for chunk_start, chunk_end in chunks:
+                future = loop.run_in_executor(executor, fetch_chunk, chunk_start, chunk_end)
+                window.append((chunk_start, chunk_end, future))
+                return True
+            return False
+
+        while len(window) < concurrency and launch():
+            pass
+
+        try:
+            while window:
+                chunk_start, chunk_end, future = window.popleft()
+                result = await future
+                launch()
+                apply_chunk(chunk_start, chunk_end, result)
+        finally:
+            # 중단 시 대기 중인 청크 취소
+            for _, _, future in window:
+                future.cancel()
+
+
+def scan_range(start_block, end_block, fetch_chunk, apply_chunk,
+               chunk_size=SCAN_CHUNK_SIZE, concurrency=SCAN_CONCURRENCY):
+    """scan_range_async 동기 래퍼"""
+    return asyncio.run(scan_range_async(start_block, end_block, fetch_chunk, apply_chunk,
+                                        chunk_size=chunk_size, concurrency=concurrency))
@@ -0,0 +1,289 @@
+# === Apps Script 청크 업로드 (동시 전송 + 청크별 확인 + 세션 재개) ===
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from atomic_file import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_ROWS = int(os.environ.get('UPLOAD_CHUNK_ROWS', '500'))
+# Apps Script 동시 실행 한도(사용자당 30) 안에서 여유 있게
+UPLOAD_CHUNK_CONCURRENCY = int(os.environ.get('UPLOAD_CHUNK_CONCURRENCY', '4'))
+UPLOAD_CHUNK_RETRIES = int(os.environ.get('UPLOAD_CHUNK_RETRIES', '3'))
+UPLOAD_CHUNK_TIMEOUT = 120
+# 마지막 청크 응답을 못 받았을 때 수신 측 전체 처리 완료를 기다리는 시간 (Apps Script 실행 한도 6분)
+UPLOAD_FINALIZE_WAIT = int(os.environ.get('UPLOAD_FINALIZE_WAIT', '420'))
+UPLOAD_FINALIZE_POLL = 10
+# 진행 중인 업로드 세션 (같은 데이터로 다시 호출하면 확인된 청크는 건너뜀)
+UPLOAD_SESSION_FILE = os.environ.get('UPLOAD_SESSION_FILE', 'upload_session.json')
+
+
+def session_rows_path(path):
+    """세션이 보내는 행 파일 (다음 실행에서 중단된 세션을 같은 내용으로 마저 보내는 용도)"""
+    return f"{os.path.splitext(path)[0]}.rows.json"
+
+
+def rows_digest(rows):
+    """업로드 데이터 식별용 해시 (같은 내용이면 같은 세션을 이어서 사용)"""
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(json.dumps(row, separators=(',', ':')).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ChunkUploadSession:
+    """청크 업로드 세션 상태 (세션 id, 청크 구성, 확인된 청크 번호)"""
+
+    def __init__(self, session_id, digest, mode, version, chunk_rows, total_chunks, acked=(),
+                 path=UPLOAD_SESSION_FILE):
+        self.session_id = session_id
+        self.digest = digest
+        self.mode = mode
+        self.version = version
+        self.chunk_rows = chunk_rows
+        self.total_chunks = total_chunks
+        self.acked = set(acked)
+        self.path = path
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, rows, mode, version, chunk_rows=UPLOAD_CHUNK_ROWS, path=UPLOAD_SESSION_FILE):
+        """같은 데이터의 미완료 세션이 있으면 재개, 아니면 새 세션"""
+        digest = rows_digest(rows)
+        try:
+            with open(path, 'r') as f:
+                saved = json.load(f)
+        except (FileNotFoundError, ValueError):
+            saved = None
+        if saved and saved.get('digest') == digest and saved.get('mode') == mode:
+            session = cls(saved['session_id'], digest, mode, saved['version'], saved['chunk_rows'],
+                          saved['total_chunks'], saved['acked'], path)
+            logger.info(f"♻️ 업로드 세션 재개: {session.session_id} "
+                        f"({len(session.acked)}/{session.total_chunks}개 청크 확인됨)")
+            return session
+        total_chunks = max(1, (len(rows) + chunk_rows - 1) // chunk_rows)
+        return cls(uuid.uuid4().hex, digest, mode, version, chunk_rows, total_chunks, (), path)
+
+    @classmethod
+    def load_interrupted(cls, path=UPLOAD_SESSION_FILE):
+        """이전 실행에서 중단된 세션과 그 행 → (세션, 행) (없거나 행 파일이 없으면 None)
+
+        다음 실행의 행은 타임스코어 등이 달라 digest가 맞지 않으므로 open()으로는 재개되지 않는다.
+        """
+        try:
+            with open(path, 'r') as f:
+                saved = json.load(f)
+            with open(session_rows_path(path), 'r') as f:
+                stored = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if stored.get('session_id') != saved.get('session_id'):
+            return None
+        fields = stored['fields']
+        rows = [dict(zip(fields, values)) for values in stored['rows']]
+        session = cls(saved['session_id'], saved['digest'], saved['mode'], saved['version'], saved['chunk_rows'],
+                      saved['total_chunks'], saved['acked'], path)
+        return session, rows
+
+    def save_rows(self, rows):
+        """세션의 행 저장 (세션당 한 번, 청크 확인마다 쓰는 세션 파일과 분리)"""
+        rows_path = session_rows_path(self.path)
+        try:
+            with open(rows_path, 'r') as f:
+                if json.load(f).get('session_id') == self.session_id:
+                    return
+        except (FileNotFoundError, ValueError):
+            pass
+        fields = list(rows[0]) if rows else []
+        atomic_write_json(rows_path, {
+            'session_id': self.session_id,
+            'fields': fields,
+            'rows': [[row.get(field) for field in fields] for row in rows]
+        }, separators=(',', ':'))
+
+    def pending(self):
+        """아직 확인되지 않은 청크 번호 (1부터)"""
+        return [n for n in range(1, self.total_chunks + 1) if n not in self.acked]
+
+    def ack(self, chunk_number):
+        """청크 확인 기록 후 저장"""
+        with self._lock:
+            self.acked.add(chunk_number)
+            self.save()
+
+    def unack(self, chunk_number):
+        """청크를 다시 보내도록 확인 기록 취소 후 저장"""
+        with self._lock:
+            self.acked.discard(chunk_number)
+            self.save()
+
+    def save(self):
+        atomic_write_json(self.path, {
+            'session_id': self.session_id,
+            'digest': self.digest,
+            'mode': self.mode,
+            'version': self.version,
+            'chunk_rows': self.chunk_rows,
+            'total_chunks': self.total_chunks,
+            'acked': sorted(self.acked)
+        })
+
+    def clear(self):
+        """완료된 세션 파일 삭제"""
+        for path in (self.path, session_rows_path(self.path)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def upload_chunks(rows, mode, version, post, encode, chunk_rows=UPLOAD_CHUNK_ROWS,
+                  concurrency=UPLOAD_CHUNK_CONCURRENCY, retries=UPLOAD_CHUNK_RETRIES,
+                  session_path=UPLOAD_SESSION_FILE):
+    """rows를 청크로 나눠 동시 전송 → 수신 측이 반영한 버전 (실패 시 None)
+
+    post(json_data, timeout) → (상태, 응답 dict), encode(dict) → (JSON 문자열, 원본 크기).
+    응답의 status가 success이고 chunk_number가 일치해야 확인으로 보며,
+    확인되지 않은 청크만 라운드마다 다시 보낸다. 중간에 실패하면 세션 파일이 남아
+    같은 데이터로 다시 호출할 때 나머지 청크만 전송한다 (이때 버전은 처음 세션의 것).
+    모든 청크가 확인됐는데 완료 응답이 없으면 수신 측 처리가 끝날 때까지 상태를 확인하고,
+    수신 측에 세션이 없을 때만 새 세션으로 처음부터 다시 보낸다.
+    """
+    session = ChunkUploadSession.open(rows, mode, version, chunk_rows, session_path)
+    session.save_rows(rows)
+    result = _upload_session(session, rows, post, encode, concurrency, retries)
+    if result == 'lost':
+        # 수신 측 세션이 사라져 재개한 청크로는 완료되지 않음 → 새 세션으로 한 번 더
+        logger.warning(f"⚠️ 수신 측에 세션 {session.session_id}이 없어 처음부터 다시 전송합니다")
+        session.clear()
+        session = ChunkUploadSession.open(rows, mode, version, chunk_rows, session_path)
+        session.save_rows(rows)
+        result = _upload_session(session, rows, post, encode, concurrency, retries)
+    return session.version if result == 'complete' else None
+
+
+def resume_interrupted_upload(post, encode, concurrency=UPLOAD_CHUNK_CONCURRENCY, retries=UPLOAD_CHUNK_RETRIES,
+                              session_path=UPLOAD_SESSION_FILE):
+    """이전 실행에서 중단된 세션을 저장된 행으로 마저 전송 → (행, 모드, 버전) (없거나 실패하면 None)
+
+    수신 측에는 확인된 청크가 이미 쌓여 있으므로 남은 청크만 보내면 된다. 완료되면 호출한
+    쪽은 그 행을 업로드 기준으로 삼아 이번 실행의 변경분만 델타로 보낼 수 있다.
+    """
+    interrupted = ChunkUploadSession.load_interrupted(session_path)
+    if interrupted is None:
+        return None
+    session, rows = interrupted
+    logger.info(f"♻️ 중단된 업로드 세션 이어서 전송: {session.session_id} "
+                f"({len(session.acked)}/{session.total_chunks}개 청크 확인됨, {session.mode} 모드)")
+    result = _upload_session(session, rows, post, encode, concurrency, retries)
+    if result == 'lost':
+        logger.warning(f"⚠️ 수신 측에 세션 {session.session_id}이 없어 이어서 보낼 수 없습니다")
+        session.clear()
+    return (rows, session.mode, session.version) if result == 'complete' else None
+
+
+def _wait_for_finalize(session, post, encode, wait=UPLOAD_FINALIZE_WAIT, interval=UPLOAD_FINALIZE_POLL):
+    """수신 측 세션 상태 확인 요청 반복 → 'done' / 'receiving' / 'finalizing' (대기 초과) / 'missing'
+
+    모든 청크가 확인됐는데 완료 응답이 없으면 (마지막 청크 요청이 전체 처리 중에 타임아웃)
+    수신 측이 아직 처리 중일 수 있으므로, 세션을 버리고 다시 보내기 전에 끝날 때까지 기다린다.
+    """
+    json_data, _ = encode({'is_chunk': True, 'poll': True, 'session_id': session.session_id})
+    deadline = time.monotonic() + wait
+    state = None
+    while True:
+        status, body = post(json_data, timeout=UPLOAD_CHUNK_TIMEOUT)
+        if status == 'ok' and body and body.get('status') == 'success' and body.get('state'):
+            state = body['state']
+            if state == 'receiving' and body.get('received', 0) < session.total_chunks:
+                # 확인한 청크가 수신 측에 없음 (세션이 정리된 뒤 재전송 청크로 새로 생김)
+                return 'missing'
+            if state != 'finalizing':
+                return state
+        if time.monotonic() >= deadline:
+            # 확인 요청 자체가 계속 실패하면 세션을 잃은 것으로 단정하지 않음
+            return state or 'finalizing'
+        logger.info(f"⏳ 수신 측 전체 처리 대기 중 (세션 {session.session_id}, {interval}초 후 재확인)")
+        time.sleep(interval)
+
+
+def _upload_session(session, rows, post, encode, concurrency, retries):
+    """세션의 미확인 청크 전송 → 'complete' / 'failed' / 'lost'"""
+    completed = []
+
+    def send(chunk_number):
+        start = (chunk_number - 1) * session.chunk_rows
+        json_data, _ = encode({
+            'is_chunk': True,
+            'session_id': session.session_id,
+            'chunk_number': chunk_number,
+            'total_chunks': session.total_chunks,
+            'mode': session.mode,
+            'version': session.version,
+            'data': rows[start:start + session.chunk_rows]
+        })
+        status, body = post(json_data, timeout=UPLOAD_CHUNK_TIMEOUT)
+        if status != 'ok' or not body:
+            return False, None
+        if body.get('status') != 'success' or body.get('chunk_number') != chunk_number:
+            return False, body.get('message')
+        return True, body
+
+    started = time.perf_counter()
+    pending = session.pending()
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+        if attempt:
+            delay = min(2 ** attempt, 30)
+            logger.info(f"🔁 실패한 청크 {len(pending)}개 재전송 ({attempt}/{retries}, {delay}초 후)")
+            time.sleep(delay)
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='upload') as executor:
+            futures = {executor.submit(send, n): n for n in pending}
+            for future in as_completed(futures):
+                chunk_number = futures[future]
+                try:
+                    ok, detail = future.result()
+                except Exception as e:
+                    ok, detail = False, str(e)
+                if ok:
+                    session.ack(chunk_number)
+                    if detail.get('complete'):
+                        completed.append(chunk_number)
+                    logger.info(f"✅ 청크 {chunk_number}/{session.total_chunks} 확인 "
+                                f"({len(session.acked)}/{session.total_chunks})"
+                                f"{' - 전체 처리 완료' if detail.get('total_rows') is not None else ''}")
+                else:
+                    logger.warning(f"⚠️ 청크 {chunk_number}/{session.total_chunks} 실패"
+                                   f"{f': {detail}' if detail else ''}")
+        pending = session.pending()
+
+    if pending:
+        session.save()
+        logger.error(f"❌ 청크 업로드 미완료: {len(pending)}개 청크 실패 (세션 {session.session_id}, 다음 호출에서 재개)")
+        return 'failed'
+    if not completed:
+        state = _wait_for_finalize(session, post, encode)
+        if state == 'missing':
+            return 'lost'
+        if state == 'finalizing':
+            session.save()
+            logger.error(f"❌ 수신 측 전체 처리가 {UPLOAD_FINALIZE_WAIT}초 안에 끝나지 않음 "
+                         f"(세션 {session.session_id}, 다음 호출에서 다시 확인)")
+            return 'failed'
+        if state == 'receiving':
+            # 수신 측 처리가 실패해 수신 상태로 돌아감 → 마지막 청크를 다시 보내면 처리 재시도
+            session.unack(session.total_chunks)
+            logger.error(f"❌ 수신 측 전체 처리 실패 (세션 {session.session_id}, 다음 호출에서 마지막 청크 재전송)")
+            return 'failed'
+
+    session.clear()
+    logger.info(f"✅ 모든 청크 업로드 완료: {session.total_chunks}개, {len(rows):,}행, "
+                f"{time.perf_counter() - started:.1f}초")
+    return 'complete'
@@ -0,0 +1,229 @@
+# === 다중 RPC 엔드포인트 풀 (상태 점수 + 헤지 요청) ===
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+
+from rpc_transport import get_transport
+
+logger = logging.getLogger(__name__)
+
+# === 설정 ===
+RPC_HEDGE = os.environ.get('RPC_HEDGE', 'false').lower() == 'true'
+RPC_HEDGE_PERCENTILE = float(os.environ.get('RPC_HEDGE_PERCENTILE', '0.9'))
+RPC_HEDGE_MIN_SAMPLES = 20
+RPC_COOLDOWN_SECONDS = float(os.environ.get('RPC_COOLDOWN_SECONDS', '60'))
+RPC_SLOW_FACTOR = 3.0         # 최고 엔드포인트 대비 중간 지연이 이 배수를 넘으면 일시 제외
+RPC_MAX_CONSECUTIVE_FAILURES = 3
+RPC_MAX_ERROR_RATE = 0.5
+RPC_EXPLORE_RATE = 0.05       # 가끔 다른 엔드포인트로 보내 통계를 갱신
+
+
+class EndpointStats:
+    """엔드포인트별 지연/오류 통계"""
+
+    def __init__(self, url):
+        self.url = url
+        self.latencies = deque(maxlen=100)
+        self.outcomes = deque(maxlen=50)
+        self.consecutive_failures = 0
+        self.quarantined_until = 0.0
+
+    def error_rate(self):
+        """최근 오류율"""
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def latency_percentile(self, percentile):
+        """최근 지연 퍼센타일 (샘플 없으면 None)"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+    def score(self):
+        """낮을수록 좋음 (표본이 없는 엔드포인트는 먼저 시도)"""
+        median = self.latency_percentile(0.5)
+        if median is None:
+            return 0.0
+        return median * (1 + 4 * self.error_rate())
+
+    def reset(self):
+        """격리 해제 시 통계 초기화"""
+        self.latencies.clear()
+        self.outcomes.clear()
+        self.consecutive_failures = 0
+        self.quarantined_until = 0.0
+
+
+class EndpointPool:
+    """상태가 좋은 엔드포인트 우선 라우팅, 실패 시 다음 엔드포인트로 전환
+
+    hedge가 켜져 있으면 1순위 응답이 지연 퍼센타일을 넘을 때
+    2순위 엔드포인트로 같은 요청을 보내고 먼저 성공한 응답을 사용한다.
+    """
+
+    def __init__(self, urls, transport=None, hedge=RPC_HEDGE, hedge_percentile=RPC_HEDGE_PERCENTILE,
+                 cooldown=RPC_COOLDOWN_SECONDS):
+        self.urls = list(dict.fromkeys(urls))
+        self.transport = transport or get_transport()
+        self.hedge = hedge and len(self.urls) > 1
+        self.hedge_percentile = hedge_percentile
+        self.cooldown = cooldown
+        self.stats = {url: EndpointStats(url) for url in self.urls}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.transport.pool_size,
+                                            thread_name_prefix='hedge') if self.hedge else None
+
+    # === 라우팅 ===
+
+    def ranked(self):
+        """격리되지 않은 엔드포인트를 점수 순으로 (모두 격리되면 전체)"""
+        now = time.monotonic()
+        with self._lock:
+            for stats in self.stats.values():
+                if stats.quarantined_until and stats.quarantined_until <= now:
+                    logger.info(f"🔁 엔드포인트 복귀: {stats.url}")
+                    stats.reset()
+            available = [s for s in self.stats.values() if s.quarantined_until <= now]
+            if not available:
+                available = list(self.stats.values())
+            ranked = sorted(available, key=lambda s: s.score())
+            if len(ranked) > 1 and random.random() < RPC_EXPLORE_RATE:
+                ranked.insert(0, ranked.pop(random.randrange(1, len(ranked))))
+            return [s.url for s in ranked]
+
+    def best(self):
+        """현재 1순위 엔드포인트"""
+        return self.ranked()[0]
+
+    def record(self, url, elapsed, ok):
+        """요청 결과 기록 및 격리 판단 (elapsed가 None이면 지연은 기록하지 않음)"""
+        with self._lock:
+            stats = self.stats[url]
+            stats.outcomes.append(ok)
+            if ok:
+                if elapsed is not None:
+                    stats.latencies.append(elapsed)
+                stats.consecutive_failures = 0
+            else:
+                stats.consecutive_failures += 1
+
+            reason = None
+            if stats.consecutive_failures >= RPC_MAX_CONSECUTIVE_FAILURES:
+                reason = f"연속 실패 {stats.consecutive_failures}회"
+            elif len(stats.outcomes) >= 10 and stats.error_rate() > RPC_MAX_ERROR_RATE:
+                reason = f"오류율 {stats.error_rate():.0%}"
+            else:
+                medians = [s.latency_percentile(0.5) for s in self.stats.values()
+                           if len(s.latencies) >= 10 and not s.quarantined_until]
+                median = stats.latency_percentile(0.5)
+                if len(medians) > 1 and len(stats.latencies) >= 10 and median > RPC_SLOW_FACTOR * min(medians):
+                    reason = f"느린 응답 (중간값 {median:.2f}s)"
+
+            if reason and not stats.quarantined_until:
+                active = sum(1 for s in self.stats.values() if not s.quarantined_until)
+                if active > 1:
+                    stats.quarantined_until = time.monotonic() + self.cooldown
+                    logger.warning(f"🚫 엔드포인트 일시 제외 ({self.cooldown:.0f}초): {url} - {reason}")
+
+    # === 호출 ===
+
+    def _timed_call(self, url, method, params, timeout, raise_for_status):
+        """단일 엔드포인트 호출 + 통계 기록"""
+        started = time.monotonic()
+        try:
+            body = self.transport.call(url, method, params, timeout=timeout, raise_for_status=raise_for_status)
+        except (requests.RequestException, ValueError):
+            self.record(url, time.monotonic() - started, False)
+            raise
+        self.record(url, time.monotonic() - started, True)
+        return body
+
+    def _hedge_delay(self, url):
+        """헤지 요청 전 대기 시간 (표본 부족 시 None)"""
+        stats = self.stats[url]
+        if len(stats.latencies) < RPC_HEDGE_MIN_SAMPLES:
+            return None
+        return stats.latency_percentile(self.hedge_percentile)
+
+    def request(self, method, params, timeout=None, url=None, raise_for_status=False):
+        """JSON-RPC 호출 → (응답한 엔드포인트, 응답 JSON)
+
+        url을 지정하면 해당 엔드포인트를 1순위로 사용한다.
+        모든 엔드포인트가 실패하면 마지막 예외를 그대로 올린다.
+        """
+        order = self.ranked()
+        if url:
+            order = [url] + [u for u in order if u != url]
+
+        last_error = None
+        while order:
+            primary = order.pop(0)
+            delay = self._hedge_delay(primary) if self.hedge and order else None
+
+            if delay is None:
+                try:
+                    return primary, self._timed_call(primary, method, params, timeout, raise_for_status)
+                except (requests.RequestException, ValueError) as e:
+                    last_error = e
+                    continue
+
+            # 헤지: 1순위가 지연 퍼센타일 안에 끝나지 않으면 2순위도 출발
+            secondary = order.pop(0)
+            futures = {self._executor.submit(self._timed_call, primary, method, params, timeout,
+                                             raise_for_status): primary}
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                futures[self._executor.submit(self._timed_call, secondary, method, params, timeout,
+                                              raise_for_status)] = secondary
+
+            pending = set(futures)
+            fallback = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        body = future.result()
+                    except (requests.RequestException, ValueError) as e:
+                        last_error = e
+                        continue
+                    # JSON-RPC 오류는 다른 응답을 조금 더 기다려 봄
+                    if isinstance(body, dict) and 'error' in body:
+                        fallback = fallback or (futures[future], body)
+                        continue
+                    return futures[future], body
+            if fallback:
+                return fallback
+            # 2순위를 보내지 않았다면 다음 차례에 시도
+            if secondary not in futures.values():
+                order.insert(0, secondary)
+
+        raise last_error or requests.ConnectionError("사용 가능한 RPC 엔드포인트 없음")
+
+    def call(self, method, params, timeout=None, url=None, raise_for_status=False):
+        """JSON-RPC 호출 → 응답 JSON"""
+        return self.request(method, params, timeout=timeout, url=url, raise_for_status=raise_for_status)[1]
+
+    def batch_call(self, calls):
+        """JSON-RPC 배치 호출 (실패 항목은 다음 엔드포인트에서 재시도)"""
+        responses = [None] * len(calls)
+        pending = list(range(len(calls)))
+
+        for url in self.ranked():
+            results = self.transport.batch_call(url, [calls[i] for i in pending])
+            # 배치 소요 시간은 단건 지연 통계와 성격이 달라 성공 여부만 기록
+            self.record(url, None, any(result is not None for result in results))
+
+            for i, result in zip(pending, results):
+                responses[i] = result
+            pending = [i for i in pending if responses[i] is None]
+            if not pending:
+                break
+        return responses
@@ -0,0 +1,155 @@
+# === 스테이킹 이벤트 저장소 (SQLite, 이벤트당 한 행) ===
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+# checkpoint.json과 같은 디렉토리에 저장 (GitHub Actions 캐시로 보존)
+EVENT_STORE_FILE = os.environ.get('EVENT_STORE_FILE', 'stake_events.sqlite')
+
+EVENT_COLUMNS = ('tx_hash', 'log_index', 'block', 'timestamp', 'address', 'amount', 'method')
+
+
+def _row_to_event(row):
+    """DB 행 → 이벤트 dict (scan/decode 단계와 같은 형태)"""
+    tx_hash, log_index, block, timestamp, address, amount, method = row
+    return {
+        'type': method,
+        'address': address,
+        'amount': amount,
+        'block': block,
+        'log_index': log_index,
+        'timestamp': timestamp,
+        'hash': tx_hash
+    }
+
+
+class EventStore:
+    """stake/unstake 이벤트 원본 저장소
+
+    (tx_hash, log_index)가 기본키라 같은 범위를 다시 스캔해도 중복되지 않는다.
+    블록/주소 인덱스로 범위 재계산과 지갑 조회를 로컬에서 처리한다.
+    """
+
+    def __init__(self, path=EVENT_STORE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        """DB 연결 (지연 생성)"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS events ("
+                " tx_hash TEXT NOT NULL,"
+                " log_index INTEGER NOT NULL,"
+                " block INTEGER NOT NULL,"
+                " timestamp INTEGER,"
+                " address TEXT NOT NULL,"
+                " amount REAL NOT NULL DEFAULT 0,"
+                " method TEXT NOT NULL,"
+                " PRIMARY KEY (tx_hash, log_index));"
+                "CREATE INDEX IF NOT EXISTS idx_events_block ON events (block, log_index);"
+                "CREATE INDEX IF NOT EXISTS idx_events_address ON events (address, block);"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def add_events(self, events):
+        """이벤트 목록 저장 (이미 있으면 덮어씀)"""
+        rows = [
+            (e['hash'], e.get('log_index', 0), e['block'], e.get('timestamp'),
+             e['address'].lower(), e.get('amount', 0), e['type'])
+            for e in events
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            db = self._db()
+            db.executemany(
+                f"INSERT OR REPLACE INTO events ({', '.join(EVENT_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            db.commit()
+        return len(rows)
+
+    def delete_from_block(self, block):
+        """block 이후 이벤트 삭제 (체인 재구성 롤백) → 삭제된 수"""
+        with self._lock:
+            db = self._db()
+            deleted = db.execute("DELETE FROM events WHERE block >= ?", (block,)).rowcount
+            db.commit()
+        return deleted
+
+    def merge_from(self, path):
+        """다른 이벤트 저장소 파일(샤드 스캔 결과)의 이벤트를 모두 가져옴 → 가져온 수"""
+        with self._lock:
+            db = self._db()
+            db.execute("ATTACH DATABASE ? AS shard", (path,))
+            try:
+                merged = db.execute(
+                    f"INSERT OR REPLACE INTO events ({', '.join(EVENT_COLUMNS)}) "
+                    f"SELECT {', '.join(EVENT_COLUMNS)} FROM shard.events"
+                ).rowcount
+                db.commit()
+            finally:
+                db.execute("DETACH DATABASE shard")
+        return merged
+
+    def _query(self, where, params):
+        """조건에 맞는 이벤트를 블록 순서대로"""
+        with self._lock:
+            rows = self._db().execute(
+                f"SELECT {', '.join(EVENT_COLUMNS)} FROM events {where} ORDER BY block, log_index",
+                params
+            ).fetchall()
+        return [_row_to_event(row) for row in rows]
+
+    def events_between(self, start_block, end_block):
+        """[start_block, end_block] 범위 이벤트"""
+        return self._query("WHERE block BETWEEN ? AND ?", (start_block, end_block))
+
+    def events_for_address(self, address):
+        """지갑 하나의 전체 이벤트"""
+        return self._query("WHERE address = ?", (address.lower(),))
+
+    def max_block(self):
+        """저장된 마지막 이벤트 블록 (없으면 None)"""
+        with self._lock:
+            return self._db().execute("SELECT MAX(block) FROM events").fetchone()[0]
+
+    def count(self):
+        """저장된 이벤트 수"""
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def close(self):
+        """DB 연결 종료"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def set_event_store(store):
+    """프로세스 공용 이벤트 저장소 교체 (샤드 워커가 자기 파일에 기록할 때)"""
+    global _default_store
+    with _default_lock:
+        _default_store = store
+
+
+def get_event_store():
+    """프로세스 공용 이벤트 저장소"""
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = EventStore()
+    return _default_store
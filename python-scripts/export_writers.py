@@ -0,0 +1,135 @@
+# === 스트리밍 내보내기 (JSON / CSV / NDJSON, 행 단위 기록) ===
+import csv
+import gzip
+import json
+import os
+import shutil
+
+from atomic_file import atomic_write
+
+# true면 들여쓰기 없는 JSON (기본은 기존과 같은 indent=2)
+EXPORT_COMPACT = os.environ.get('EXPORT_COMPACT', 'false').lower() == 'true'
+
+EXPORT_FORMATS = ('json', 'csv', 'ndjson')
+
+# 중첩 없는 행 판별용 (bool/int 하위 클래스 등은 일반 경로로)
+_SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def _dumps(value, compact):
+    if compact:
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    return json.dumps(value, ensure_ascii=False, indent=2)
+
+
+def _indented(text, prefix):
+    """여러 줄 JSON 텍스트에 들여쓰기 추가"""
+    return text.replace('\n', '\n' + prefix)
+
+
+def _dumps_row(row, prefix):
+    """배열 원소 하나를 indent=2 형식으로 (prefix는 원소의 들여쓰기)
+
+    중첩 없는 dict 행은 구분자에 들여쓰기를 넣어 C 인코더로 한 번에 인코딩한다.
+    """
+    if isinstance(row, dict) and row and _SCALAR_TYPES.issuperset(map(type, row.values())):
+        inner = '\n' + prefix + '  '
+        body = json.dumps(row, ensure_ascii=False, separators=(',' + inner, ': '))
+        return '{' + inner + body[1:-1] + '\n' + prefix + '}'
+    return _indented(_dumps(row, False), prefix)
+
+
+def write_json_array(f, rows, compact=EXPORT_COMPACT, level=0):
+    """행 목록을 JSON 배열로 기록 (json.dump(rows, indent=2)와 같은 형식) → 행 수
+
+    level은 배열이 놓인 깊이 (객체 안 배열이면 1).
+    """
+    prefix = '' if compact else '  ' * (level + 1)
+    separator = ',' if compact else ',\n' + prefix
+    count = 0
+    for row in rows:
+        if count == 0:
+            f.write('[' if compact else '[\n' + prefix)
+        else:
+            f.write(separator)
+        f.write(_dumps(row, compact) if compact else _dumps_row(row, prefix))
+        count += 1
+    if count == 0:
+        f.write('[]')
+    elif not compact:
+        f.write('\n' + '  ' * level + ']')
+    else:
+        f.write(']')
+    return count
+
+
+def write_json_document(f, fields, rows_key, rows, compact=EXPORT_COMPACT):
+    """{**fields, rows_key: [행...]} 형태의 JSON 객체 기록 (행 배열은 마지막 키) → 행 수"""
+    prefix, colon, comma = ('', ':', ',') if compact else ('  ', ': ', ',\n')
+    f.write('{' if compact else '{\n')
+    for key, value in fields.items():
+        f.write(prefix + _dumps(key, compact) + colon + _indented(_dumps(value, compact), prefix) + comma)
+    f.write(prefix + _dumps(rows_key, compact) + colon)
+    count = write_json_array(f, rows, compact, level=1)
+    f.write('}' if compact else '\n}')
+    return count
+
+
+def write_ndjson(f, rows):
+    """한 줄에 한 행씩 JSON 기록 → 행 수"""
+    count = 0
+    for row in rows:
+        f.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')))
+        f.write('\n')
+        count += 1
+    return count
+
+
+def write_csv(f, rows, fieldnames=None):
+    """행 목록을 CSV로 기록 (열 순서는 첫 행 기준, None은 빈 칸) → 행 수"""
+    writer = None
+    count = 0
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(f, fieldnames=fieldnames or list(row), lineterminator='\n',
+                                    extrasaction='ignore')
+            writer.writeheader()
+        writer.writerow(row)
+        count += 1
+    if writer is None and fieldnames:
+        csv.DictWriter(f, fieldnames=fieldnames, lineterminator='\n').writeheader()
+    return count
+
+
+def export_rows(path, rows, fmt, compact=EXPORT_COMPACT, fields=None, rows_key='data'):
+    """행을 파일로 원자적 내보내기 → 행 수
+
+    fmt: 'json' (fields가 있으면 {**fields, rows_key: [...]} 객체), 'csv' (Excel용 BOM 포함), 'ndjson'
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"지원하지 않는 형식: {fmt}")
+    result = {}
+
+    def write(f):
+        if fmt == 'json':
+            if fields is None:
+                result['count'] = write_json_array(f, rows, compact)
+            else:
+                result['count'] = write_json_document(f, fields, rows_key, rows, compact)
+        elif fmt == 'csv':
+            f.write('\ufeff')
+            result['count'] = write_csv(f, rows)
+        else:
+            result['count'] = write_ndjson(f, rows)
+
+    atomic_write(path, write)
+    return result['count']
+
+
+def gzip_file(source, target, level=9):
+    """source를 gzip으로 압축해 target에 원자적 저장 (mtime 0으로 고정해 내용이 같으면 같은 바이트)"""
+    def write(f):
+        with open(source, 'rb') as f_in, gzip.GzipFile(fileobj=f, mode='wb', compresslevel=level, mtime=0) as f_out:
+            shutil.copyfileobj(f_in, f_out, 1 << 20)
+
+    atomic_write(target, write, binary=True)
@@ -0,0 +1,247 @@
+# === 스테이킹 컨트랙트 로그 디코더 (eth_getLogs만으로 이벤트 생성) ===
+import json
+import logging
+import os
+import threading
+
+from atomic_file import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+# 학습된 이벤트 레이아웃 저장 위치 (checkpoint.json과 같은 디렉토리)
+EVENT_LAYOUT_FILE = os.environ.get('EVENT_LAYOUT_FILE', 'event_layouts.json')
+# 레이아웃을 신뢰하기 전 필요한 일치 횟수
+EVENT_LAYOUT_MIN_CONFIRMATIONS = int(os.environ.get('EVENT_LAYOUT_MIN_CONFIRMATIONS', '3'))
+
+
+def _words(data):
+    """로그 data → 32바이트 워드 목록 (hex 문자열)"""
+    body = data[2:] if data.startswith('0x') else data
+    return [body[i:i + 64] for i in range(0, len(body) - 63, 64)]
+
+
+def _address_word(address):
+    """주소 → 32바이트 패딩 워드"""
+    return address.lower()[2:].rjust(64, '0')
+
+
+class LogDecoder:
+    """topic0별 레이아웃(주소/수량 위치)을 학습해 로그를 직접 이벤트로 변환
+
+    레이아웃은 트랜잭션 조회로 확정된 이벤트와 로그를 대조해 학습한다.
+    한 topic0가 여러 종류의 트랜잭션(stake/unstake/기타)에서 관찰되면
+    신뢰하지 않으며, 디코드하지 못한 로그는 트랜잭션 조회로 넘긴다.
+
+    base_path를 주면 그 파일에서 시작하고 저장은 path에만 한다
+    (샤드 워커: 공용 레이아웃에서 시작해 샤드 파일에 기록 → 부모가 merge_from).
+    """
+
+    def __init__(self, path=EVENT_LAYOUT_FILE, min_confirmations=EVENT_LAYOUT_MIN_CONFIRMATIONS, base_path=None):
+        self.path = path
+        self.min_confirmations = min_confirmations
+        self.layouts = {}
+        self.seen_types = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load(base_path or path)
+
+    def _load(self, path):
+        """저장된 레이아웃 로드"""
+        try:
+            with open(path, 'r') as f:
+                saved = json.load(f)
+            self.layouts = saved.get('layouts', {})
+            self.seen_types = {topic: set(types) for topic, types in saved.get('seen_types', {}).items()}
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError) as e:
+            logger.warning(f"⚠️ 이벤트 레이아웃 파일 손상, 새로 학습합니다: {e}")
+
+    def save(self):
+        """변경된 레이아웃 저장"""
+        with self._lock:
+            if not self._dirty:
+                return
+            saved = {
+                'layouts': self.layouts,
+                'seen_types': {topic: sorted(types) for topic, types in self.seen_types.items()}
+            }
+            atomic_write_json(self.path, saved, indent=2)
+            self._dirty = False
+
+    def merge_from(self, path):
+        """다른 레이아웃 파일(샤드 워커 학습분)을 합침 → 바뀐 topic0 수
+
+        관찰된 트랜잭션 종류는 합집합이고, 같은 레이아웃이면 확인 횟수는 큰 쪽을 쓴다
+        (샤드 파일의 횟수에는 시작 시 불러온 공용 횟수가 이미 포함돼 있어 더하면 중복됨).
+        """
+        other = LogDecoder(path, self.min_confirmations)
+        changed = set()
+        with self._lock:
+            for topic0, types in other.seen_types.items():
+                known = self.seen_types.setdefault(topic0, set())
+                if not types <= known:
+                    known |= types
+                    changed.add(topic0)
+            for topic0, candidate in other.layouts.items():
+                layout = self.layouts.get(topic0)
+                if layout and all(layout[k] == candidate[k] for k in ('type', 'address', 'amount_word')):
+                    if candidate['confirmations'] > layout['confirmations']:
+                        layout['confirmations'] = candidate['confirmations']
+                        changed.add(topic0)
+                elif layout != candidate:
+                    if layout:
+                        logger.warning(f"⚠️ 샤드 학습 레이아웃 불일치, 교체: {topic0[:10]}...")
+                    self.layouts[topic0] = dict(candidate)
+                    changed.add(topic0)
+            if changed:
+                self._dirty = True
+        return len(changed)
+
+    def trusted_layout(self, topic0):
+        """신뢰 가능한 레이아웃의 사본 (없으면 None)
+
+        learn()이 다른 스레드에서 layouts/seen_types를 고치므로 잠금을 잡고 읽는다.
+        """
+        with self._lock:
+            layout = self.layouts.get(topic0)
+            if not layout or layout['confirmations'] < self.min_confirmations:
+                return None
+            if self.seen_types.get(topic0) != {layout['type']}:
+                return None
+            return dict(layout)
+
+    def decode_log(self, log, layout):
+        """레이아웃에 따라 로그 하나를 이벤트로 변환 (실패 시 None)"""
+        topics = log.get('topics', [])
+        words = _words(log.get('data', '0x'))
+        try:
+            source, index = layout['address']
+            address_word = topics[index][2:] if source == 'topic' else words[index]
+            amount = 0
+            if layout['amount_word'] is not None:
+                amount = int(words[layout['amount_word']], 16) / (10**18)
+        except (IndexError, ValueError):
+            return None
+
+        return {
+            'type': layout['type'],
+            'address': '0x' + address_word[-40:].lower(),
+            'amount': amount,
+            'block': int(log['blockNumber'], 16),
+            'block_hash': log.get('blockHash'),
+            'log_index': int(log.get('logIndex', '0x0'), 16),
+            'timestamp': int(log['blockTimestamp'], 16) if log.get('blockTimestamp') else None,
+            'hash': log['transactionHash']
+        }
+
+    def decode(self, logs):
+        """로그 목록 → (이벤트 목록, 디코드 못한 트랜잭션의 로그 목록)
+
+        트랜잭션당 이벤트는 하나 (기존 method id 기준 처리와 동일).
+        """
+        logs_by_tx = {}
+        for log in logs:
+            if not log.get('removed'):
+                logs_by_tx.setdefault(log['transactionHash'], []).append(log)
+
+        events = []
+        undecoded = []
+        layouts = {}  # 이번 호출 동안 topic0별 레이아웃 (잠금은 topic0마다 한 번)
+        for tx_logs in logs_by_tx.values():
+            event = None
+            for log in sorted(tx_logs, key=lambda l: int(l.get('logIndex', '0x0'), 16)):
+                topic0 = (log.get('topics') or [None])[0]
+                if topic0 not in layouts:
+                    layouts[topic0] = self.trusted_layout(topic0)
+                layout = layouts[topic0]
+                if layout:
+                    event = self.decode_log(log, layout)
+                    if event:
+                        break
+            if event:
+                events.append(event)
+            else:
+                undecoded.extend(tx_logs)
+        return events, undecoded
+
+    def learn(self, tx_logs, event):
+        """트랜잭션 조회로 확정된 결과(event 또는 None)와 로그를 대조해 학습"""
+        event_type = event['type'] if event else 'other'
+        with self._lock:
+            for log in tx_logs:
+                topics = log.get('topics') or []
+                if not topics:
+                    continue
+                topic0 = topics[0]
+                types = self.seen_types.setdefault(topic0, set())
+                if event_type not in types:
+                    types.add(event_type)
+                    self._dirty = True
+                if event is None:
+                    continue
+
+                candidate = self._find_layout(log, event)
+                if candidate is None:
+                    continue
+
+                layout = self.layouts.get(topic0)
+                if layout and all(layout[k] == candidate[k] for k in ('type', 'address', 'amount_word')):
+                    layout['confirmations'] += 1
+                else:
+                    if layout:
+                        logger.warning(f"⚠️ 이벤트 레이아웃 불일치, 재학습: {topic0[:10]}...")
+                    candidate['confirmations'] = 1
+                    self.layouts[topic0] = candidate
+                self._dirty = True
+
+    def _find_layout(self, log, event):
+        """로그에서 이벤트의 주소/수량 위치 탐색"""
+        topics = log.get('topics', [])
+        words = _words(log.get('data', '0x'))
+        target = _address_word(event['address'])
+
+        address = None
+        for i, topic in enumerate(topics[1:], 1):
+            if topic[2:].lower() == target:
+                address = ['topic', i]
+                break
+        if address is None:
+            for i, word in enumerate(words):
+                if word.lower() == target:
+                    address = ['data', i]
+                    break
+        if address is None:
+            return None
+
+        amount_word = None
+        if event['type'] == 'stake':
+            for i, word in enumerate(words):
+                if int(word, 16) / (10**18) == event['amount'] and event['amount'] > 0:
+                    amount_word = i
+                    break
+            if amount_word is None:
+                return None
+
+        return {'type': event['type'], 'address': address, 'amount_word': amount_word}
+
+
+_default_decoder = None
+_default_lock = threading.Lock()
+
+
+def set_log_decoder(decoder):
+    """프로세스 공용 로그 디코더 교체 (샤드 워커가 자기 파일에 기록할 때)"""
+    global _default_decoder
+    with _default_lock:
+        _default_decoder = decoder
+
+
+def get_log_decoder():
+    """프로세스 공용 로그 디코더"""
+    global _default_decoder
+    if _default_decoder is None:
+        with _default_lock:
+            if _default_decoder is None:
+                _default_decoder = LogDecoder()
+    return _default_decoder
@@ -0,0 +1,299 @@
+# === 증분 순위 엔진 (타임스코어 정렬 유지, 변경된 지갑만 재삽입) ===
+import heapq
+import json
+import logging
+import os
+from bisect import bisect_left
+
+from atomic_file import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+# checkpoint.json과 같은 디렉토리에 저장 (GitHub Actions 캐시로 보존)
+RANKING_STATE_FILE = os.environ.get('RANKING_STATE_FILE', 'ranking_state.json')
+# 한 번에 처리할 순서 교환이 지갑 수의 이 비율을 넘으면 전체 재정렬이 더 빠름
+RANKING_MAX_SWAP_RATIO = 0.05
+# 순위/점수 변동(rank_change_24h, score_change_24h)의 비교 기간 (초)
+RANKING_CHANGE_SECONDS = 86400
+# 순위 스냅샷 간격 (비교 대상은 RANKING_CHANGE_SECONDS ~ +이 간격 전 스냅샷, 짧을수록 저장 파일이 커짐)
+RANKING_SNAPSHOT_SECONDS = int(os.environ.get('RANKING_SNAPSHOT_SECONDS', '10800'))
+
+
+def score_line(total_staked, first_stake_time):
+    """타임스코어 = a * t - b 의 (a, b) (t: 현재 시각, 초)"""
+    if not first_stake_time:
+        return (0.0, 0.0)
+    a = total_staked / 86400
+    return (a, a * first_stake_time)
+
+
+class RankingEngine:
+    """타임스코어 내림차순 순위를 유지하는 키네틱 정렬 리스트
+
+    타임스코어(total_staked × 보유일수)는 시간에 따라 선형으로 증가하므로
+    인접한 두 지갑의 순서가 뒤바뀌는 시각을 힙에 넣어 두고, 흐른 시간만큼의
+    인접 교환만 처리한다. 새 이벤트로 바뀐 지갑만 빼고 다시 넣으므로
+    실행당 작업량은 (변경 지갑 수 + 순서 교환 수) × log n 에 비례한다.
+    동점은 주소 오름차순.
+    """
+
+    def __init__(self):
+        self.order = []
+        self.lines = {}
+        self.as_of = 0
+        self.block = None
+        self.last_deltas = {}
+        self.snapshots = []      # 시각 순 [{'as_of': 시각, 'order': 주소 목록, 'scores': 같은 순서의 점수}]
+        self._snapshot_index = {}    # 스냅샷 as_of → {address: 위치}
+        self._certs = []
+
+    # === 점수/위치 ===
+
+    def score(self, address, t):
+        """t 시점 타임스코어"""
+        a, b = self.lines[address]
+        return a * t - b
+
+    def _sort_key(self, t, lines=None):
+        """t 시점 정렬 키 함수 (lines로 일부 지갑의 이전 점수식 지정)"""
+        def key(address):
+            a, b = (lines or self.lines).get(address) or self.lines[address]
+            return (b - a * t, address)
+        return key
+
+    @staticmethod
+    def _find(order, address, key):
+        """정렬된 order에서 address 위치 (부동소수 오차 시 전체 검색)"""
+        i = bisect_left(order, key(address), key=key)
+        # 점수가 같은 이웃끼리는 순서가 어긋날 수 있어 주변부터 확인
+        for j in range(max(i - 2, 0), min(i + 3, len(order))):
+            if order[j] == address:
+                return j
+        return order.index(address)
+
+    def rank_of(self, address):
+        """현재 순위 (1부터, 없으면 None)"""
+        if address not in self.lines:
+            return None
+        return self._find(self.order, address, self._sort_key(self.as_of)) + 1
+
+    # === 순서 교환 예약 ===
+
+    def _cross_time(self, upper, lower):
+        """lower가 upper를 추월하는 시각 (추월하지 않으면 None)"""
+        a_up, b_up = self.lines[upper]
+        a_low, b_low = self.lines[lower]
+        if a_low <= a_up:
+            return None
+        return (b_low - b_up) / (a_low - a_up)
+
+    def _watch(self, i):
+        """order[i], order[i+1] 쌍의 교환 시각 예약"""
+        if 0 <= i < len(self.order) - 1:
+            upper, lower = self.order[i], self.order[i + 1]
+            t = self._cross_time(upper, lower)
+            if t is not None:
+                heapq.heappush(self._certs, (t, upper, lower))
+
+    def _rebuild_certs(self):
+        """모든 인접 쌍의 교환 시각 재계산"""
+        self._certs = []
+        for i in range(len(self.order) - 1):
+            self._watch(i)
+
+    def advance(self, now):
+        """now까지 시간 경과 반영 → 순서가 바뀐 지갑 집합"""
+        swapped = set()
+        last = self.as_of
+        max_swaps = max(64, int(len(self.order) * RANKING_MAX_SWAP_RATIO))
+        while self._certs and self._certs[0][0] <= now:
+            if len(swapped) > max_swaps:
+                # 오래 실행하지 않아 순서가 크게 바뀐 경우: 거의 정렬된 목록이라 Timsort가 빠름
+                self.order.sort(key=self._sort_key(now))
+                self.as_of = max(self.as_of, now)
+                self._rebuild_certs()
+                return set(self.order)
+            t, upper, lower = heapq.heappop(self._certs)
+            # 지갑이 바뀌었거나 더 이상 인접하지 않은 예약은 무시
+            if upper not in self.lines or lower not in self.lines or self._cross_time(upper, lower) != t:
+                continue
+            # 교환 시각에는 두 점수가 같으므로 직전 교환과의 중간 시점 순서로 위치 검색
+            t = max(t, last)
+            i = self._find(self.order, upper, self._sort_key((last + t) / 2))
+            if i + 1 >= len(self.order) or self.order[i + 1] != lower:
+                continue
+            self.order[i], self.order[i + 1] = lower, upper
+            swapped.update((upper, lower))
+            self._watch(i - 1)
+            self._watch(i + 1)
+            last = t
+        self.as_of = max(self.as_of, now)
+
+        # 무효 예약이 쌓이면 정리
+        if len(self._certs) > 4 * len(self.order) + 64:
+            self._rebuild_certs()
+        return swapped
+
+    # === 갱신 ===
+
+    def _remove(self, address):
+        """지갑 제거 (현재 as_of 시점 순서 기준)"""
+        i = self._find(self.order, address, self._sort_key(self.as_of))
+        del self.order[i]
+        del self.lines[address]
+        self._watch(i - 1)
+
+    def _insert(self, address, line):
+        """지갑 삽입 (현재 as_of 시점 순서 기준)"""
+        self.lines[address] = line
+        key = self._sort_key(self.as_of)
+        i = bisect_left(self.order, key(address), key=key)
+        self.order.insert(i, address)
+        self._watch(i - 1)
+        self._watch(i)
+
+    def rebuild(self, wallets, now):
+        """전체 재구성: wallets = {address: (total_staked, first_stake_time)}"""
+        self.lines = {addr: score_line(staked, first) for addr, (staked, first) in wallets.items() if staked > 0}
+        self.order = sorted(self.lines, key=self._sort_key(now))
+        self.as_of = now
+        self._rebuild_certs()
+        self.last_deltas = {}
+
+    def update(self, changes, now):
+        """변경된 지갑만 반영 → {address: (이전 순위, 새 순위)} (없으면 None)
+
+        changes = {address: (total_staked, first_stake_time)}, total_staked가 0이면 제거.
+        델타에는 재삽입된 지갑과 시간 경과로 순서가 바뀐 지갑만 포함되며,
+        나머지 지갑은 최종 순서(order)에서 위치가 밀리거나 당겨질 뿐이다.
+        """
+        previous_order = self.order[:]
+        previous_lines = {addr: self.lines[addr] for addr in changes if addr in self.lines}
+        previous_key = self._sort_key(self.as_of, previous_lines)
+
+        for address in previous_lines:
+            self._remove(address)
+        swapped = self.advance(now)
+        for address, (staked, first) in changes.items():
+            if staked > 0:
+                self._insert(address, score_line(staked, first))
+
+        touched = set(changes) | swapped
+        if len(touched) > len(self.order) // 8:
+            # 대부분 바뀐 경우 이진 탐색보다 위치 사전이 빠름
+            previous_rank = {addr: i for i, addr in enumerate(previous_order, 1)}
+            new_rank = {addr: i for i, addr in enumerate(self.order, 1)}
+            find_old, find_new = previous_rank.get, new_rank.get
+        else:
+            key = self._sort_key(self.as_of)
+            def find_old(address):
+                was_ranked = address in previous_lines or address not in changes
+                return self._find(previous_order, address, previous_key) + 1 if was_ranked else None
+            def find_new(address):
+                return self._find(self.order, address, key) + 1 if address in self.lines else None
+
+        deltas = {}
+        for address in touched:
+            old, new = find_old(address), find_new(address)
+            if old != new:
+                deltas[address] = (old, new)
+        self.last_deltas = deltas
+        return deltas
+
+    # === 변동 기준 ===
+
+    def record_snapshot(self, now):
+        """마지막 스냅샷 후 RANKING_SNAPSHOT_SECONDS가 지났으면 현재 순서/점수 기록 → 기록 여부
+
+        update()의 델타는 재삽입/교환된 지갑만 담고 그 사이로 밀린 지갑의 순위 변화는 빠지므로,
+        변동 컬럼은 약 하루 전 전체 순서와 비교해 구한다. 비교 대상(하루 이상 지난 것 중 가장
+        최근 스냅샷)보다 오래된 스냅샷은 버린다.
+        """
+        if self.snapshots and now - self.snapshots[-1]['as_of'] < RANKING_SNAPSHOT_SECONDS:
+            return False
+        self.snapshots.append({
+            'as_of': now,
+            'order': self.order[:],
+            'scores': [self.score(address, now) for address in self.order]
+        })
+        reference = self._reference_position(now)
+        if reference:
+            del self.snapshots[:reference]
+        self._snapshot_index = {}
+        return True
+
+    def _reference_position(self, now):
+        """RANKING_CHANGE_SECONDS 이상 지난 스냅샷 중 가장 최근 것의 위치 (없으면 None)"""
+        position = None
+        for i, snapshot in enumerate(self.snapshots):
+            if now - snapshot['as_of'] >= RANKING_CHANGE_SECONDS:
+                position = i
+        return position
+
+    def reference_snapshot(self, now):
+        """now 기준 변동 비교 대상 스냅샷 (하루 이상 지난 스냅샷이 아직 없으면 None)"""
+        position = self._reference_position(now)
+        return None if position is None else self.snapshots[position]
+
+    def _positions(self, snapshot):
+        """스냅샷의 {address: 위치} (as_of별로 캐시)"""
+        index = self._snapshot_index.get(snapshot['as_of'])
+        if index is None:
+            index = {addr: i for i, addr in enumerate(snapshot['order'])}
+            self._snapshot_index[snapshot['as_of']] = index
+        return index
+
+    def change_of(self, address, rank, now):
+        """비교 대상 스냅샷 대비 (순위 변동, 점수 변동) (양수 = 상승, 그때 없던 지갑은 (0, 0))
+
+        점수 변동은 최신 스냅샷과 비교 대상 스냅샷의 차이라 스냅샷이 새로 기록될 때만 바뀐다
+        (현재 점수를 쓰면 매 실행 모든 활성 지갑 행이 바뀌어 업로드 델타가 커짐).
+        """
+        reference = self.reference_snapshot(now)
+        if reference is None:
+            return 0, 0.0
+        i = self._positions(reference).get(address)
+        if i is None:
+            return 0, 0.0
+        latest = self.snapshots[-1]
+        j = self._positions(latest).get(address)
+        score_change = 0.0 if j is None else latest['scores'][j] - reference['scores'][i]
+        return i + 1 - rank, score_change
+
+    # === 저장/로드 ===
+
+    def save(self, path=RANKING_STATE_FILE):
+        """엔진 상태 저장
+
+        전체 상태를 한 파일로 다시 쓰므로 지갑 수에 비례한다 (O(n)). 저장은 게시할 때만
+        일어나고 게시 자체(행 생성, 업로드)가 이미 O(n)이라 증분 저장 로그는 두지 않는다.
+        보관 중인 순위 스냅샷(하루 / RANKING_SNAPSHOT_SECONDS + 1개 정도)도 함께 저장된다.
+        """
+        atomic_write_json(path, {
+            'block': self.block,
+            'as_of': self.as_of,
+            'order': self.order,
+            'lines': self.lines,
+            'certs': self._certs,
+            'snapshots': self.snapshots
+        })
+
+    @classmethod
+    def load(cls, path=RANKING_STATE_FILE):
+        """저장된 엔진 상태 로드 (없거나 손상되면 빈 엔진)"""
+        engine = cls()
+        try:
+            with open(path, 'r') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return engine
+        except ValueError as e:
+            logger.warning(f"⚠️ 순위 엔진 상태 손상, 전체 재계산합니다: {e}")
+            return engine
+        engine.block = state['block']
+        engine.as_of = state['as_of']
+        engine.order = state['order']
+        engine.lines = {addr: tuple(line) for addr, line in state['lines'].items()}
+        engine._certs = [tuple(cert) for cert in state['certs']]
+        engine.snapshots = state.get('snapshots', [])
+        return engine
@@ -0,0 +1,137 @@
+# === 미확정 블록 구간 (체인 재구성 감지 + 롤백) ===
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# 최신 블록에서 이 깊이 안쪽은 미확정으로 보고 되돌릴 수 있게 기록 (0이면 사용 안 함)
+CONFIRMATION_DEPTH = int(os.environ.get('CONFIRMATION_DEPTH', '12'))
+
+
+class TentativeWindow:
+    """확정 블록 이후(start ~ head)에 적용한 이벤트의 되돌리기 기록
+
+    이벤트가 있는 블록마다 첫 이벤트 직전의 지갑 수와, 그 블록에서 바뀐 기존 지갑의
+    이전 값을 둔다. 이벤트 블록/head/확정 경계 블록의 해시를 함께 저장해 다음 실행에서
+    다시 확인하고, 해시가 달라진 지점 이후의 기록을 역순으로 적용해 되돌린다.
+    상태는 지갑 스냅샷 메타에 함께 저장되어 스냅샷 블록(head)과 항상 짝이 맞는다.
+    """
+
+    def __init__(self, depth=CONFIRMATION_DEPTH):
+        self.depth = depth
+        self.clear()
+
+    def clear(self):
+        """기록 없음 (전체 스캔, 이전 버전 상태 등)"""
+        self.confirmed = None   # 마지막 확정 블록 (이 블록까지는 되돌리지 않음)
+        self.base_hash = None   # 확정 경계 블록 해시 (구간보다 깊은 재구성 감지용)
+        self.head = None
+        self.hashes = {}        # {블록: 해시}
+        self.undo = {}          # {블록: {'count': 지갑 수, 'rows': {주소: 이전 값}}}
+
+    def __bool__(self):
+        return self.confirmed is not None
+
+    # === 저장/로드 ===
+
+    def to_dict(self):
+        """스냅샷 메타용 (JSON 키는 문자열이라 블록은 목록으로)"""
+        if not self:
+            return None
+        return {
+            'depth': self.depth,
+            'confirmed': self.confirmed,
+            'base_hash': self.base_hash,
+            'head': self.head,
+            'hashes': sorted(self.hashes.items()),
+            'undo': [[block, entry['count'], entry['rows']] for block, entry in sorted(self.undo.items())]
+        }
+
+    def load(self, data):
+        """to_dict() 결과로 교체 (None이면 기록 없음)"""
+        self.clear()
+        if not data:
+            return
+        self.confirmed = data['confirmed']
+        self.base_hash = data.get('base_hash')
+        self.head = data['head']
+        self.hashes = {block: block_hash for block, block_hash in data['hashes']}
+        self.undo = {block: {'count': count, 'rows': rows} for block, count, rows in data['undo']}
+
+    # === 스캔 ===
+
+    def begin(self, head, fetch_hashes):
+        """head까지 스캔하기 전 호출: 새 확정 경계 이하 기록 정리, head/경계 해시 기록
+
+        fetch_hashes(블록 목록) → {블록: 해시}. head 해시는 스캔 전에 받으므로 스캔 중
+        재구성이 일어나면 다음 실행에서 불일치로 잡힌다 (안전한 쪽으로 오탐).
+        """
+        if self.depth <= 0:
+            self.clear()
+            return
+        confirmed = head - self.depth
+        self.hashes = {block: h for block, h in self.hashes.items() if block > confirmed}
+        self.undo = {block: entry for block, entry in self.undo.items() if block > confirmed}
+        hashes = fetch_hashes([confirmed, head])
+        self.confirmed = confirmed
+        self.base_hash = hashes.get(confirmed)
+        self.head = head
+        if hashes.get(head):
+            self.hashes[head] = hashes[head]
+
+    def record(self, event, state):
+        """이벤트 적용 직전 호출: 미확정 블록이면 되돌릴 값 기록"""
+        block = event['block']
+        if self.confirmed is None or block <= self.confirmed:
+            return
+        entry = self.undo.get(block)
+        if entry is None:
+            entry = self.undo[block] = {'count': len(state), 'rows': {}}
+        address = event['address']
+        if address not in entry['rows']:
+            wallet_id = state.id_of(address)
+            # 이 블록에서 새로 생긴 지갑은 지갑 수로 되돌림
+            if wallet_id is not None and wallet_id < entry['count']:
+                entry['rows'][address] = state.row(address)
+        if event.get('block_hash'):
+            self.hashes[block] = event['block_hash']
+
+    # === 재확인/롤백 ===
+
+    def validate(self, fetch_hashes):
+        """저장된 해시를 현재 체인과 비교 → 다시 스캔할 첫 블록 (변화 없으면 None)
+
+        조회에 실패한 해시도 불일치로 본다 (구간 전체를 다시 스캔하는 비용은 작음).
+        """
+        if not self:
+            return None
+        # 해시는 이전 블록을 포함하므로 head가 그대로면 구간 전체가 그대로 (조회 1건)
+        if self.head in self.hashes and fetch_hashes([self.head]).get(self.head) == self.hashes[self.head]:
+            return None
+        blocks = sorted(self.hashes)
+        current = fetch_hashes(blocks + [self.confirmed])
+        if self.base_hash and current.get(self.confirmed) != self.base_hash:
+            logger.warning(f"⚠️ 확정 블록 {self.confirmed:,}까지 재구성됨 (깊이 {self.depth} 초과) - "
+                           f"미확정 구간만 되돌립니다. 전체 스캔을 권장합니다.")
+            return self.confirmed + 1
+        previous = self.confirmed
+        for block in blocks:
+            if current.get(block) != self.hashes[block]:
+                logger.warning(f"🔀 체인 재구성 감지: 블록 {block:,} 해시 변경 → 블록 {previous + 1:,}부터 다시 스캔")
+                return previous + 1
+            previous = block
+        return None
+
+    def rollback(self, from_block, state):
+        """from_block 이후에 적용한 이벤트 되돌리기 → 바뀐 지갑 주소 집합"""
+        touched = set()
+        for block in sorted((b for b in self.undo if b >= from_block), reverse=True):
+            entry = self.undo.pop(block)
+            touched.update(state.truncate(entry['count']))
+            for address, row in entry['rows'].items():
+                state.set_wallet(address, **row)
+                touched.add(address)
+        self.hashes = {block: h for block, h in self.hashes.items() if block < from_block}
+        self.head = from_block - 1
+        logger.info(f"↩️ 블록 {from_block:,} 이후 이벤트 롤백: 지갑 {len(touched):,}개 복원")
+        return touched
@@ -0,0 +1,256 @@
+# === STAKE RPC 공용 전송 계층 (커넥션 풀 + keep-alive) ===
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# === 설정 (환경변수로 조정 가능) ===
+RPC_POOL_SIZE = int(os.environ.get('RPC_POOL_SIZE', '16'))
+RPC_DEFAULT_TIMEOUT = float(os.environ.get('RPC_TIMEOUT', '30'))
+RPC_BATCH_SIZE = int(os.environ.get('RPC_BATCH_SIZE', '50'))
+
+# 요청 속도 제한 (엔드포인트별 초당 요청 수 / 버스트)
+RPC_RATE_LIMIT = float(os.environ.get('RPC_RATE_LIMIT', '25'))
+RPC_BURST = int(os.environ.get('RPC_BURST', '50'))
+# 엔드포인트별 개별 설정: {"https://mainnet.base.org": [10, 20]}
+RPC_RATE_LIMITS = json.loads(os.environ.get('RPC_RATE_LIMITS', '{}'))
+RPC_MIN_RATE = 0.5
+RPC_THROTTLE_RETRIES = 3
+# 같은 엔드포인트를 함께 쓰는 프로세스 수 (샤드 워커는 속도 예산을 나눠 씀)
+_rate_share = 1
+
+# 메서드별 타임아웃 (초) - eth_getLogs는 범위에 따라 오래 걸릴 수 있음
+METHOD_TIMEOUTS = {
+    'eth_blockNumber': 10,
+    'eth_call': 15,
+    'eth_getBlockByNumber': 15,
+    'eth_getTransactionByHash': 15,
+    'eth_getLogs': 30,
+}
+
+
+def is_throttle_error(body):
+    """JSON-RPC 응답이 속도 제한 오류인지 확인"""
+    if not isinstance(body, dict) or not isinstance(body.get('error'), dict):
+        return False
+    error = body['error']
+    return error.get('code') in (429, -32005) or 'rate limit' in str(error.get('message', '')).lower()
+
+
+class RateLimiter:
+    """토큰 버킷 속도 제한 (429/오류 시 감속, 성공 시 설정값까지 서서히 회복)"""
+
+    def __init__(self, rate=RPC_RATE_LIMIT, burst=RPC_BURST, min_rate=RPC_MIN_RATE):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """토큰 하나 획득 (없으면 대기)"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def on_success(self):
+        """성공 응답: 설정 속도까지 가산 회복"""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_throttle(self, retry_after=None):
+        """429 응답: 속도 절반 + Retry-After 동안 정지"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.blocked_until = time.monotonic() + (retry_after if retry_after else 1 / self.rate)
+        logger.warning(f"🐢 속도 제한 감지: {self.rate:.1f} req/s로 감속")
+
+    def on_error(self):
+        """서버 오류/연결 실패: 속도 소폭 감소"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * 0.8)
+
+
+class RpcTransport:
+    """JSON-RPC HTTP 전송 (세션 재사용으로 TCP/TLS 핸드셰이크 절약)"""
+
+    def __init__(self, pool_size=RPC_POOL_SIZE, timeout=RPC_DEFAULT_TIMEOUT, method_timeouts=None,
+                 batch_size=RPC_BATCH_SIZE):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.method_timeouts = dict(METHOD_TIMEOUTS)
+        if method_timeouts:
+            self.method_timeouts.update(method_timeouts)
+
+        self._ids = itertools.count(1)
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+
+        # 호스트별 커넥션 풀 (재시도는 호출자가 직접 처리)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Connection': 'keep-alive',
+            'User-Agent': 'STAKE-Leaderboard-RPC/1.0'
+        })
+
+    def timeout_for(self, method):
+        """메서드별 타임아웃 조회"""
+        return self.method_timeouts.get(method, self.timeout)
+
+    def next_id(self):
+        """JSON-RPC 요청 id 발급"""
+        return next(self._ids)
+
+    def limiter_for(self, url):
+        """엔드포인트별 속도 제한기"""
+        with self._limiters_lock:
+            if url not in self._limiters:
+                rate, burst = RPC_RATE_LIMITS.get(url, (RPC_RATE_LIMIT, RPC_BURST))
+                rate, burst = rate / _rate_share, max(burst // _rate_share, 1)
+                self._limiters[url] = RateLimiter(rate, burst, min(RPC_MIN_RATE, rate))
+            return self._limiters[url]
+
+    def post(self, url, payload, timeout):
+        """속도 제한을 거친 POST → (response, 파싱된 JSON) (429는 대기 후 재시도)"""
+        limiter = self.limiter_for(url)
+        for attempt in range(RPC_THROTTLE_RETRIES + 1):
+            last_attempt = attempt == RPC_THROTTLE_RETRIES
+            limiter.acquire()
+            try:
+                response = self.session.post(url, json=payload, timeout=timeout)
+            except requests.RequestException:
+                limiter.on_error()
+                raise
+
+            if response.status_code == 429:
+                retry_after = response.headers.get('Retry-After', '')
+                limiter.on_throttle(float(retry_after) if retry_after.isdigit() else None)
+                if last_attempt:
+                    response.raise_for_status()
+                continue
+            if response.status_code >= 500:
+                limiter.on_error()
+
+            body = response.json()
+            if is_throttle_error(body):
+                limiter.on_throttle()
+                if not last_attempt:
+                    continue
+            elif response.status_code < 400:
+                limiter.on_success()
+            return response, body
+
+    def call(self, url, method, params, timeout=None, raise_for_status=False):
+        """단일 JSON-RPC 호출 → 응답 JSON (네트워크 예외는 호출자가 처리)"""
+        payload = {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params,
+            "id": self.next_id()
+        }
+        response, body = self.post(url, payload, timeout or self.timeout_for(method))
+        if raise_for_status:
+            response.raise_for_status()
+        return body
+
+    def batch_call(self, url, calls, batch_size=None, timeout=None):
+        """JSON-RPC 배치 호출 → 입력 순서대로 응답 목록
+
+        calls는 (method, params) 목록. 배치 전체가 실패하거나 응답에서 빠진
+        항목은 단건 호출로 재시도하고, 그래도 실패하면 None으로 채운다.
+        """
+        batch_size = batch_size or self.batch_size
+        responses = [None] * len(calls)
+
+        for start in range(0, len(calls), batch_size):
+            group = calls[start:start + batch_size]
+            payload = []
+            index_by_id = {}
+            for offset, (method, params) in enumerate(group):
+                request_id = self.next_id()
+                index_by_id[request_id] = start + offset
+                payload.append({
+                    "jsonrpc": "2.0",
+                    "method": method,
+                    "params": params,
+                    "id": request_id
+                })
+
+            group_timeout = timeout or max(self.timeout_for(method) for method, _ in group)
+            try:
+                _, body = self.post(url, payload, group_timeout)
+            except (requests.RequestException, ValueError) as e:
+                logger.warning(f"⚠️ 배치 요청 실패 ({len(group)}건): {e}")
+                body = None
+
+            # 배치 미지원 노드는 단일 에러 객체를 돌려줌
+            if isinstance(body, list):
+                for item in body:
+                    index = index_by_id.get(item.get('id')) if isinstance(item, dict) else None
+                    if index is not None:
+                        responses[index] = item
+
+            # 누락/실패 항목만 단건 재시도
+            for index in range(start, start + len(group)):
+                if responses[index] is not None:
+                    continue
+                method, params = calls[index]
+                try:
+                    responses[index] = self.call(url, method, params, timeout=timeout)
+                except (requests.RequestException, ValueError) as e:
+                    logger.warning(f"⚠️ 단건 재시도 실패 ({method}): {e}")
+
+        return responses
+
+    def close(self):
+        """세션 종료"""
+        self.session.close()
+
+
+def share_rate_limit(processes):
+    """엔드포인트별 속도/버스트를 processes개 프로세스가 나눠 쓰도록 설정
+
+    프로세스마다 속도 제한기가 따로 있으므로, 여러 워커가 같은 엔드포인트를 쓰면
+    합계가 설정값을 넘지 않게 각자 1/processes만 사용한다. 제한기 생성 전에 호출해야 한다.
+    """
+    global _rate_share
+    _rate_share = max(int(processes), 1)
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def get_transport():
+    """프로세스 공용 전송 객체 (지연 생성)"""
+    global _default_transport
+    if _default_transport is None:
+        with _default_lock:
+            if _default_transport is None:
+                _default_transport = RpcTransport()
+                logger.info(f"🔌 RPC 커넥션 풀 생성: 최대 {RPC_POOL_SIZE}개 연결")
+    return _default_transport
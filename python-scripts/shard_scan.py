@@ -0,0 +1,66 @@
+# === 샤드 전체 재스캔 (블록 구간별 워커 프로세스 + 블록 순서 병합) ===
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+# 전체 스캔 워커 프로세스 수 (1이면 기존 단일 프로세스 스캔, 0이면 CPU 수)
+FULL_SCAN_WORKERS = int(os.environ.get('FULL_SCAN_WORKERS', '1'))
+# 워커당 샤드 수 (이벤트가 몰린 구간이 있어도 워커가 놀지 않게 잘게 나눔)
+FULL_SCAN_SHARDS_PER_WORKER = int(os.environ.get('FULL_SCAN_SHARDS_PER_WORKER', '4'))
+# 샤드 하나의 최소 블록 수
+FULL_SCAN_SHARD_MIN_BLOCKS = int(os.environ.get('FULL_SCAN_SHARD_MIN_BLOCKS', '20000'))
+
+
+def scan_workers():
+    """설정된 워커 수 (0이면 CPU 수)"""
+    return FULL_SCAN_WORKERS if FULL_SCAN_WORKERS > 0 else (os.cpu_count() or 1)
+
+
+def plan_shards(start_block, end_block, count, min_blocks=FULL_SCAN_SHARD_MIN_BLOCKS):
+    """[start_block, end_block]을 연속된 샤드 (시작, 끝) 목록으로 분할"""
+    total = end_block - start_block + 1
+    if total <= 0:
+        return []
+    count = max(1, min(count, total // max(min_blocks, 1)))
+    size = -(-total // count)
+    return [(start, min(start + size - 1, end_block)) for start in range(start_block, end_block + 1, size)]
+
+
+def run_shards(shards, worker, worker_args=(), workers=None, on_merge=None):
+    """샤드를 워커 프로세스로 스캔하고 결과를 블록 순서대로 on_merge에 전달 → 샤드 수
+
+    worker(index, start, end, *worker_args)는 별도 프로세스에서 실행되는 모듈 수준 함수,
+    on_merge(index, start, end, result)는 부모 프로세스에서 샤드 순서대로 호출된다.
+    앞 샤드가 끝나기 전에 끝난 뒷 샤드는 기다렸다가 순서가 오면 병합하므로,
+    병합 결과는 완료 순서와 관계없이 항상 같다.
+    """
+    workers = min(workers or scan_workers(), len(shards)) or 1
+    started = time.perf_counter()
+    finished = {}
+    next_index = 0
+    # 부모의 스레드/DB 연결을 물려받지 않도록 spawn
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {executor.submit(worker, index, start, end, *worker_args): index
+                   for index, (start, end) in enumerate(shards)}
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                finished[index] = future.result()
+                logger.info(f"🧩 샤드 {index + 1}/{len(shards)} 완료 "
+                            f"(블록 {shards[index][0]:,}→{shards[index][1]:,}, {time.perf_counter() - started:.1f}초)")
+                while next_index in finished:
+                    if on_merge:
+                        on_merge(next_index, *shards[next_index], finished[next_index])
+                    del finished[next_index]
+                    next_index += 1
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    logger.info(f"✅ 샤드 스캔 완료: {len(shards)}개 샤드, 워커 {workers}개, {time.perf_counter() - started:.1f}초")
+    return len(shards)
@@ -0,0 +1,129 @@
+# === 지갑 상태 바이너리 스냅샷 (컬럼 배열 그대로, 블록 높이 기록) ===
+import json
+import logging
+import struct
+
+import numpy as np
+
+from atomic_file import atomic_write
+from wallet_state import WALLET_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'STKSNAP1'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_ALIGN = 64
+ADDRESS_BYTES = 20
+
+# 파일 구조: MAGIC | 헤더 길이(uint32 LE) | JSON 헤더 | (정렬 패딩) | 주소 n×20바이트 | 컬럼별 배열
+# 헤더의 offset은 파일 시작 기준이며 모든 구간은 64바이트 정렬이라 memmap으로 바로 읽는다.
+
+
+class SnapshotError(Exception):
+    """스냅샷 파일이 없거나 형식이 맞지 않음"""
+
+
+def _align(offset):
+    return -(-offset // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+
+
+def _layout(count, header_size):
+    """(주소 offset, {컬럼: offset}, 파일 크기)"""
+    offset = _align(len(SNAPSHOT_MAGIC) + 4 + header_size)
+    addresses_offset = offset
+    offset = _align(offset + count * ADDRESS_BYTES)
+    column_offsets = {}
+    for name, dtype in WALLET_COLUMNS.items():
+        column_offsets[name] = offset
+        offset = _align(offset + count * np.dtype(dtype).itemsize)
+    return addresses_offset, column_offsets, offset
+
+
+def _header(count, block, meta, header_size):
+    addresses_offset, column_offsets, size = _layout(count, header_size)
+    return {
+        'version': SNAPSHOT_VERSION,
+        'block': block,
+        'count': count,
+        'meta': meta or {},
+        'addresses': addresses_offset,
+        'columns': {name: {'dtype': np.dtype(dtype).str, 'offset': column_offsets[name]}
+                    for name, dtype in WALLET_COLUMNS.items()},
+        'size': size
+    }
+
+
+def write_snapshot(path, state, block, meta=None):
+    """WalletState를 block 시점 스냅샷으로 원자적 저장 → 파일 크기"""
+    count = len(state)
+    # offset이 헤더 길이에 따라 달라지므로 길이가 고정될 때까지 반복 (보통 2회)
+    header_size = 0
+    while True:
+        encoded = json.dumps(_header(count, block, meta, header_size)).encode('utf-8')
+        if len(encoded) <= header_size:
+            break
+        header_size = _align(len(encoded))
+    header = _header(count, block, meta, header_size)
+    encoded = json.dumps(header).encode('utf-8').ljust(header_size)
+    columns = state.columns()
+
+    def write(f):
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack('<I', header_size))
+        f.write(encoded)
+        f.seek(header['addresses'])
+        f.write(b''.join(state.address_keys()))
+        for name, dtype in WALLET_COLUMNS.items():
+            f.seek(header['columns'][name]['offset'])
+            f.write(np.ascontiguousarray(columns[name], dtype=np.dtype(dtype).newbyteorder('<')).tobytes())
+        f.truncate(header['size'])
+
+    atomic_write(path, write, binary=True)
+    return header['size']
+
+
+def read_snapshot_header(path):
+    """스냅샷 헤더만 읽기 (블록 높이 확인용)"""
+    try:
+        with open(path, 'rb') as f:
+            prefix = f.read(len(SNAPSHOT_MAGIC) + 4)
+            if len(prefix) < len(SNAPSHOT_MAGIC) + 4 or prefix[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                raise SnapshotError(f"스냅샷 형식이 아닙니다: {path}")
+            header_size, = struct.unpack('<I', prefix[len(SNAPSHOT_MAGIC):])
+            header = json.loads(f.read(header_size))
+    except FileNotFoundError:
+        raise SnapshotError(f"스냅샷 없음: {path}") from None
+    except ValueError as e:
+        raise SnapshotError(f"스냅샷 헤더 손상: {e}") from None
+    if header.get('version') != SNAPSHOT_VERSION:
+        raise SnapshotError(f"지원하지 않는 스냅샷 버전: {header.get('version')}")
+    return header
+
+
+def read_snapshot(path):
+    """스냅샷 로드 → (헤더, 주소 키 목록, {컬럼: 배열})
+
+    컬럼 배열은 파일을 memmap한 읽기 전용 뷰다 (WalletState.load_columns가 복사).
+    """
+    header = read_snapshot_header(path)
+    count = header['count']
+    data = np.memmap(path, dtype=np.uint8, mode='r') if header['size'] else np.zeros(0, dtype=np.uint8)
+    if len(data) != header['size']:
+        raise SnapshotError(f"스냅샷 크기 불일치: {len(data):,} / {header['size']:,}바이트")
+
+    start = header['addresses']
+    raw = data[start:start + count * ADDRESS_BYTES].tobytes()
+    keys = [raw[i:i + ADDRESS_BYTES] for i in range(0, len(raw), ADDRESS_BYTES)]
+    columns = {}
+    for name, info in header['columns'].items():
+        dtype = np.dtype(info['dtype'])
+        start = info['offset']
+        columns[name] = data[start:start + count * dtype.itemsize].view(dtype)
+    return header, keys, columns
+
+
+def load_snapshot(path, state):
+    """스냅샷을 WalletState에 로드 → 헤더"""
+    header, keys, columns = read_snapshot(path)
+    state.load_columns(keys, columns)
+    return header
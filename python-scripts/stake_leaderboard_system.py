@@ -6,9 +6,29 @@ import logging
 import time
 import schedule
 from datetime import datetime, timezone
-from collections import defaultdict
 import traceback
 import os
+import threading
+import shutil
+import numpy as np
+from block_cache import BlockTimestampCache, get_block_cache, set_block_cache
+from log_decoder import LogDecoder, get_log_decoder, set_log_decoder
+from event_store import EventStore, get_event_store, set_event_store
+from chunk_scanner import (scan_range, iter_chunks, get_chunk_controller, save_chunk_controllers, is_range_error,
+                           ChunkScanError, CHUNK_SIZE_FILE, set_chunk_size_file, merge_chunk_sizes)
+from endpoint_pool import EndpointPool
+from rpc_transport import is_throttle_error, share_rate_limit
+from atomic_file import atomic_write_json
+from ranking import RankingEngine
+from wallet_state import WalletState
+from backup_manifest import get_backup_manifest
+from upload_transport import encode_upload_body, sanitize_rows
+from chunk_upload import upload_chunks, resume_interrupted_upload
+from upload_delta import get_upload_baseline, new_upload_version
+from export_writers import export_rows, gzip_file, EXPORT_FORMATS
+from snapshot import write_snapshot, load_snapshot, read_snapshot_header, SnapshotError
+from reorg_window import TentativeWindow, CONFIRMATION_DEPTH
+from shard_scan import plan_shards, run_shards, scan_workers, FULL_SCAN_SHARDS_PER_WORKER
 
 # === 체크포인트 관리 함수들 ===
 def load_checkpoint():
@@ -37,10 +57,115 @@ def load_checkpoint():
 def save_checkpoint(checkpoint_data):
     """체크포인트 파일 저장"""
     checkpoint_file = 'checkpoint.json'
-    with open(checkpoint_file, 'w') as f:
-        json.dump(checkpoint_data, f, indent=2)
+    atomic_write_json(checkpoint_file, checkpoint_data, indent=2)
     logger.info(f"✅ 체크포인트 저장 완료")
 
+# === 지갑 상태 + 체크포인트 (한 파일로 원자적 커밋) ===
+WALLET_SNAPSHOT_FILE = os.environ.get('WALLET_SNAPSHOT_FILE', 'wallet_state.snap')
+# 이전 버전의 JSON 지갑 상태 (스냅샷이 없을 때만 읽음)
+WALLET_STATE_FILE = os.environ.get('WALLET_STATE_FILE', 'wallet_state.json')
+
+def commit_wallet_state(checkpoint_data):
+    """체크포인트와 그 시점의 staking_data를 하나의 단위로 저장
+
+    wallet_state.snap이 기준이며 checkpoint.json은 그 뒤에 갱신되는 사본이다.
+    둘 사이에서 중단되어도 다음 실행은 스냅샷에 기록된 블록/상태를 함께 사용한다.
+    """
+    block = checkpoint_data['last_incremental']['block']
+    size = write_snapshot(WALLET_SNAPSHOT_FILE, staking_data, block, {
+        'checkpoint': checkpoint_data,
+        'tentative': tentative_window.to_dict()
+    })
+    logger.info(f"💾 지갑 스냅샷 저장: {len(staking_data):,}개 지갑, 블록 {block:,} ({size / 1024:,.1f}KB)")
+    save_checkpoint(checkpoint_data)
+
+def load_wallet_state():
+    """저장된 지갑 상태를 staking_data에 로드 → 해당 체크포인트 (없으면 None)
+
+    체크포인트의 last_incremental 블록은 스냅샷 헤더의 블록 높이로 맞추고,
+    함께 저장된 미확정 구간 기록을 tentative_window에 복원한다.
+    """
+    tentative_window.clear()
+    try:
+        started = time.perf_counter()
+        header = load_snapshot(WALLET_SNAPSHOT_FILE, staking_data)
+    except SnapshotError as e:
+        if os.path.exists(WALLET_SNAPSHOT_FILE):
+            logger.warning(f"⚠️ 지갑 스냅샷 손상, 이전 상태 파일에서 복원합니다: {e}")
+        return load_legacy_wallet_state()
+    checkpoint = header['meta']['checkpoint']
+    checkpoint['last_incremental']['block'] = header['block']
+    tentative_window.load(header['meta'].get('tentative'))
+    logger.info(f"⚡ 지갑 스냅샷 로드: {header['count']:,}개 지갑, 블록 {header['block']:,} "
+                f"({(time.perf_counter() - started) * 1000:.1f}ms)")
+    return checkpoint
+
+def load_legacy_wallet_state():
+    """이전 버전 wallet_state.json 로드 → 체크포인트 (없으면 None)"""
+    try:
+        with open(WALLET_STATE_FILE, 'r') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        logger.warning(f"⚠️ 지갑 상태 파일 손상, 백업에서 복원합니다: {e}")
+        return None
+    restore_staking_data(state['staking_data'])
+    return state['checkpoint']
+
+def restore_staking_data(saved):
+    """저장된 staking_data 복원 (컬럼 형식 / 이전 지갑별 dict 형식)"""
+    if 'addresses' in saved:
+        staking_data.load_dict(saved)
+        return
+    staking_data.clear()
+    for addr, wallet in saved.items():
+        staking_data.set_wallet(addr, **{name: wallet.get(name) for name in (
+            'total_staked', 'stake_count', 'unstake_count', 'is_active', 'first_stake_time', 'last_action_time')})
+
+# === 전체 스캔 진행 상태 (중단 시 이어서 스캔) ===
+FULL_SCAN_STATE_FILE = os.environ.get('FULL_SCAN_STATE_FILE', 'full_scan_state.snap')
+# K개 청크마다 진행 상태 저장
+FULL_SCAN_COMMIT_CHUNKS = int(os.environ.get('FULL_SCAN_COMMIT_CHUNKS', '20'))
+# 한 번 실행에서 스캔할 최대 블록 수 (0이면 제한 없음, 여러 실행에 나누어 스캔)
+FULL_SCAN_MAX_BLOCKS = int(os.environ.get('FULL_SCAN_MAX_BLOCKS', '0'))
+
+def load_full_scan_state(restore=False):
+    """저장된 전체 스캔 진행 상태 로드 (없거나 손상되면 None)
+
+    restore=True면 진행 시점의 지갑 상태를 staking_data에 복원한다.
+    """
+    try:
+        state = read_snapshot_header(FULL_SCAN_STATE_FILE)['meta']
+        if state.get('genesis_block') != GENESIS_BLOCK:
+            logger.warning("⚠️ 제네시스 블록이 변경되어 저장된 진행 상태를 무시합니다.")
+            return None
+        if restore:
+            load_snapshot(FULL_SCAN_STATE_FILE, staking_data)
+    except SnapshotError as e:
+        if os.path.exists(FULL_SCAN_STATE_FILE):
+            logger.warning(f"⚠️ 전체 스캔 진행 파일 손상, 처음부터 스캔합니다: {e}")
+        return None
+    return state
+
+def save_full_scan_state(next_block, totals):
+    """지금까지 적용된 staking_data와 다음 스캔 블록 저장 (스냅샷 블록 = next_block - 1)"""
+    write_snapshot(FULL_SCAN_STATE_FILE, staking_data, next_block - 1, {
+        'genesis_block': GENESIS_BLOCK,
+        'next_block': next_block,
+        'total_stake_txs': totals['stake'],
+        'total_unstake_txs': totals['unstake'],
+        'updated_at': datetime.now(timezone.utc).isoformat()
+    })
+    logger.info(f"💾 전체 스캔 진행 저장: 다음 블록 {next_block:,}")
+
+def clear_full_scan_state():
+    """전체 스캔 완료 후 진행 파일 삭제"""
+    try:
+        os.remove(FULL_SCAN_STATE_FILE)
+    except FileNotFoundError:
+        pass
+
 # 로깅 설정
 logging.basicConfig(
     level=logging.INFO,
@@ -55,6 +180,10 @@ logger = logging.getLogger(__name__)
 # === 설정 변경: Sheet.best → Apps Script Web App ===
 SAFE_MODE = os.environ.get('SAFE_MODE', 'false').lower() == 'true'
 UPDATE_RANGE = os.environ.get('UPDATE_RANGE', 'A:U')
+# GitHub Pages에 leaderboard.json.gz도 함께 생성
+PAGES_GZIP = os.environ.get('PAGES_GZIP', 'false').lower() == 'true'
+# 백업 내보내기 형식 (json, csv, ndjson 중 쉼표 구분)
+BACKUP_FORMATS = [fmt for fmt in os.environ.get('BACKUP_FORMATS', 'json,csv').split(',') if fmt in EXPORT_FORMATS]
 
 if SAFE_MODE:
     logger.info("🛡️ 안전 모드 활성화: 기존 21개 컬럼만 업데이트")
@@ -64,6 +193,13 @@ else:
 
 # === 설정 ===
 RPC_URL = "https://mainnet.base.org"
+# 🆕 다중 RPC 엔드포인트 (쉼표 구분, 상태가 좋은 순서로 자동 라우팅)
+RPC_URLS = [url.strip() for url in os.environ.get('RPC_URLS', ','.join([
+    RPC_URL,
+    "https://base-mainnet.public.blastapi.io",
+    "https://1rpc.io/base",
+    "https://base.gateway.tenderly.co"
+])).split(',') if url.strip()]
 STAKING_ADDRESS = "0xBa13ae24684bee910820Be1Fcf52067332F8412f"
 TOKEN_ADDRESS = "0xA9C8bDDcb113068713193D030abB86C7e8D1F5bB"
 STAKE_METHOD_ID = "0xa694fc3a"
@@ -82,6 +218,9 @@ if not APPS_SCRIPT_WEB_APP_URL:
 else:
     logger.info(f"✅ Apps Script Web App URL 설정 완료: {APPS_SCRIPT_WEB_APP_URL[:50]}...")
 
+# 증분 실행 한 번에 스캔할 최대 블록 수 (남은 블록은 체크포인트부터 다음 실행에서 이어서)
+INCREMENTAL_SCAN_MAX_BLOCKS = int(os.environ.get('INCREMENTAL_SCAN_MAX_BLOCKS', '10000'))
+
 # 페이즈 설정
 CURRENT_PHASE = 1
 TOTAL_PHASES = 6
@@ -89,18 +228,19 @@ TOTAL_SUPPLY = 1_000_000_000
 AIRDROP_PERCENT = 0.25
 PHASE_REWARD = (TOTAL_SUPPLY * AIRDROP_PERCENT) / TOTAL_PHASES
 
-# 전체 데이터 저장소
-staking_data = defaultdict(lambda: {
-    'total_staked': 0,
-    'stake_count': 0,
-    'unstake_count': 0,
-    'unstake_attempts': [],
-    'is_active': True,
-    'first_stake_time': None,
-    'last_action_time': None,
-    'stake_transactions': [],
-    'unstake_transactions': []
-})
+# 전체 데이터 저장소 (지갑별 집계 컬럼, 트랜잭션 이력은 이벤트 저장소)
+staking_data = WalletState()
+
+# 순위 엔진 동기화 정보 (staking_data가 반영한 블록, 이번 실행에서 바뀐 지갑)
+ranking_sync = {
+    'base_block': None,   # 로드한 staking_data의 기준 블록 (새로 만들었으면 None)
+    'block': None,        # 현재 staking_data가 반영한 블록
+    'dirty': set()
+}
+_ranking_engine = None
+
+# 확정 깊이 안쪽(최신 CONFIRMATION_DEPTH블록)에 적용한 이벤트의 되돌리기 기록
+tentative_window = TentativeWindow()
 
 # === 안전 모드용 컬럼 정의 ===
 SAFE_MODE_COLUMNS = [
@@ -128,17 +268,22 @@ def apply_safe_mode_filter(data):
     logger.info(f"✅ 안전 모드 필터링 완료: {len(filtered_data)}개 항목, {len(SAFE_MODE_COLUMNS)}개 컬럼")
     return filtered_data
 
+_rpc_pool = None
+_rpc_pool_lock = threading.Lock()
+
+def get_rpc_pool():
+    """RPC 엔드포인트 풀 (지연 생성)"""
+    global _rpc_pool
+    if _rpc_pool is None:
+        with _rpc_pool_lock:
+            if _rpc_pool is None:
+                _rpc_pool = EndpointPool(RPC_URLS)
+    return _rpc_pool
+
 def rpc_call(method, params):
     """RPC 호출 with 에러 핸들링"""
     try:
-        response = requests.post(RPC_URL, json={
-            "jsonrpc": "2.0",
-            "method": method,
-            "params": params,
-            "id": 1
-        }, timeout=30)
-        
-        result = response.json()
+        result = get_rpc_pool().call(method, params)
         if 'error' in result:
             logger.error(f"RPC Error: {result['error']}")
             return None
@@ -147,6 +292,20 @@ def rpc_call(method, params):
         logger.error(f"RPC 호출 실패: {e}")
         return None
 
+def rpc_batch_call(calls):
+    """RPC 배치 호출 (실패한 항목만 None)"""
+    try:
+        responses = get_rpc_pool().batch_call(calls)
+    except Exception as e:
+        logger.error(f"RPC 배치 호출 실패: {e}")
+        return [None] * len(calls)
+
+    for i, result in enumerate(responses):
+        if result and 'error' in result:
+            logger.error(f"RPC Error ({calls[i][0]}): {result['error']}")
+            responses[i] = None
+    return responses
+
 def get_latest_block():
     """최신 블록 번호 조회"""
     result = rpc_call("eth_blockNumber", [])
@@ -165,94 +324,393 @@ def decode_amount(input_data):
         return 0
 
 def safe_scan_chunk(start_block, end_block, max_retries=3):
-    """안전한 청크 스캔 with 재시도"""
+    """안전한 청크 스캔 with 재시도 (창 크기는 ChunkSizeController가 학습)
+
+    재시도 후에도 실패하면 ChunkScanError (나누어 스캔한 조각의 실패도 그대로 전달).
+    호출한 쪽은 체크포인트/진행 상태를 저장하지 않고 중단해야 한다.
+    """
+    rpc_pool = get_rpc_pool()
+    controller = get_chunk_controller(rpc_pool.best())
     chunk_size = end_block - start_block + 1
     
-    # 1500블록 초과하면 나누기
-    if chunk_size > 1500:
-        mid = start_block + 1499
-        logs1 = safe_scan_chunk(start_block, mid, max_retries)
-        logs2 = safe_scan_chunk(mid + 1, end_block, max_retries)
-        return logs1 + logs2
+    # 학습된 상한보다 크면 나누기
+    if chunk_size > controller.ceiling:
+        return scan_in_pieces(start_block, end_block, controller.ceiling, max_retries)
     
     # 재시도 로직
     for attempt in range(max_retries):
+        started = time.monotonic()
         try:
-            result = rpc_call("eth_getLogs", [{
+            rpc_url, result = rpc_pool.request("eth_getLogs", [{
                 "fromBlock": hex(start_block),
                 "toBlock": hex(end_block),
                 "address": STAKING_ADDRESS
-            }])
-            
-            if result and 'error' in result:
-                if chunk_size > 1000:
-                    mid = start_block + 999
-                    logs1 = safe_scan_chunk(start_block, mid, max_retries)
-                    logs2 = safe_scan_chunk(mid + 1, end_block, max_retries)
-                    return logs1 + logs2
-                else:
-                    logger.warning(f"청크 스캔 실패: {result['error']}")
-                    return []
-            
-            elif result and 'result' in result:
-                return result['result']
-            else:
-                logger.warning(f"빈 결과: 블록 {start_block}-{end_block}")
-                return []
-                
+            }], url=controller.rpc_url)
+            # 헤지/전환으로 다른 엔드포인트가 응답했으면 그쪽 학습값에 반영
+            controller = get_chunk_controller(rpc_url)
+        except requests.exceptions.Timeout:
+            # 타임아웃: 창 축소 후 나누어 재시도
+            new_size = controller.record_failure(chunk_size, timeout=True)
+            if chunk_size > new_size:
+                return scan_in_pieces(start_block, end_block, new_size, max_retries)
+            logger.error(f"청크 스캔 시도 {attempt + 1} 타임아웃: 블록 {start_block}-{end_block}")
+            continue
         except Exception as e:
             logger.error(f"청크 스캔 시도 {attempt + 1} 실패: {e}")
             if attempt < max_retries - 1:
                 time.sleep(2 ** attempt)
-            
-    return []
-
-def calculate_grade_percentile(data, genesis_deadline, all_active_wallets):
-    """등급 계산 (퍼센타일 기준)"""
-    # Genesis: 제네시스 블록 이후 1일 내 스테이킹 + 언스테이킹 시도 없음
-    if (data['first_stake_time'] and 
-        data['first_stake_time'] <= genesis_deadline and 
-        data['is_active'] and 
-        data['unstake_count'] == 0):
-        return "Genesis OG", 0.0
+            continue
+        
+        if 'error' in result:
+            # 전송 계층 재시도 후에도 남은 속도 제한: 창 크기와 무관하므로 학습값은 두고 대기 후 재시도
+            # (-32005는 "more than N results" 크기 초과에도 쓰이므로 그 경우는 아래에서 처리)
+            if is_throttle_error(result) and not is_range_error(result['error']):
+                delay = 2 ** (attempt + 1)
+                logger.warning(f"⏳ 청크 스캔 속도 제한: 블록 {start_block}-{end_block}, {delay}초 후 재시도")
+                time.sleep(delay)
+                continue
+            if is_range_error(result['error']) and chunk_size > controller.min_size:
+                new_size = controller.record_failure(chunk_size, error=result['error'])
+                return scan_in_pieces(start_block, end_block, min(new_size, chunk_size - 1), max_retries)
+            logger.warning(f"청크 스캔 실패: {result['error']}")
+            if attempt < max_retries - 1:
+                time.sleep(2 ** attempt)
+            continue
+        
+        logs = result.get('result') or []
+        controller.record_success(chunk_size, len(logs), time.monotonic() - started)
+        return logs
     
+    logger.error(f"❌ 청크 스캔 최종 실패: 블록 {start_block}-{end_block}")
+    raise ChunkScanError(f"블록 {start_block:,}-{end_block:,} 스캔 실패 ({max_retries}회 재시도)")
+
+def scan_in_pieces(start_block, end_block, piece_size, max_retries=3):
+    """범위를 piece_size 단위로 나누어 순서대로 스캔"""
+    logs = []
+    for piece_start, piece_end in iter_chunks(start_block, end_block, max(piece_size, 1)):
+        logs.extend(safe_scan_chunk(piece_start, piece_end, max_retries))
+    return logs
+
+def fetch_transactions(tx_hashes):
+    """트랜잭션 일괄 조회 → {tx_hash: tx}"""
+    responses = rpc_batch_call([("eth_getTransactionByHash", [tx_hash]) for tx_hash in tx_hashes])
+    return {
+        tx_hash: result['result']
+        for tx_hash, result in zip(tx_hashes, responses)
+        if result and result.get('result')
+    }
+
+def fetch_block_timestamps(block_numbers):
+    """블록 타임스탬프 일괄 조회 → {block_num: timestamp} (캐시 우선)"""
+    cache = get_block_cache()
+    blocks = set(block_numbers)
+    timestamps = cache.get_many(blocks)
+
+    missing = sorted(blocks - timestamps.keys())
+    if missing:
+        responses = rpc_batch_call([("eth_getBlockByNumber", [hex(block_num), False]) for block_num in missing])
+        fetched = {
+            block_num: int(result['result']['timestamp'], 16)
+            for block_num, result in zip(missing, responses)
+            if result and result.get('result')
+        }
+        cache.put_many(fetched)
+        timestamps.update(fetched)
+    return timestamps
+
+def fetch_block_hashes(block_numbers):
+    """블록 해시 일괄 조회 → {block_num: hash} (조회 실패한 블록은 빠짐, 캐시 없음)"""
+    blocks = sorted(set(block_numbers))
+    responses = rpc_batch_call([("eth_getBlockByNumber", [hex(block_num), False]) for block_num in blocks])
+    return {
+        block_num: result['result']['hash']
+        for block_num, result in zip(blocks, responses)
+        if result and result.get('result')
+    }
+
+def get_block_timestamp(block_num):
+    """단일 블록 타임스탬프 (조회 실패 시 0)"""
+    return fetch_block_timestamps([block_num]).get(block_num, 0)
+
+def event_from_transaction(tx, timestamp, log_index=0):
+    """트랜잭션 → stake/unstake 이벤트 (해당 없으면 None)"""
+    input_data = tx.get('input', '0x')
+    if len(input_data) < 10:
+        return None
+
+    method_id = input_data[:10]
+    if method_id == STAKE_METHOD_ID:
+        event_type = 'stake'
+        amount = decode_amount(input_data)
+    elif method_id == UNSTAKE_METHOD_ID:
+        event_type = 'unstake'
+        amount = 0
+    else:
+        return None
+
+    return {
+        'type': event_type,
+        'address': tx['from'].lower(),
+        'amount': amount,
+        'block': int(tx['blockNumber'], 16),
+        'block_hash': tx.get('blockHash'),
+        'log_index': log_index,
+        'timestamp': timestamp,
+        'hash': tx['hash']
+    }
+
+def apply_event(event, verbose=False):
+    """이벤트를 staking_data에 반영"""
+    ranking_sync['dirty'].add(event['address'])
+
+    if event['type'] == 'stake':
+        # 스테이킹 트랜잭션
+        staking_data.record_stake(event['address'], event['amount'], event['timestamp'])
+
+        if verbose:
+            logger.info(f"✅ 새 스테이킹: {event['address'][:8]}... +{event['amount']:.4f}")
+    else:
+        # 언스테이킹 시도
+        staking_data.record_unstake(event['address'], event['timestamp'])
+
+        if verbose:
+            logger.info(f"❌ 언스테이킹: {event['address'][:8]}...")
+
+def decode_chunk_events(logs):
+    """청크 로그 → 블록 순서로 정렬된 이벤트 목록 (staking_data는 변경하지 않음)
+
+    로그 자체로 디코드 가능한 이벤트는 바로 만들고, 나머지 트랜잭션만
+    배치로 조회한다. 조회 결과는 로그 디코더 학습에 사용된다.
+    """
+    decoder = get_log_decoder()
+    events, undecoded_logs = decoder.decode(logs)
+
+    if undecoded_logs:
+        # 트랜잭션별 로그 묶음 (첫 로그 인덱스로 블록 내 순서 결정)
+        logs_by_tx = {}
+        for log in undecoded_logs:
+            logs_by_tx.setdefault(log['transactionHash'], []).append(log)
+
+        tx_hashes = list(logs_by_tx)
+        txs = fetch_transactions(tx_hashes)
+        for tx_hash, tx in txs.items():
+            tx_logs = logs_by_tx[tx_hash]
+            try:
+                log_index = min(int(log.get('logIndex', '0x0'), 16) for log in tx_logs)
+                event = event_from_transaction(tx, None, log_index)
+            except Exception:
+                continue
+            decoder.learn(tx_logs, event)
+            if event:
+                events.append(event)
+        decoder.save()
+
+    # 로그에 blockTimestamp가 없는 이벤트만 블록 타임스탬프 조회
+    pending = [event for event in events if event['timestamp'] is None]
+    if pending:
+        timestamps = fetch_block_timestamps(event['block'] for event in pending)
+        for event in pending:
+            event['timestamp'] = timestamps.get(event['block'], 0)
+
+    # 블록 순서대로 적용 (first_stake_time / is_active 결정적)
+    events.sort(key=lambda e: (e['block'], e['log_index']))
+    return events
+
+def scan_stake_range(start_block, end_block, label="", verbose=False, on_chunk=None):
+    """블록 범위 스캔 → staking_data 반영, (stake 건수, unstake 건수) 반환
+
+    청크는 SCAN_CONCURRENCY개까지 동시에 가져오되 블록 순서대로 적용한다.
+    on_chunk(chunk_end, totals)는 청크 적용 직후 호출된다 (chunk_end까지 반영 완료).
+    """
+    total_blocks = max(end_block - start_block + 1, 1)
+    totals = {'stake': 0, 'unstake': 0, 'chunk_num': 0}
+
+    def fetch_chunk(chunk_start, chunk_end):
+        logs = safe_scan_chunk(chunk_start, chunk_end)
+        return decode_chunk_events(logs) if logs else []
+
+    def apply_chunk(chunk_start, chunk_end, events):
+        totals['chunk_num'] += 1
+        progress = (chunk_end - start_block + 1) / total_blocks * 100
+        logger.info(f"🔄 {label}{progress:.1f}% | 청크#{totals['chunk_num']} | 블록 {chunk_start:,}→{chunk_end:,}")
+        # 원본 이벤트 보존 (재스캔 없이 로컬 조회/재계산용)
+        get_event_store().add_events(events)
+        for event in events:
+            tentative_window.record(event, staking_data)
+            apply_event(event, verbose)
+            totals[event['type']] += 1
+        if on_chunk:
+            on_chunk(chunk_end, totals)
+
+    def next_chunk_size():
+        return get_chunk_controller(get_rpc_pool().best()).next_size()
+
+    try:
+        scan_range(start_block, end_block, fetch_chunk, apply_chunk, chunk_size=next_chunk_size)
+    finally:
+        save_chunk_controllers()
+    return totals['stake'], totals['unstake']
+
+def shard_file_path(path, index):
+    """샤드 워커가 이벤트/블록 타임스탬프/학습값을 기록할 임시 파일"""
+    return f"{path}.shard{index}"
+
+def scan_shard(index, start_block, end_block, rpc_urls, store_path, cache_path, layout_path, chunk_size_path,
+               workers=1):
+    """🧩 샤드 워커 (별도 프로세스): 빈 상태에서 구간만 스캔 → 부분 집계
+
+    워커마다 엔드포인트 순서를 돌려 서로 다른 RPC부터 사용하게 하고 (프로세스별 세션),
+    엔드포인트별 속도 예산은 동시에 도는 워커 수로 나눠 합계가 RPC_RATE_LIMIT를 넘지 않게 한다.
+    이벤트, 새로 조회한 블록 타임스탬프, 로그 레이아웃/청크 크기 학습값은 샤드 전용 파일에 기록하고
+    (부모 프로세스가 병합 후 삭제), 공용 파일은 읽기만 해 워커끼리 같은 파일에 쓰며 경합하지 않게 한다.
+    """
+    global RPC_URLS
+    share_rate_limit(workers)
+    shift = index % len(rpc_urls)
+    RPC_URLS = rpc_urls[shift:] + rpc_urls[:shift]
+    events_path, timestamps_path, layouts_path, chunk_sizes_path = (
+        shard_file_path(path, index) for path in (store_path, cache_path, layout_path, chunk_size_path))
+    for path in (events_path, timestamps_path, layouts_path, chunk_sizes_path):
+        if os.path.exists(path):
+            os.remove(path)
+    set_event_store(EventStore(events_path))
+    set_block_cache(BlockTimestampCache(timestamps_path, base_path=cache_path))
+    set_log_decoder(LogDecoder(layouts_path, base_path=layout_path))
+    set_chunk_size_file(chunk_sizes_path, base_path=chunk_size_path)
+    staking_data.clear()
+    tentative_window.clear()
+
+    total_stake_txs, total_unstake_txs = scan_stake_range(start_block, end_block, label=f"[샤드 {index + 1}] ")
+    get_event_store().close()
+    get_block_cache().close()
+    return {
+        'keys': list(staking_data.address_keys()),
+        'columns': {name: column.copy() for name, column in staking_data.columns().items()},
+        'stake': total_stake_txs,
+        'unstake': total_unstake_txs
+    }
+
+def scan_stake_range_sharded(start_block, end_block, on_shard=None):
+    """블록 범위를 샤드로 나눠 워커 프로세스들로 스캔 → staking_data에 병합, (stake 건수, unstake 건수)
+
+    샤드 결과는 블록 순서대로 staking_data에 합쳐지므로 (WalletState.merge) 지갑 id 순서와
+    집계가 완료 순서와 무관하게 같다. on_shard(shard_end, totals)는 샤드 병합 직후 호출된다.
+    """
+    shards = plan_shards(start_block, end_block, scan_workers() * FULL_SCAN_SHARDS_PER_WORKER)
+    workers = min(scan_workers(), len(shards))
+    logger.info(f"🧩 샤드 스캔: {len(shards)}개 샤드, 워커 {workers}개")
+    totals = {'stake': 0, 'unstake': 0}
+
+    def shard_files(index):
+        # (병합 함수, 샤드 파일)
+        return [(get_event_store().merge_from, shard_file_path(get_event_store().path, index)),
+                (get_block_cache().merge_from, shard_file_path(get_block_cache().path, index)),
+                (get_log_decoder().merge_from, shard_file_path(get_log_decoder().path, index)),
+                (merge_chunk_sizes, shard_file_path(CHUNK_SIZE_FILE, index))]
+
+    def merge_shard(index, shard_start, shard_end, result):
+        added = staking_data.merge(result['keys'], result['columns'])
+        for merge_from, path in shard_files(index):
+            # 워커가 기록한 것이 없으면 파일이 없음
+            if os.path.exists(path):
+                merge_from(path)
+                os.remove(path)
+        totals['stake'] += result['stake']
+        totals['unstake'] += result['unstake']
+        logger.info(f"🔗 샤드 {index + 1} 병합: 지갑 {len(result['keys']):,}개 (신규 {added:,}), "
+                    f"누적 {len(staking_data):,}개")
+        if on_shard:
+            on_shard(shard_end, totals)
+
+    try:
+        run_shards(shards, scan_shard,
+                   (RPC_URLS, get_event_store().path, get_block_cache().path, get_log_decoder().path,
+                    CHUNK_SIZE_FILE, workers),
+                   workers, merge_shard)
+    except BaseException:
+        # 중단 시 병합하지 못한 샤드의 임시 파일 정리 (다음 실행에서 다시 스캔)
+        for index in range(len(shards)):
+            for _, path in shard_files(index):
+                if os.path.exists(path):
+                    os.remove(path)
+        raise
+    finally:
+        # 병합된 학습값은 부모만 한 번 저장
+        get_log_decoder().save()
+        save_chunk_controllers()
+    return totals['stake'], totals['unstake']
+
+# 퍼센타일 상한 → 등급 (상위부터)
+GRADE_TIERS = [
+    (0.5, "Smoke Flexer"),
+    (2, "Steak Wizard"),
+    (5, "Grilluminati"),
+    (15, "Flame Juggler"),
+    (40, "Flipstarter"),
+]
+GRADE_TIER_LIMITS = np.array([limit for limit, _ in GRADE_TIERS])
+GRADE_TIER_NAMES = np.array([name for _, name in GRADE_TIERS] + ["Sizzlin' Noob"], dtype=object)
+
+def calculate_grade_percentiles(time_scores, scored_active, genesis_mask, inactive_mask):
+    """등급 계산 (퍼센타일 기준) → (등급 배열, 퍼센타일 배열)
+
+    활성 지갑 타임스코어를 한 번만 정렬하고 지갑별 순위는 이진 탐색으로 구한다.
+    scored_active: 첫 스테이킹 시각이 있는 활성 지갑 (퍼센타일 모집단)
+    """
+    # 모든 활성 지갑의 타임스코어 (오름차순)
+    all_scores = np.sort(time_scores[scored_active])
+
+    if len(all_scores):
+        # 자신보다 높은 점수의 수 + 1 = 순위
+        ranks = len(all_scores) - np.searchsorted(all_scores, time_scores, side='right') + 1
+        percentiles = (ranks / len(all_scores)) * 100
+        grades = GRADE_TIER_NAMES[np.searchsorted(GRADE_TIER_LIMITS, percentiles, side='left')]
+    else:
+        percentiles = np.full(len(time_scores), 100.0)
+        grades = np.full(len(time_scores), "Sizzlin' Noob", dtype=object)
+
     # 언스테이킹 시도한 경우
-    if not data['is_active']:
-        return "Jeeted", 100.0
-    
-    # 활성 지갑들의 타임스코어 기준 퍼센타일 계산
-    current_time = int(datetime.now(timezone.utc).timestamp())
-    holding_days = (current_time - data['first_stake_time']) / 86400 if data['first_stake_time'] else 0
-    time_score = data['total_staked'] * holding_days
-    
-    # 모든 활성 지갑의 타임스코어 계산
-    all_scores = []
-    for _, wallet_data in all_active_wallets:
-        if wallet_data['first_stake_time']:
-            w_holding_days = (current_time - wallet_data['first_stake_time']) / 86400
-            w_time_score = wallet_data['total_staked'] * w_holding_days
-            all_scores.append(w_time_score)
-    
-    if not all_scores:
-        return "Sizzlin' Noob", 100.0
-    
-    all_scores.sort(reverse=True)
-    rank = len([s for s in all_scores if s > time_score]) + 1
-    percentile = (rank / len(all_scores)) * 100
-    
-    # 퍼센타일 기준 등급
-    if percentile <= 0.5:
-        return "Smoke Flexer", percentile
-    elif percentile <= 2:
-        return "Steak Wizard", percentile
-    elif percentile <= 5:
-        return "Grilluminati", percentile
-    elif percentile <= 15:
-        return "Flame Juggler", percentile
-    elif percentile <= 40:
-        return "Flipstarter", percentile
+    grades = np.where(inactive_mask, "Jeeted", grades)
+    percentiles = np.where(inactive_mask, 100.0, percentiles)
+    # Genesis: 제네시스 블록 이후 1일 내 스테이킹 + 언스테이킹 시도 없음
+    grades = np.where(genesis_mask, "Genesis OG", grades)
+    percentiles = np.where(genesis_mask, 0.0, percentiles)
+    return grades, percentiles
+
+def score_wallets(wallets, genesis_deadline, current_time):
+    """지갑 컬럼 배열 → 컬럼별 점수 배열 (모든 계산은 하나의 current_time 기준)"""
+    n = len(wallets['total_staked'])
+    staked = wallets['total_staked']
+    first = wallets['first_stake_time'].astype(np.float64)
+    active = wallets['is_active']
+    unstakes = wallets['unstake_count']
+    has_first = first > 0
+
+    # 타임스코어 계산
+    holding_days = np.where(has_first, (current_time - first) / 86400, 0.0)
+    time_scores = staked * holding_days
+
+    # 전체 타임스코어 (에어드랍 비율 계산용, 활성 지갑만)
+    scored_active = active & has_first
+    total_time_score = time_scores[scored_active].sum()
+
+    # 에어드랍 할당 비율 계산
+    if total_time_score > 0:
+        airdrop_share_phase = np.where(active, (time_scores / total_time_score) * 100, 0.0)
     else:
-        return "Sizzlin' Noob", percentile
+        airdrop_share_phase = np.zeros(n)
+
+    genesis_mask = has_first & (first <= genesis_deadline) & active & (unstakes == 0)
+    grades, percentiles = calculate_grade_percentiles(time_scores, scored_active, genesis_mask, ~active)
+
+    return {
+        'holding_days': holding_days,
+        'time_score': time_scores,
+        'airdrop_share_phase': airdrop_share_phase,
+        'airdrop_share_total': airdrop_share_phase * TOTAL_PHASES,
+        'grade': grades,
+        'percentile': percentiles
+    }
 
 def get_grade_emoji(grade):
     """등급별 이모지"""
@@ -273,112 +731,104 @@ def extract_all_stake_data():
     logger.info("🚀 전체 STAKE 데이터 추출 시작...")
     
     try:
-        latest_block = get_latest_block()
-        if not latest_block:
+        head_block = get_latest_block()
+        if not head_block:
             raise Exception("최신 블록 조회 실패")
+        # 전체 스캔은 확정 블록까지만 (미확정 구간은 증분 스캔이 추적)
+        latest_block = head_block - CONFIRMATION_DEPTH
         
-        total_blocks = latest_block - GENESIS_BLOCK
-        logger.info(f"📊 스캔 범위: {GENESIS_BLOCK:,} → {latest_block:,} ({total_blocks:,}블록)")
-        
-        # 초기화
+        # 초기화 (중단된 전체 스캔이 있으면 이어서)
         staking_data.clear()
+        tentative_window.clear()
+        ranking_sync.update(base_block=None, block=None, dirty=set())
+        start_block = GENESIS_BLOCK
+        base_totals = {'stake': 0, 'unstake': 0}
+        state = load_full_scan_state(restore=True)
+        if state:
+            start_block = state['next_block']
+            base_totals = {'stake': state['total_stake_txs'], 'unstake': state['total_unstake_txs']}
+            logger.info(f"♻️ 중단된 전체 스캔 이어서: 블록 {start_block:,}부터 "
+                        f"({len(staking_data):,}개 지갑 복원)")
+        
+        end_block = latest_block
+        if FULL_SCAN_MAX_BLOCKS and end_block - start_block + 1 > FULL_SCAN_MAX_BLOCKS:
+            end_block = start_block + FULL_SCAN_MAX_BLOCKS - 1
+            logger.info(f"⏳ 이번 실행은 {FULL_SCAN_MAX_BLOCKS:,}블록까지만 스캔합니다.")
+        
+        total_blocks = end_block - start_block + 1
+        logger.info(f"📊 스캔 범위: {start_block:,} → {end_block:,} ({total_blocks:,}블록)")
+        
+        # 청크/샤드는 블록 순서대로 적용되므로 applied 이전 구간은 모두 성공한 구간
+        applied = {'next_block': start_block, 'committed': start_block, 'totals': dict(base_totals)}
+        
+        def mark_applied(next_block, totals):
+            applied['next_block'] = next_block
+            applied['totals'] = {
+                'stake': base_totals['stake'] + totals['stake'],
+                'unstake': base_totals['unstake'] + totals['unstake']
+            }
         
-        total_stake_txs = 0
-        total_unstake_txs = 0
-        processed = 0
+        def commit_applied():
+            save_full_scan_state(applied['next_block'], applied['totals'])
+            applied['committed'] = applied['next_block']
         
-        current_block = GENESIS_BLOCK
-        chunk_num = 1
+        def commit_progress(chunk_end, totals):
+            # K개 청크마다 진행 상태 저장
+            mark_applied(chunk_end + 1, totals)
+            if totals['chunk_num'] % FULL_SCAN_COMMIT_CHUNKS == 0:
+                commit_applied()
         
-        while current_block <= latest_block:
-            chunk_end = min(current_block + 1499, latest_block)
-            chunk_size = chunk_end - current_block + 1
-            
-            progress = processed / total_blocks * 100
-            logger.info(f"🔄 {progress:.1f}% | 청크#{chunk_num} | 블록 {current_block:,}→{chunk_end:,}")
-            
-            logs = safe_scan_chunk(current_block, chunk_end)
-            
-            if not logs:
-                current_block = chunk_end + 1
-                processed += chunk_size
-                chunk_num += 1
-                continue
-            
-            # 트랜잭션 처리
-            tx_hashes = list(set(log['transactionHash'] for log in logs))
-            
-            for tx_hash in tx_hashes:
-                try:
-                    tx_result = rpc_call("eth_getTransactionByHash", [tx_hash])
-                    
-                    if not tx_result or 'result' not in tx_result or not tx_result['result']:
-                        continue
-                    
-                    tx = tx_result['result']
-                    input_data = tx.get('input', '0x')
-                    
-                    if len(input_data) >= 10:
-                        method_id = input_data[:10]
-                        from_addr = tx['from'].lower()
-                        block_num = int(tx['blockNumber'], 16)
-                        
-                        # 블록 타임스탬프
-                        block_result = rpc_call("eth_getBlockByNumber", [tx['blockNumber'], False])
-                        timestamp = 0
-                        if block_result and 'result' in block_result and block_result['result']:
-                            timestamp = int(block_result['result']['timestamp'], 16)
-                        
-                        if method_id == STAKE_METHOD_ID:
-                            # 스테이킹 트랜잭션
-                            amount = decode_amount(input_data)
-                            
-                            staking_data[from_addr]['total_staked'] += amount
-                            staking_data[from_addr]['stake_count'] += 1
-                            staking_data[from_addr]['is_active'] = True
-                            
-                            if not staking_data[from_addr]['first_stake_time']:
-                                staking_data[from_addr]['first_stake_time'] = timestamp
-                            
-                            staking_data[from_addr]['last_action_time'] = timestamp
-                            
-                            staking_data[from_addr]['stake_transactions'].append({
-                                'amount': amount,
-                                'block': block_num,
-                                'timestamp': timestamp,
-                                'hash': tx_hash
-                            })
-                            
-                            total_stake_txs += 1
-                        
-                        elif method_id == UNSTAKE_METHOD_ID:
-                            # 언스테이킹 시도
-                            staking_data[from_addr]['unstake_count'] += 1
-                            staking_data[from_addr]['is_active'] = False
-                            staking_data[from_addr]['last_action_time'] = timestamp
-                            
-                            staking_data[from_addr]['unstake_attempts'].append({
-                                'block': block_num,
-                                'timestamp': timestamp,
-                                'hash': tx_hash
-                            })
-                            
-                            total_unstake_txs += 1
-                
-                except Exception as e:
-                    continue
-                    
-                time.sleep(0.005)
-            
-            current_block = chunk_end + 1
-            processed += chunk_size
-            chunk_num += 1
-            time.sleep(0.1)
+        def commit_shard(shard_end, totals):
+            # 샤드가 블록 순서대로 병합될 때마다 진행 상태 저장
+            mark_applied(shard_end + 1, totals)
+            commit_applied()
+        
+        # 청크 동시 스캔 (적용은 블록 순서대로), 워커가 여럿이면 샤드별 프로세스 스캔
+        total_stake_txs, total_unstake_txs = 0, 0
+        try:
+            if start_block <= end_block and scan_workers() > 1:
+                total_stake_txs, total_unstake_txs = scan_stake_range_sharded(start_block, end_block,
+                                                                              on_shard=commit_shard)
+            elif start_block <= end_block:
+                total_stake_txs, total_unstake_txs = scan_stake_range(start_block, end_block,
+                                                                      on_chunk=commit_progress)
+        except ChunkScanError as e:
+            # 실패한 청크 직전까지만 저장하고 중단 (실패 구간은 다음 실행에서 다시 스캔)
+            if applied['next_block'] > applied['committed']:
+                commit_applied()
+            logger.error(f"❌ 전체 스캔 중단: {e} - 블록 {applied['committed']:,}부터 다음 실행에서 이어서")
+            return False
+        total_stake_txs += base_totals['stake']
+        total_unstake_txs += base_totals['unstake']
+        
+        if end_block < latest_block:
+            save_full_scan_state(end_block + 1, {'stake': total_stake_txs, 'unstake': total_unstake_txs})
+            logger.info(f"⏸️ 전체 스캔 일부 완료: 남은 블록 {latest_block - end_block:,}개는 다음 실행에서 계속")
+            return False
+        
+        # 완료: 체크포인트 기록 후 진행 파일 정리
+        checkpoint = load_checkpoint()
+        now = datetime.now(timezone.utc).isoformat()
+        checkpoint['last_full_scan'] = {
+            'block': latest_block,
+            'timestamp': now,
+            'total_users': len(staking_data)
+        }
+        checkpoint['last_incremental'] = {
+            'block': latest_block,
+            'timestamp': now
+        }
+        checkpoint['genesis_scan_completed'] = True
+        commit_wallet_state(checkpoint)
+        clear_full_scan_state()
+        ranking_sync['block'] = latest_block
         
         logger.info(f"🎉 데이터 추출 완료!")
         logger.info(f"   총 Stake 트랜잭션: {total_stake_txs:,}개")
         logger.info(f"   총 Unstake 시도: {total_unstake_txs:,}개")
         logger.info(f"   총 지갑 수: {len(staking_data):,}개")
+        logger.info(f"   블록 캐시: 적중 {get_block_cache().hits:,} / 미스 {get_block_cache().misses:,}")
+        logger.info(f"   이벤트 저장소: {get_event_store().count():,}개")
         
         return True
         
@@ -387,593 +837,183 @@ def extract_all_stake_data():
         logger.error(traceback.format_exc())
         return False
     
+def load_staking_data_from_backup():
+    """매니페스트의 최신 백업 스냅샷으로 staking_data 복원 → 체크포인트 (없으면 None)
+
+    지갑 상태 파일이 없을 때 사용하며, 스냅샷 헤더의 블록 높이를 증분 기준으로 쓴다.
+    """
+    path, entry = get_backup_manifest().latest_snapshot()
+    if path is None:
+        logger.warning("⚠️ 백업 스냅샷을 찾을 수 없습니다. 빈 상태로 시작합니다.")
+        logger.warning("💡 6시간 전체 스캔을 한 번 실행하여 백업을 생성하세요.")
+        return None
+    try:
+        header = load_snapshot(path, staking_data)
+    except SnapshotError as e:
+        logger.warning(f"⚠️ 백업 스냅샷 로드 실패, 빈 상태로 시작합니다: {e}")
+        staking_data.clear()
+        return None
+    checkpoint = header['meta']['checkpoint']
+    checkpoint['last_incremental']['block'] = header['block']
+    tentative_window.load(header['meta'].get('tentative'))
+    logger.info(f"📂 백업 스냅샷 복원: {entry['id']} ({header['count']:,}개 지갑, 블록 {header['block']:,})")
+    return checkpoint
+
+def load_incremental_state():
+    """지갑 상태 로드 (체크포인트와 함께 저장된 상태 우선) → 체크포인트"""
+    checkpoint = load_wallet_state()
+    if checkpoint is not None:
+        base_block = checkpoint['last_incremental']['block']
+        logger.info(f"✅ 지갑 상태 로드: {len(staking_data)}개 (블록 {base_block:,} 기준)")
+    else:
+        checkpoint = load_staking_data_from_backup()
+        if checkpoint is None:
+            checkpoint = load_checkpoint()
+        base_block = None
+    ranking_sync.update(base_block=base_block, block=base_block, dirty=set())
+    return checkpoint
+
+def scan_new_blocks(checkpoint, latest_block, verbose=True):
+    """체크포인트 다음 블록부터 최대 INCREMENTAL_SCAN_MAX_BLOCKS블록 스캔 → (stake 건수, unstake 건수)
+    (새 블록 없으면 None)
+
+    먼저 미확정 구간을 재확인해 재구성됐으면 되돌린다. latest_block까지 남은 블록이 더 많으면
+    앞쪽부터 한도만큼만 스캔하고 체크포인트를 거기까지 옮겨 다음 실행에서 이어서 스캔한다 (건너뛰지 않음).
+    checkpoint의 last_incremental과 ranking_sync는 갱신하지만 저장(commit_wallet_state)은 호출한 쪽에서 한다.
+    """
+    # 미확정 구간 재확인 (재구성됐으면 해당 지점부터 되돌리고 다시 스캔)
+    rolled_back = rollback_reorged_blocks(checkpoint)
+    
+    # 스캔 시작 블록 결정
+    if not checkpoint.get('genesis_scan_completed', False):
+        logger.warning("⚠️ 초기 전체 스캔이 아직 실행되지 않았습니다.")
+        # 전체 스캔이 없으면 이어서 볼 기준이 없으므로 최근 블록만
+        start_block = max(GENESIS_BLOCK, latest_block - INCREMENTAL_SCAN_MAX_BLOCKS + 1)
+        logger.info(f"📊 최근 {INCREMENTAL_SCAN_MAX_BLOCKS:,}블록만 스캔합니다.")
+    else:
+        # 정상적인 증분 처리
+        start_block = checkpoint['last_incremental']['block'] + 1
+    
+    if start_block > latest_block and not rolled_back:
+        return None
+    
+    # 한 번에 너무 많은 블록 방지: 끝을 잘라 체크포인트부터 다음 실행에서 이어서
+    end_block = max(min(latest_block, start_block + INCREMENTAL_SCAN_MAX_BLOCKS - 1), start_block - 1)
+    total_blocks = end_block - start_block + 1
+    logger.info(f"📊 증분 스캔 범위: {start_block:,} → {end_block:,} ({total_blocks:,}블록)")
+    if end_block < latest_block:
+        logger.warning(f"⚠️ 블록 범위 제한: {INCREMENTAL_SCAN_MAX_BLOCKS:,}블록까지만 스캔, "
+                       f"남은 {latest_block - end_block:,}블록은 다음 실행에서 이어서")
+    
+    # 청크 동시 스캔 (적용은 블록 순서대로, 최신 CONFIRMATION_DEPTH블록은 되돌리기 기록)
+    tentative_window.begin(end_block, fetch_block_hashes)
+    total_stake_txs, total_unstake_txs = 0, 0
+    if start_block <= end_block:
+        total_stake_txs, total_unstake_txs = scan_stake_range(start_block, end_block,
+                                                              label="증분 ", verbose=verbose)
+    
+    checkpoint['last_incremental'] = {
+        'block': end_block,
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    }
+    ranking_sync['block'] = end_block
+    return total_stake_txs, total_unstake_txs
+
 def extract_incremental_stake_data():
     """증분 모드: 최근 변경사항만 추출"""
     logger.info("🚀 증분 STAKE 데이터 추출 시작...")
     
     try:
-        # 1. 백업 디렉토리 확인 및 생성
-        os.makedirs('backup', exist_ok=True)
-        logger.info("📂 백업 디렉토리 확인/생성 완료")
-        
-        # 2. 백업 파일 찾기 (여러 위치에서 시도)
-        import glob
-        backup_files = []
-        
-        # 현재 디렉토리의 backup 폴더
-        backup_files = glob.glob('backup/stake_leaderboard_*.json')
-        
-        # 없으면 현재 디렉토리에서 직접 찾기
-        if not backup_files:
-            backup_files = glob.glob('stake_leaderboard_*.json')
-            logger.info("📂 현재 디렉토리에서 백업 파일 검색")
-        
-        # 그래도 없으면 상위 디렉토리 확인
-        if not backup_files:
-            backup_files = glob.glob('../backup/stake_leaderboard_*.json')
-            logger.info("📂 상위 디렉토리에서 백업 파일 검색")
-        
-        # 백업 파일 로드
-        if backup_files:
-            latest_backup = max(backup_files)
-            logger.info(f"📂 백업 파일 발견: {latest_backup}")
-            
-            with open(latest_backup, 'r') as f:
-                backup_data = json.load(f)
-                
-                # staking_data에 로드
-                for item in backup_data:
-                    addr = item['address'].lower()
-                    staking_data[addr] = {
-                        'total_staked': item.get('total_staked', 0),
-                        'stake_count': item.get('stake_count', 0),
-                        'unstake_count': item.get('unstake_count', 0),
-                        'unstake_attempts': [],
-                        'is_active': item.get('is_active', True),
-                        'first_stake_time': item.get('first_stake_time'),
-                        'last_action_time': item.get('last_action_time'),
-                        'stake_transactions': [],
-                        'unstake_transactions': []
-                    }
-                
-                logger.info(f"✅ {len(staking_data)}개 기존 데이터 로드 완료")
-        else:
-            logger.warning("⚠️ 백업 파일을 찾을 수 없습니다. 빈 상태로 시작합니다.")
-            logger.warning("💡 6시간 전체 스캔을 한 번 실행하여 백업을 생성하세요.")
+        # 1~2. 지갑 상태 로드
+        checkpoint = load_incremental_state()
         
-        # 3. 체크포인트와 블록 정보 확인
-        checkpoint = load_checkpoint()
+        # 3. 블록 정보 확인
         latest_block = get_latest_block()
         
         if not latest_block:
             raise Exception("최신 블록 조회 실패")
         
-        # 4. 스캔 시작 블록 결정
-        if not checkpoint.get('genesis_scan_completed', False):
-            logger.warning("⚠️ 초기 전체 스캔이 아직 실행되지 않았습니다.")
-            # 전체 스캔이 없으면 최근 10,000블록만
-            start_block = max(GENESIS_BLOCK, latest_block - 10000)
-            logger.info(f"📊 최근 10,000블록만 스캔합니다.")
-        else:
-            # 정상적인 증분 처리
-            start_block = checkpoint['last_incremental']['block'] + 1
-            
-            # 너무 많은 블록 방지 (최대 10,000블록)
-            if latest_block - start_block > 10000:
-                start_block = latest_block - 10000
-                logger.warning(f"⚠️ 블록 범위 제한: 최근 10,000블록만 스캔")
-        
-        if start_block > latest_block:
+        # 4~5. 새 블록 스캔
+        totals = scan_new_blocks(checkpoint, latest_block)
+        if totals is None:
             logger.info("✅ 새로운 블록 없음")
             return True
-        
-        # 5. 블록 스캔 및 트랜잭션 처리
-        total_blocks = latest_block - start_block
-        logger.info(f"📊 증분 스캔 범위: {start_block:,} → {latest_block:,} ({total_blocks:,}블록)")
-        
-        total_stake_txs = 0
-        total_unstake_txs = 0
-        processed = 0
-        
-        current_block = start_block
-        chunk_num = 1
-        
-        while current_block <= latest_block:
-            chunk_end = min(current_block + 1499, latest_block)
-            chunk_size = chunk_end - current_block + 1
-            
-            progress = processed / total_blocks * 100
-            logger.info(f"🔄 증분 {progress:.1f}% | 청크#{chunk_num} | 블록 {current_block:,}→{chunk_end:,}")
-            
-            logs = safe_scan_chunk(current_block, chunk_end)
-            
-            if not logs:
-                current_block = chunk_end + 1
-                processed += chunk_size
-                chunk_num += 1
-                continue
-            
-            # 트랜잭션 처리
-            tx_hashes = list(set(log['transactionHash'] for log in logs))
-            
-            for tx_hash in tx_hashes:
-                try:
-                    tx_result = rpc_call("eth_getTransactionByHash", [tx_hash])
-                    
-                    if not tx_result or 'result' not in tx_result or not tx_result['result']:
-                        continue
-                    
-                    tx = tx_result['result']
-                    input_data = tx.get('input', '0x')
-                    
-                    if len(input_data) >= 10:
-                        method_id = input_data[:10]
-                        from_addr = tx['from'].lower()
-                        block_num = int(tx['blockNumber'], 16)
-                        
-                        # 블록 타임스탬프
-                        block_result = rpc_call("eth_getBlockByNumber", [tx['blockNumber'], False])
-                        timestamp = 0
-                        if block_result and 'result' in block_result and block_result['result']:
-                            timestamp = int(block_result['result']['timestamp'], 16)
-                        
-                        if method_id == STAKE_METHOD_ID:
-                            # 스테이킹 트랜잭션
-                            amount = decode_amount(input_data)
-                            
-                            staking_data[from_addr]['total_staked'] += amount
-                            staking_data[from_addr]['stake_count'] += 1
-                            staking_data[from_addr]['is_active'] = True
-                            
-                            if not staking_data[from_addr]['first_stake_time']:
-                                staking_data[from_addr]['first_stake_time'] = timestamp
-                            
-                            staking_data[from_addr]['last_action_time'] = timestamp
-                            
-                            staking_data[from_addr]['stake_transactions'].append({
-                                'amount': amount,
-                                'block': block_num,
-                                'timestamp': timestamp,
-                                'hash': tx_hash
-                            })
-                            
-                            total_stake_txs += 1
-                            logger.info(f"✅ 새 스테이킹: {from_addr[:8]}... +{amount:.4f}")
-                        
-                        elif method_id == UNSTAKE_METHOD_ID:
-                            # 언스테이킹 시도
-                            staking_data[from_addr]['unstake_count'] += 1
-                            staking_data[from_addr]['is_active'] = False
-                            staking_data[from_addr]['last_action_time'] = timestamp
-                            
-                            staking_data[from_addr]['unstake_attempts'].append({
-                                'block': block_num,
-                                'timestamp': timestamp,
-                                'hash': tx_hash
-                            })
-                            
-                            total_unstake_txs += 1
-                            logger.info(f"❌ 언스테이킹: {from_addr[:8]}...")
-                
-                except Exception as e:
-                    continue
-                    
-                time.sleep(0.005)
-            
-            current_block = chunk_end + 1
-            processed += chunk_size
-            chunk_num += 1
-            time.sleep(0.1)
+        total_stake_txs, total_unstake_txs = totals
         
         # 6. 체크포인트 업데이트
-        checkpoint['last_incremental'] = {
-            'block': latest_block,
-            'timestamp': datetime.now(timezone.utc).isoformat()
-        }
-        save_checkpoint(checkpoint)
+        commit_wallet_state(checkpoint)
         
         logger.info(f"🎉 증분 데이터 추출 완료!")
         logger.info(f"   기존 데이터: {len(staking_data)}개 유지")
         logger.info(f"   새 Stake 트랜잭션: {total_stake_txs:,}개")
         logger.info(f"   새 Unstake 시도: {total_unstake_txs:,}개")
+        logger.info(f"   블록 캐시: 적중 {get_block_cache().hits:,} / 미스 {get_block_cache().misses:,}")
         
         return True
         
-    except Exception as e:
-        logger.error(f"❌ 증분 데이터 추출 실패: {e}")
-        logger.error(traceback.format_exc())
+    except ChunkScanError as e:
+        # 스캔 도중 중단: 메모리 상태는 버리고 체크포인트는 이전 블록 그대로 (다음 실행에서 같은 구간 재스캔)
+        logger.error(f"❌ 증분 스캔 중단: {e} - 체크포인트를 갱신하지 않습니다")
         return False
-    """증분 모드: 최근 변경사항만 추출"""
-    logger.info("🚀 증분 STAKE 데이터 추출 시작...")
-        # 🆕 디버깅 로그
-    logger.info(f"📊 현재 작업 디렉토리: {os.getcwd()}")
-    logger.info(f"📊 backup 폴더 존재: {os.path.exists('backup')}")
-    
-    import glob
-    backup_files = glob.glob('backup/stake_leaderboard_*.json')
-    logger.info(f"📊 백업 파일 목록: {backup_files}")
-
-
-    try:
-        # 1. 먼저 백업에서 전체 데이터 로드 (중요!)
-        logger.info("📂 기존 데이터 로드 중...")
-        try:
-            import glob
-            backup_files = glob.glob('backup/stake_leaderboard_*.json')
-            if backup_files:
-                latest_backup = max(backup_files)
-                logger.info(f"📂 백업 파일 발견: {latest_backup}")
-                with open(latest_backup, 'r') as f:
-                    backup_data = json.load(f)
-                    for item in backup_data:
-                        addr = item['address'].lower()
-                        staking_data[addr] = {
-                            'total_staked': item.get('total_staked', 0),
-                            'stake_count': item.get('stake_count', 0),
-                            'unstake_count': item.get('unstake_count', 0),
-                            'unstake_attempts': [],
-                            'is_active': item.get('is_active', True),
-                            'first_stake_time': item.get('first_stake_time'),
-                            'last_action_time': item.get('last_action_time'),
-                            'stake_transactions': [],
-                            'unstake_transactions': []
-                        }
-                logger.info(f"✅ {len(staking_data)}개 기존 데이터 로드 완료")
-            else:
-                logger.warning("⚠️ 백업 파일 없음 - 빈 상태로 시작")
-        except Exception as e:
-            logger.error(f"❌ 백업 로드 실패: {e}")
-            # 백업 로드 실패해도 계속 진행
-        
-        # 2. 체크포인트와 블록 정보 확인
-        checkpoint = load_checkpoint()
-        latest_block = get_latest_block()
-        
-        if not latest_block:
-            raise Exception("최신 블록 조회 실패")
-        
-        # 3. 스캔 시작 블록 결정
-        if not checkpoint.get('genesis_scan_completed', False):
-            logger.warning("⚠️ 초기 전체 스캔이 아직 실행되지 않았습니다.")
-            # 전체 스캔이 없으면 최근 10,000블록만
-            start_block = max(GENESIS_BLOCK, latest_block - 10000)
-            logger.info(f"📊 최근 10,000블록만 스캔합니다.")
-        else:
-            # 정상적인 증분 처리
-            start_block = checkpoint['last_incremental']['block'] + 1
-            
-            # 너무 많은 블록 방지 (최대 10,000블록)
-            if latest_block - start_block > 10000:
-                start_block = latest_block - 10000
-                logger.warning(f"⚠️ 블록 범위 제한: 최근 10,000블록만 스캔")
-        
-        if start_block > latest_block:
-            logger.info("✅ 새로운 블록 없음")
-            return True
-        
-        # 4. 블록 스캔 및 트랜잭션 처리
-        total_blocks = latest_block - start_block
-        logger.info(f"📊 증분 스캔 범위: {start_block:,} → {latest_block:,} ({total_blocks:,}블록)")
-        
-        total_stake_txs = 0
-        total_unstake_txs = 0
-        processed = 0
-        
-        current_block = start_block
-        chunk_num = 1
-        
-        while current_block <= latest_block:
-            chunk_end = min(current_block + 1499, latest_block)
-            chunk_size = chunk_end - current_block + 1
-            
-            progress = processed / total_blocks * 100
-            logger.info(f"🔄 증분 {progress:.1f}% | 청크#{chunk_num} | 블록 {current_block:,}→{chunk_end:,}")
-            
-            logs = safe_scan_chunk(current_block, chunk_end)
-            
-            if not logs:
-                current_block = chunk_end + 1
-                processed += chunk_size
-                chunk_num += 1
-                continue
-            
-            # 트랜잭션 처리
-            tx_hashes = list(set(log['transactionHash'] for log in logs))
-            
-            for tx_hash in tx_hashes:
-                try:
-                    tx_result = rpc_call("eth_getTransactionByHash", [tx_hash])
-                    
-                    if not tx_result or 'result' not in tx_result or not tx_result['result']:
-                        continue
-                    
-                    tx = tx_result['result']
-                    input_data = tx.get('input', '0x')
-                    
-                    if len(input_data) >= 10:
-                        method_id = input_data[:10]
-                        from_addr = tx['from'].lower()
-                        block_num = int(tx['blockNumber'], 16)
-                        
-                        # 블록 타임스탬프
-                        block_result = rpc_call("eth_getBlockByNumber", [tx['blockNumber'], False])
-                        timestamp = 0
-                        if block_result and 'result' in block_result and block_result['result']:
-                            timestamp = int(block_result['result']['timestamp'], 16)
-                        
-                        if method_id == STAKE_METHOD_ID:
-                            # 스테이킹 트랜잭션
-                            amount = decode_amount(input_data)
-                            
-                            staking_data[from_addr]['total_staked'] += amount
-                            staking_data[from_addr]['stake_count'] += 1
-                            staking_data[from_addr]['is_active'] = True
-                            
-                            if not staking_data[from_addr]['first_stake_time']:
-                                staking_data[from_addr]['first_stake_time'] = timestamp
-                            
-                            staking_data[from_addr]['last_action_time'] = timestamp
-                            
-                            staking_data[from_addr]['stake_transactions'].append({
-                                'amount': amount,
-                                'block': block_num,
-                                'timestamp': timestamp,
-                                'hash': tx_hash
-                            })
-                            
-                            total_stake_txs += 1
-                            logger.info(f"✅ 새 스테이킹: {from_addr[:8]}... +{amount:.4f}")
-                        
-                        elif method_id == UNSTAKE_METHOD_ID:
-                            # 언스테이킹 시도
-                            staking_data[from_addr]['unstake_count'] += 1
-                            staking_data[from_addr]['is_active'] = False
-                            staking_data[from_addr]['last_action_time'] = timestamp
-                            
-                            staking_data[from_addr]['unstake_attempts'].append({
-                                'block': block_num,
-                                'timestamp': timestamp,
-                                'hash': tx_hash
-                            })
-                            
-                            total_unstake_txs += 1
-                            logger.info(f"❌ 언스테이킹: {from_addr[:8]}...")
-                
-                except Exception as e:
-                    continue
-                    
-                time.sleep(0.005)
-            
-            current_block = chunk_end + 1
-            processed += chunk_size
-            chunk_num += 1
-            time.sleep(0.1)
-        
-        # 5. 체크포인트 업데이트
-        checkpoint['last_incremental'] = {
-            'block': latest_block,
-            'timestamp': datetime.now(timezone.utc).isoformat()
-        }
-        save_checkpoint(checkpoint)
-        
-        logger.info(f"🎉 증분 데이터 추출 완료!")
-        logger.info(f"   기존 데이터: {len(staking_data)}개 유지")
-        logger.info(f"   새 Stake 트랜잭션: {total_stake_txs:,}개")
-        logger.info(f"   새 Unstake 시도: {total_unstake_txs:,}개")
-        
-        return True
         
     except Exception as e:
         logger.error(f"❌ 증분 데이터 추출 실패: {e}")
         logger.error(traceback.format_exc())
         return False
-    """증분 모드: 최근 변경사항만 추출"""
-    logger.info("🚀 증분 STAKE 데이터 추출 시작...")
-    
-    try:
-        # 체크포인트 로드
-        checkpoint = load_checkpoint()
-        latest_block = get_latest_block()
-        
-        if not latest_block:
-            raise Exception("최신 블록 조회 실패")
-        
-        try:
-            import glob
-            backup_files = glob.glob('backup/stake_leaderboard_*.json')
-            if backup_files:
-                latest_backup = max(backup_files)
-                logger.info(f"📂 백업 파일에서 전체 데이터 로드 중...")
-                with open(latest_backup, 'r') as f:
-                    backup_data = json.load(f)
-                    for item in backup_data:
-                        addr = item['address'].lower()
-                        staking_data[addr] = {
-                            'total_staked': item.get('total_staked', 0),
-                            'stake_count': item.get('stake_count', 0),
-                            'unstake_count': item.get('unstake_count', 0),
-                            'unstake_attempts': [],
-                            'is_active': item.get('is_active', True),
-                            'first_stake_time': item.get('first_stake_time'),
-                            'last_action_time': item.get('last_action_time'),
-                            'stake_transactions': [],
-                            'unstake_transactions': []
-                        }
-                logger.info(f"✅ {len(staking_data)}개 기존 데이터 로드 완료")
-        except Exception as e:
-            logger.error(f"❌ 백업 로드 실패: {e}")
 
+def rollback_reorged_blocks(checkpoint):
+    """저장된 미확정 구간의 블록 해시 재확인 → 재구성됐으면 롤백 후 True
 
+    되돌린 지갑은 순위 엔진 변경분에 넣고, 이벤트 저장소와 체크포인트 블록도
+    재구성 지점 직전으로 돌려 다음 스캔이 그 지점부터 다시 적용하게 한다.
+    """
+    resume_block = tentative_window.validate(fetch_block_hashes)
+    if resume_block is None:
+        return False
+    ranking_sync['dirty'].update(tentative_window.rollback(resume_block, staking_data))
+    deleted = get_event_store().delete_from_block(resume_block)
+    checkpoint['last_incremental']['block'] = resume_block - 1
+    logger.info(f"🗑️ 재구성 구간 이벤트 {deleted:,}개 삭제")
+    return True
 
+def get_ranking_engine():
+    """순위 엔진 (첫 호출 시 저장된 상태 로드)"""
+    global _ranking_engine
+    if _ranking_engine is None:
+        _ranking_engine = RankingEngine.load()
+    return _ranking_engine
 
+def update_ranking(current_time):
+    """staking_data 변경분을 순위 엔진에 반영 → 엔진
 
-        # 🆕 초기 스캔이 없으면 최근 블록만 처리
-        if not checkpoint.get('genesis_scan_completed', False):
-            logger.warning("⚠️ 초기 전체 스캔이 아직 실행되지 않았습니다.")
-            logger.info("📊 최근 10,000블록만 스캔합니다.")
-            
-            # 최근 10,000블록부터 시작
-            start_block = max(GENESIS_BLOCK, latest_block - 10000)
-            
-            # 백업 데이터 로드 시도
-            try:
-                import glob
-                backup_files = glob.glob('backup/stake_leaderboard_*.json')
-                if backup_files:
-                    latest_backup = max(backup_files)
-                    logger.info(f"📂 백업 파일 발견: {latest_backup}")
-                    with open(latest_backup, 'r') as f:
-                        backup_data = json.load(f)
-                        # staking_data 복원
-                        for item in backup_data:
-                            addr = item['address'].lower()
-                            staking_data[addr] = {
-                                'total_staked': item.get('total_staked', 0),
-                                'stake_count': item.get('stake_count', 0),
-                                'unstake_count': item.get('unstake_count', 0),
-                                'unstake_attempts': [],
-                                'is_active': item.get('is_active', True),
-                                'first_stake_time': item.get('first_stake_time'),
-                                'last_action_time': item.get('last_action_time'),
-                                'stake_transactions': [],
-                                'unstake_transactions': []
-                            }
-                        logger.info(f"✅ {len(staking_data)}개 기존 데이터 로드 완료")
+    엔진이 이번 실행의 기준 블록과 같은 상태면 바뀐 지갑만 재삽입하고,
+    아니면 (전체 스캔, 상태 유실 등) 전체 재구성한다. 이번 갱신의 순위 델타는
+    engine.last_deltas에 남고, 행의 rank_change_24h/score_change_24h는 엔진이 주기적으로
+    남기는 순위 스냅샷 중 약 하루 전 것과 비교해 구한다 (델타에는 사이로 밀린 지갑이 빠지므로).
+    """
+    engine = get_ranking_engine()
+    if engine.block is not None and engine.block == ranking_sync['base_block']:
+        changes = {}
+        for addr in ranking_sync['dirty']:
+            wallet = staking_data.row(addr)
+            # 롤백으로 사라진 지갑은 제거
+            changes[addr] = (wallet['total_staked'], wallet['first_stake_time']) if wallet else (0.0, None)
+        deltas = engine.update(changes, current_time)
+        logger.info(f"📈 순위 증분 갱신: 변경 지갑 {len(changes):,}개, 순위 변동 {len(deltas):,}개")
+    else:
+        columns = staking_data.columns()
+        engine.rebuild(dict(zip(staking_data.addresses(), zip(columns['total_staked'].tolist(),
+                                                              columns['first_stake_time'].tolist()))),
+                       current_time)
+        logger.info(f"📈 순위 전체 재계산: {len(engine.order):,}개 지갑")
 
-            except Exception as e:
-                logger.warning(f"⚠️ 기존 데이터 로드 실패: {e}")
-                logger.info("🆕 새로운 데이터로 시작합니다.")
-        else:
-            # 정상적인 증분 처리
-            start_block = checkpoint['last_incremental']['block'] + 1
-            
-            # 너무 많은 블록 방지 (최대 10,000블록)
-            if latest_block - start_block > 10000:
-                start_block = latest_block - 10000
-                logger.warning(f"⚠️ 블록 범위 제한: 최근 10,000블록만 스캔")
-        
-        if start_block > latest_block:
-            logger.info("✅ 새로운 블록 없음")
-            return True
-        
-        total_blocks = latest_block - start_block
-        logger.info(f"📊 증분 스캔 범위: {start_block:,} → {latest_block:,} ({total_blocks:,}블록)")
-        
-        # 기존 데이터 유지 (전체 초기화하지 않음)
-        # staking_data는 전역 변수이므로 기존 데이터 유지됨
-        
-        total_stake_txs = 0
-        total_unstake_txs = 0
-        processed = 0
-        
-        current_block = start_block
-        chunk_num = 1
-        
-        while current_block <= latest_block:
-            chunk_end = min(current_block + 1499, latest_block)
-            chunk_size = chunk_end - current_block + 1
-            
-            progress = processed / total_blocks * 100
-            logger.info(f"🔄 증분 {progress:.1f}% | 청크#{chunk_num} | 블록 {current_block:,}→{chunk_end:,}")
-            
-            logs = safe_scan_chunk(current_block, chunk_end)
-            
-            if not logs:
-                current_block = chunk_end + 1
-                processed += chunk_size
-                chunk_num += 1
-                continue
-            
-            # 트랜잭션 처리 (기존 로직 재사용)
-            tx_hashes = list(set(log['transactionHash'] for log in logs))
-            
-            for tx_hash in tx_hashes:
-                try:
-                    tx_result = rpc_call("eth_getTransactionByHash", [tx_hash])
-                    
-                    if not tx_result or 'result' not in tx_result or not tx_result['result']:
-                        continue
-                    
-                    tx = tx_result['result']
-                    input_data = tx.get('input', '0x')
-                    
-                    if len(input_data) >= 10:
-                        method_id = input_data[:10]
-                        from_addr = tx['from'].lower()
-                        block_num = int(tx['blockNumber'], 16)
-                        
-                        # 블록 타임스탬프
-                        block_result = rpc_call("eth_getBlockByNumber", [tx['blockNumber'], False])
-                        timestamp = 0
-                        if block_result and 'result' in block_result and block_result['result']:
-                            timestamp = int(block_result['result']['timestamp'], 16)
-                        
-                        if method_id == STAKE_METHOD_ID:
-                            # 스테이킹 트랜잭션
-                            amount = decode_amount(input_data)
-                            
-                            staking_data[from_addr]['total_staked'] += amount
-                            staking_data[from_addr]['stake_count'] += 1
-                            staking_data[from_addr]['is_active'] = True
-                            
-                            if not staking_data[from_addr]['first_stake_time']:
-                                staking_data[from_addr]['first_stake_time'] = timestamp
-                            
-                            staking_data[from_addr]['last_action_time'] = timestamp
-                            
-                            staking_data[from_addr]['stake_transactions'].append({
-                                'amount': amount,
-                                'block': block_num,
-                                'timestamp': timestamp,
-                                'hash': tx_hash
-                            })
-                            
-                            total_stake_txs += 1
-                            logger.info(f"✅ 새 스테이킹: {from_addr[:8]}... +{amount:.4f}")
-                        
-                        elif method_id == UNSTAKE_METHOD_ID:
-                            # 언스테이킹 시도
-                            staking_data[from_addr]['unstake_count'] += 1
-                            staking_data[from_addr]['is_active'] = False
-                            staking_data[from_addr]['last_action_time'] = timestamp
-                            
-                            staking_data[from_addr]['unstake_attempts'].append({
-                                'block': block_num,
-                                'timestamp': timestamp,
-                                'hash': tx_hash
-                            })
-                            
-                            total_unstake_txs += 1
-                            logger.info(f"❌ 언스테이킹: {from_addr[:8]}...")
-                
-                except Exception as e:
-                    continue
-                    
-                time.sleep(0.005)
-            
-            current_block = chunk_end + 1
-            processed += chunk_size
-            chunk_num += 1
-            time.sleep(0.1)
-        
-        # 체크포인트 업데이트
-        checkpoint['last_incremental'] = {
-            'block': latest_block,
-            'timestamp': datetime.now(timezone.utc).isoformat()
-        }
-        save_checkpoint(checkpoint)
-        
-        logger.info(f"🎉 증분 데이터 추출 완료!")
-        logger.info(f"   새 Stake 트랜잭션: {total_stake_txs:,}개")
-        logger.info(f"   새 Unstake 시도: {total_unstake_txs:,}개")
-        logger.info(f"   영향받은 지갑: {total_stake_txs + total_unstake_txs}개")
-        
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ 증분 데이터 추출 실패: {e}")
-        logger.error(traceback.format_exc())
-        return False    
+    engine.block = ranking_sync['block']
+    if engine.record_snapshot(current_time):
+        logger.info(f"📌 순위 스냅샷 기록: {len(engine.order):,}개 지갑 (보관 {len(engine.snapshots)}개)")
+    engine.save()
+    # 다음 갱신은 지금 상태를 기준으로
+    ranking_sync.update(base_block=engine.block, dirty=set())
+    return engine
 
 def process_leaderboard_data():
     """리더보드 데이터 처리 및 생성 (안전 모드 지원)"""
@@ -981,54 +1021,34 @@ def process_leaderboard_data():
     
     try:
         # 제네시스 블록 타임스탬프 계산
-        block_result = rpc_call("eth_getBlockByNumber", [hex(GENESIS_BLOCK), False])
-        genesis_timestamp = 0
-        if block_result and 'result' in block_result and block_result['result']:
-            genesis_timestamp = int(block_result['result']['timestamp'], 16)
+        genesis_timestamp = get_block_timestamp(GENESIS_BLOCK)
         
         genesis_deadline = genesis_timestamp + 86400  # 1일 후
         
-        # 활성 지갑만 추출
-        all_wallets = [(addr, data) for addr, data in staking_data.items() if data['total_staked'] > 0]
-        active_wallets = [(addr, data) for addr, data in all_wallets if data['is_active']]
+        current_time = int(datetime.now(timezone.utc).timestamp())
         
-        # 타임스코어 기준 정렬
-        sorted_wallets = sorted(all_wallets, key=lambda x: (
-            x[1]['total_staked'] * ((int(datetime.now(timezone.utc).timestamp()) - x[1]['first_stake_time']) / 86400)
-            if x[1]['first_stake_time'] else 0
-        ), reverse=True)
+        # 타임스코어 기준 정렬 (순위 엔진: 바뀐 지갑만 재삽입)
+        engine = update_ranking(current_time)
+        addresses = engine.order
+        wallets = staking_data.columns(staking_data.ids_for(addresses))
         
-        leaderboard_data = []
-        total_time_score = 0
+        # 점수/비율/등급 일괄 계산
+        scores = score_wallets(wallets, genesis_deadline, current_time)
         
-        # 전체 타임스코어 계산 (에어드랍 비율 계산용)
-        current_time = int(datetime.now(timezone.utc).timestamp())
-        for _, data in active_wallets:
-            if data['first_stake_time']:
-                holding_days = (current_time - data['first_stake_time']) / 86400
-                total_time_score += data['total_staked'] * holding_days
-        
-        for rank, (address, data) in enumerate(sorted_wallets, 1):
-            # 등급 및 퍼센타일 계산
-            grade, percentile = calculate_grade_percentile(data, genesis_deadline, active_wallets)
-            
-            # 타임스코어 계산
-            holding_days = 0
-            time_score = 0
-            if data['first_stake_time']:
-                holding_days = (current_time - data['first_stake_time']) / 86400
-                time_score = data['total_staked'] * holding_days
-            
-            # 에어드랍 할당 비율 계산
-            airdrop_share_phase = 0
-            airdrop_share_total = 0
-            if data['is_active'] and total_time_score > 0:
-                airdrop_share_phase = (time_score / total_time_score) * 100
-                airdrop_share_total = airdrop_share_phase * TOTAL_PHASES
-            
-            # 24시간 변동 (임시로 0 설정, 향후 이전 데이터와 비교)
-            rank_change_24h = 0
-            score_change_24h = 0
+        # 출력 단계에서만 행 생성
+        leaderboard_data = []
+        columns = zip(addresses, wallets['total_staked'].tolist(), wallets['stake_count'].tolist(),
+                      wallets['unstake_count'].tolist(), wallets['is_active'].tolist(),
+                      wallets['first_stake_time'].tolist(), wallets['last_action_time'].tolist(),
+                      scores['grade'].tolist(), scores['percentile'].tolist(),
+                      scores['time_score'].tolist(), scores['holding_days'].tolist(),
+                      scores['airdrop_share_phase'].tolist(), scores['airdrop_share_total'].tolist())
+        for rank, (address, total_staked, stake_count, unstake_count, is_active, first_stake_time,
+                   last_action_time, grade, percentile, time_score, holding_days,
+                   airdrop_share_phase, airdrop_share_total) in enumerate(columns, 1):
+            # 24시간 변동: 약 하루 전 순위 스냅샷 대비 (양수 = 상승, 그 이후 신규 지갑은 0)
+            rank_change_24h, score_change_24h = engine.change_of(address, rank, current_time)
+            score_change_24h = round(score_change_24h, 2)
             
             # 기본 21개 컬럼 데이터
             item_data = {
@@ -1037,19 +1057,19 @@ def process_leaderboard_data():
                 'grade': grade,
                 'grade_emoji': get_grade_emoji(grade),
                 'percentile': round(percentile, 2),
-                'total_staked': round(data['total_staked'], 4),
+                'total_staked': round(total_staked, 4),
                 'time_score': round(time_score, 2),
                 'holding_days': round(holding_days, 1),
-                'stake_count': data['stake_count'],
-                'unstake_count': data['unstake_count'],
-                'is_active': data['is_active'],
+                'stake_count': stake_count,
+                'unstake_count': unstake_count,
+                'is_active': is_active,
                 'current_phase': CURRENT_PHASE,
                 'phase_score': round(time_score, 2),
                 'total_score_all_phases': round(time_score, 2),
                 'airdrop_share_phase': round(airdrop_share_phase, 6),
                 'airdrop_share_total': round(airdrop_share_total, 6),
-                'first_stake_time': data['first_stake_time'],
-                'last_action_time': data['last_action_time'],
+                'first_stake_time': first_stake_time or None,
+                'last_action_time': last_action_time or None,
                 'rank_change_24h': rank_change_24h,
                 'score_change_24h': score_change_24h,
                 'phase_rank_history': f"P1:{rank}"
@@ -1090,169 +1110,156 @@ def upload_to_apps_script_web_app(data, mode='full'):  # 🆕 mode 파라미터
         cleaned_data = clean_data_for_json(data)
         logger.info(f"🧹 데이터 정제 완료: {len(cleaned_data)}개 항목")
         
+        version = new_upload_version()
+        baseline = get_upload_baseline()
+        
+        # 🆕 증분 모드: 마지막 업로드 대비 변경분만 전송
+        if mode == 'incremental':
+            # 이전 실행에서 중단된 청크 업로드가 있으면 남은 청크만 보내 마무리하고 그 내용을 기준으로 삼음
+            resumed = resume_interrupted_upload(post=post_to_apps_script, encode=encode_upload_body)
+            if resumed is not None:
+                resumed_rows, resumed_mode, resumed_version = resumed
+                baseline.save(resumed_rows, resumed_version, resumed_mode)
+            delta = baseline.delta(cleaned_data, version)
+            if delta is not None:
+                result = upload_delta_to_apps_script(delta, mode)
+                if result is not None:
+                    if result == 'applied':
+                        baseline.save(cleaned_data, version, mode)
+                    return result != 'failed'
+                logger.info("🔄 수신 측 기준 버전 불일치 - 전체 데이터로 재동기화")
+            # 전체 데이터를 보낼 때는 'full'로 보내야 수신 측이 빠진 행까지 지움
+            # (incremental 모드의 updateLiveSheet는 행을 갱신/추가만 함)
+            mode = 'full'
+        
         # 🆕 모드 정보 포함
         request_data = {
             'mode': mode,  # 'incremental' or 'full'
+            'version': version,
             'data': cleaned_data
         }
         
-        # JSON 데이터 준비 (안전한 직렬화)
-        json_data = json.dumps(request_data, ensure_ascii=True, separators=(',', ':'))
+        # JSON 데이터 준비 (안전한 직렬화, 설정 시 gzip 압축)
+        json_data, raw_size = encode_upload_body(request_data)
         
-        # 📊 데이터 크기 체크
-        data_size_mb = len(json_data.encode('utf-8')) / (1024 * 1024)
-        logger.info(f"📊 JSON 크기: {data_size_mb:.2f}MB")
+        # 📊 데이터 크기 체크 (전송 크기 기준)
+        data_size_mb = len(json_data) / (1024 * 1024)
+        logger.info(f"📊 JSON 크기: {data_size_mb:.2f}MB"
+                    f"{f' (압축 전 {raw_size / (1024 * 1024):.2f}MB)' if raw_size != len(json_data) else ''}")
         
         # 크기가 너무 크면 청크 단위로 전송
         if data_size_mb > 5:  # 5MB 초과시
-            return upload_large_data_in_chunks(cleaned_data, mode)  # 🆕 mode 전달
-        
-        headers = {
-            'Content-Type': 'application/json; charset=utf-8',
-            'User-Agent': 'STAKE-Leaderboard-GitHub-Action/1.0'
-        }
+            uploaded_version = upload_large_data_in_chunks(cleaned_data, mode, version)  # 🆕 mode 전달
+            if uploaded_version is None:
+                return False
+            baseline.save(cleaned_data, uploaded_version, mode)
+            return True
         
         logger.info(f"📤 Apps Script Web App으로 POST 요청")
         logger.info(f"📊 데이터 크기: {len(cleaned_data)}개 항목, {data_size_mb:.2f}MB")
         
-        # 🆕 타임아웃 처리 개선
-        try:
-            response = requests.post(
-                APPS_SCRIPT_WEB_APP_URL,
-                data=json_data,
-                headers=headers,
-                timeout=30  # 30초로 단축
-            )
-            logger.info(f"📡 응답 받음: {response.status_code}")
-            
-            # 응답 코드만 확인하고 바로 성공 처리
-            if response.status_code in [200, 201, 202, 302]:
-                logger.info("✅ Apps Script Web App 업로드 성공!")
-                return True
-            else:
-                logger.warning(f"⚠️ 예상치 못한 응답 코드: {response.status_code}")
-                # 하지만 Apps Script는 실행됐을 가능성이 높으므로
-                return True
-                
-        except requests.exceptions.Timeout:
-            # Apps Script 실행 기록상 12초면 완료되므로
-            logger.warning("⏰ 응답 타임아웃 (30초) - 하지만 서버 처리는 완료됨")
-            logger.info("✅ 시트 업데이트는 성공했을 것으로 간주")
-            return True
-            
-        except requests.exceptions.ConnectionError:
-            logger.error("❌ 연결 오류")
+        status, _ = post_to_apps_script(json_data)
+        if status == 'failed':
             return False
+        # 응답이 없어도 (타임아웃) 반영됐을 가능성이 높으므로 기준 갱신
+        # (반영되지 않았다면 다음 델타에서 수신 측이 재동기화를 요청)
+        baseline.save(cleaned_data, version, mode)
+        logger.info("✅ Apps Script Web App 업로드 성공!")
+        return True
             
     except Exception as e:
         logger.error(f"❌ Apps Script Web App 오류: {e}")
         return False
 
+def post_to_apps_script(json_data, timeout=30):
+    """Apps Script Web App POST → (상태, 응답 dict)
+
+    상태: 'ok' (응답 받음), 'timeout' (응답 없음, 서버 처리는 완료됐을 가능성 높음), 'failed' (연결 오류)
+    """
+    headers = {
+        'Content-Type': 'application/json; charset=utf-8',
+        'User-Agent': 'STAKE-Leaderboard-GitHub-Action/1.0'
+    }
+    
+    # 🆕 타임아웃 처리 개선
+    try:
+        response = requests.post(
+            APPS_SCRIPT_WEB_APP_URL,
+            data=json_data,
+            headers=headers,
+            timeout=timeout
+        )
+        logger.info(f"📡 응답 받음: {response.status_code}")
+        
+        # 응답 코드만 확인 (Apps Script는 실행됐을 가능성이 높으므로 예상 밖 코드도 성공 처리)
+        if response.status_code not in [200, 201, 202, 302]:
+            logger.warning(f"⚠️ 예상치 못한 응답 코드: {response.status_code}")
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return 'ok', body if isinstance(body, dict) else None
+        
+    except requests.exceptions.Timeout:
+        # Apps Script 실행 기록상 12초면 완료되므로
+        logger.warning(f"⏰ 응답 타임아웃 ({timeout}초) - 하지만 서버 처리는 완료됨")
+        logger.info("✅ 시트 업데이트는 성공했을 것으로 간주")
+        return 'timeout', None
+        
+    except requests.exceptions.ConnectionError:
+        logger.error("❌ 연결 오류")
+        return 'failed', None
+
+def upload_delta_to_apps_script(delta, mode):
+    """변경분만 전송 → 'applied' / 'unconfirmed' / 'failed' (기준 불일치면 None)"""
+    delta['mode'] = mode
+    delta['total_phases'] = TOTAL_PHASES  # 수신 측 airdrop_share_total 재계산용
+    json_data, _ = encode_upload_body(delta)
+    data_size_kb = len(json_data) / 1024
+    logger.info(f"📤 델타 업로드: 추가 {len(delta['inserted']):,} / 변경 {len(delta['changed']):,} / "
+                f"삭제 {len(delta['removed']):,}개 ({data_size_kb:,.1f}KB, 기준 {delta['base_version']})")
+    
+    status, body = post_to_apps_script(json_data)
+    if status == 'failed':
+        return 'failed'
+    if body is None:
+        # 반영 여부를 알 수 없으므로 기준은 유지 (다음 델타에서 불일치 시 재동기화)
+        return 'unconfirmed'
+    if body.get('status') == 'resync':
+        logger.warning(f"⚠️ 수신 측 버전 {body.get('expected_version')} ≠ 기준 {delta['base_version']}")
+        return None
+    if body.get('status') != 'success':
+        logger.error(f"❌ 델타 반영 실패: {body.get('message')}")
+        return 'failed'
+    logger.info(f"✅ 델타 업로드 성공 (버전 {delta['version']})")
+    return 'applied'
+
 def clean_data_for_json(data):
-    """🧹 JSON 안전 처리를 위한 데이터 정제"""
+    """🧹 JSON 안전 처리를 위한 데이터 정제 (규칙은 upload_transport.sanitize_rows 참고)"""
     logger.info("🧹 JSON 안전 처리 시작...")
     
-    cleaned_data = []
-    
-    for item in data:
-        cleaned_item = {}
-        
-        for key, value in item.items():
-            # 🔧 특수문자 처리
-            if isinstance(value, str):
-                # 문제가 될 수 있는 문자들 제거/교체
-                cleaned_value = value.replace('\n', ' ').replace('\r', ' ')
-                cleaned_value = cleaned_value.replace('\t', ' ').replace('\\', '/')
-                cleaned_value = cleaned_value.replace('"', "'").replace('\b', ' ')
-                cleaned_value = cleaned_value.replace('\f', ' ').replace('\v', ' ')
-                
-                # 제어 문자 제거
-                cleaned_value = ''.join(char for char in cleaned_value if ord(char) >= 32 or char in ['\n', '\r', '\t'])
-                
-                # 너무 긴 문자열 자르기
-                if len(cleaned_value) > 1000:
-                    cleaned_value = cleaned_value[:997] + "..."
-                
-                cleaned_item[key] = cleaned_value.strip()
-                
-            elif isinstance(value, (int, float)):
-                # 숫자값 안전 처리
-                if isinstance(value, float):
-                    if value != value:  # NaN 체크
-                        cleaned_item[key] = 0
-                    elif value == float('inf') or value == float('-inf'):
-                        cleaned_item[key] = 0
-                    else:
-                        cleaned_item[key] = round(value, 6)
-                else:
-                    cleaned_item[key] = value
-                    
-            elif isinstance(value, bool):
-                cleaned_item[key] = value
-                
-            elif value is None:
-                cleaned_item[key] = ""
-                
-            else:
-                # 기타 타입은 문자열로 변환
-                cleaned_item[key] = str(value)
-        
-        cleaned_data.append(cleaned_item)
+    # 주소는 로그 토픽에서 만든 0x + 16진수 문자열이라 정제할 것이 없음
+    cleaned_data = sanitize_rows(data, safe_columns=('address',))
     
     logger.info(f"✅ 데이터 정제 완료: {len(cleaned_data)}개 항목")
     return cleaned_data
 
-def upload_large_data_in_chunks(data):
-    """📦 대용량 데이터 청크 단위 업로드"""
-    logger.info("📦 대용량 데이터 청크 업로드 시작...")
-    
-    chunk_size = 100  # 100개씩 나누어 전송
-    total_chunks = (len(data) + chunk_size - 1) // chunk_size
+def upload_large_data_in_chunks(data, mode='full', version=None):
+    """📦 대용량 데이터 청크 단위 업로드 → 수신 측에 반영된 버전 (실패 시 None)
+
+    청크는 세션 id/번호를 달고 최대 UPLOAD_CHUNK_CONCURRENCY개씩 동시에 전송되며,
+    수신 측이 확인한 청크는 다시 보내지 않는다 (중단된 세션은 같은 데이터로 다시 호출하거나,
+    다음 증분 실행의 resume_interrupted_upload가 저장된 행으로 이어서 전송).
+    """
+    logger.info(f"📦 대용량 데이터 청크 업로드 시작... ({len(data):,}개 항목, {mode} 모드)")
     
     try:
-        for i in range(0, len(data), chunk_size):
-            chunk = data[i:i + chunk_size]
-            chunk_num = (i // chunk_size) + 1
-            
-            logger.info(f"📦 청크 {chunk_num}/{total_chunks} 업로드 중... ({len(chunk)}개 항목)")
-            
-            # 청크 데이터 준비
-            chunk_data = {
-                "chunk_number": chunk_num,
-                "total_chunks": total_chunks,
-                "data": chunk,
-                "is_chunk": True
-            }
-            
-            json_data = json.dumps(chunk_data, ensure_ascii=True, separators=(',', ':'))
-            
-            headers = {
-                'Content-Type': 'application/json; charset=utf-8',
-                'User-Agent': 'STAKE-Leaderboard-GitHub-Action/1.0'
-            }
-            
-            response = requests.post(
-                APPS_SCRIPT_WEB_APP_URL,
-                data=json_data,
-                headers=headers,
-                timeout=120
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"❌ 청크 {chunk_num} 업로드 실패: {response.status_code}")
-                return False
-            
-            logger.info(f"✅ 청크 {chunk_num}/{total_chunks} 업로드 완료")
-            
-            # 청크 간 대기
-            time.sleep(1)
-        
-        logger.info("✅ 모든 청크 업로드 완료")
-        return True
+        return upload_chunks(data, mode, version or new_upload_version(),
+                             post=post_to_apps_script, encode=encode_upload_body)
         
     except Exception as e:
         logger.error(f"❌ 청크 업로드 실패: {e}")
-        return False
+        return None
 
 def save_to_github_pages(data):
     """GitHub Pages용 JSON 파일 생성 및 자동 커밋 (백업용)"""
@@ -1263,24 +1270,29 @@ def save_to_github_pages(data):
         public_dir = '../public'
         os.makedirs(public_dir, exist_ok=True)
         
-        # API 형식으로 데이터 정리
-        api_data = {
+        # API 형식으로 데이터 정리 (leaderboard 배열은 행 단위로 기록)
+        api_fields = {
             "last_updated": datetime.now(timezone.utc).isoformat(),
             "total_wallets": len(data),
-            "active_wallets": len([d for d in data if d.get('is_active')]),
+            "active_wallets": sum(1 for d in data if d.get('is_active')),
             "phase": 1,
             "safe_mode": SAFE_MODE,
-            "update_range": UPDATE_RANGE if SAFE_MODE else "A:AM",
-            "leaderboard": data
+            "update_range": UPDATE_RANGE if SAFE_MODE else "A:AM"
         }
         
         # JSON 파일 저장
         json_file = f'{public_dir}/leaderboard.json'
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(api_data, f, ensure_ascii=False, indent=2)
+        count = export_rows(json_file, data, 'json', fields=api_fields, rows_key='leaderboard')
+        pages_files = ['public/leaderboard.json']
+        
+        # 압축본도 함께 생성 (클라이언트가 .gz를 받아 해제)
+        if PAGES_GZIP:
+            gzip_file(json_file, json_file + '.gz')
+            pages_files.append('public/leaderboard.json.gz')
+            logger.info(f"🗜️ 압축 JSON 생성: {json_file}.gz ({os.path.getsize(json_file + '.gz') / 1024:,.1f}KB)")
         
         logger.info(f"✅ JSON 파일 생성: {json_file}")
-        logger.info(f"📊 데이터 크기: {len(api_data['leaderboard'])}개 항목")
+        logger.info(f"📊 데이터 크기: {count}개 항목")
         
         if SAFE_MODE:
             logger.info("🛡️ 안전 모드: 신규 18개 컬럼은 Apps Script에서 자동 추가됩니다")
@@ -1296,7 +1308,7 @@ def save_to_github_pages(data):
                          cwd='..', check=False)
             
             # 파일 추가 및 커밋
-            subprocess.run(['git', 'add', 'public/leaderboard.json'], 
+            subprocess.run(['git', 'add'] + pages_files, 
                          cwd='..', check=True)
             
             commit_msg = f"Update leaderboard data (Apps Script Web App) - {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')}"
@@ -1319,49 +1331,38 @@ def save_to_github_pages(data):
         return False
 
 def save_backup_data(data):
-    """백업 데이터 저장"""
+    """백업 데이터 저장 (JSON/CSV + 지갑 스냅샷, 매니페스트에 기록)"""
     try:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
         # 백업 디렉토리 생성
-        os.makedirs('backup', exist_ok=True)
+        manifest = get_backup_manifest()
+        os.makedirs(manifest.directory, exist_ok=True)
         
         safe_mode_suffix = "_safe" if SAFE_MODE else ""
-        backup_file = f'backup/stake_leaderboard_{timestamp}{safe_mode_suffix}.json'
-        
-        with open(backup_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        logger.info(f"💾 백업 저장 완료: {backup_file}")
-        
-        # CSV도 저장
-        df = pd.DataFrame(data)
-        csv_file = f'backup/stake_leaderboard_{timestamp}{safe_mode_suffix}.csv'
-        df.to_csv(csv_file, index=False, encoding='utf-8-sig')
-        logger.info(f"💾 CSV 백업 저장 완료: {csv_file}")
-        
-    except Exception as e:
-        logger.error(f"❌ 백업 저장 실패: {e}")
-    """백업 데이터 저장"""
-    try:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        safe_mode_suffix = "_safe" if SAFE_MODE else ""
-        backup_file = f'backup/stake_leaderboard_{timestamp}{safe_mode_suffix}.json'
-        
-        # 백업 디렉토리 생성
-        os.makedirs('backup', exist_ok=True)
+        run_id = f'{timestamp}{safe_mode_suffix}'
         
-        with open(backup_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # 형식별로 행 단위 기록 (JSON, CSV, 선택 시 NDJSON)
+        files = {}
+        for fmt in BACKUP_FORMATS:
+            files[fmt] = os.path.join(manifest.directory, f'stake_leaderboard_{run_id}.{fmt}')
+            export_rows(files[fmt], data, fmt)
+            logger.info(f"💾 {fmt.upper()} 백업 저장 완료: {files[fmt]}")
         
-        logger.info(f"💾 백업 저장 완료: {backup_file}")
-        
-        # CSV도 저장
-        df = pd.DataFrame(data)
-        csv_file = f'backup/stake_leaderboard_{timestamp}{safe_mode_suffix}.csv'
-        df.to_csv(csv_file, index=False, encoding='utf-8-sig')
-        logger.info(f"💾 CSV 백업 저장 완료: {csv_file}")
+        # 방금 커밋된 지갑 스냅샷 사본 (다음 실행의 복원 기준)
+        snapshot_file, block, wallets = None, None, None
+        try:
+            header = read_snapshot_header(WALLET_SNAPSHOT_FILE)
+            snapshot_file = os.path.join(manifest.directory, f'wallet_state_{run_id}.snap')
+            shutil.copyfile(WALLET_SNAPSHOT_FILE, snapshot_file)
+            block, wallets = header['block'], header['count']
+        except SnapshotError as e:
+            logger.warning(f"⚠️ 지갑 스냅샷이 없어 백업에서 제외합니다: {e}")
+        
+        files['snapshot'] = snapshot_file
+        manifest.record(run_id, files,
+                        block=block, wallets=wallets)
+        logger.info(f"🗂️ 백업 매니페스트 갱신: {len(manifest.entries)}개 보존")
         
     except Exception as e:
         logger.error(f"❌ 백업 저장 실패: {e}")
@@ -1379,6 +1380,9 @@ def update_leaderboard():
     try:
         # 1. STAKE 데이터 추출
         if not extract_all_stake_data():
+            if load_full_scan_state():
+                logger.info("⏸️ 전체 스캔 진행 중 - 다음 실행에서 이어서 업데이트합니다")
+                return
             raise Exception("STAKE 데이터 추출 실패")
         
         # 2. 리더보드 데이터 처리
@@ -1412,6 +1416,121 @@ def update_leaderboard():
         logger.error(f"❌ 오류: {e}")
         logger.error(traceback.format_exc())
 
+def publish_leaderboard(mode='incremental', backup=True):
+    """리더보드 처리 → 백업 → Apps Script 업로드 (실패 시 GitHub Pages) → 성공 여부"""
+    leaderboard_data = process_leaderboard_data()
+    if not leaderboard_data:
+        logger.error("❌ 리더보드 데이터 처리 실패")
+        return False
+    if backup:
+        save_backup_data(leaderboard_data)
+    if upload_to_apps_script_web_app(leaderboard_data, mode=mode):
+        return True
+    logger.warning("⚠️ Apps Script Web App 실패, GitHub Pages로 전환...")
+    return save_to_github_pages(leaderboard_data)
+
+# === 헤드 추적 모드 (--follow) ===
+FOLLOW_POLL_SECONDS = float(os.environ.get('FOLLOW_POLL_SECONDS', '4'))
+# 게시 최소 간격 (변경 지갑이 FOLLOW_PUBLISH_MIN_CHANGES개 이상 쌓이면 바로 게시)
+FOLLOW_PUBLISH_SECONDS = float(os.environ.get('FOLLOW_PUBLISH_SECONDS', '60'))
+FOLLOW_PUBLISH_MIN_CHANGES = int(os.environ.get('FOLLOW_PUBLISH_MIN_CHANGES', '50'))
+# 변경이 없어도 이 간격으로 게시 (보유일수/타임스코어는 시간에 따라 증가)
+FOLLOW_REFRESH_SECONDS = float(os.environ.get('FOLLOW_REFRESH_SECONDS', '3600'))
+# 이벤트가 없을 때 지갑 스냅샷 저장 간격, 백업 간격
+FOLLOW_COMMIT_SECONDS = float(os.environ.get('FOLLOW_COMMIT_SECONDS', '60'))
+FOLLOW_BACKUP_SECONDS = float(os.environ.get('FOLLOW_BACKUP_SECONDS', '3600'))
+FOLLOW_MAX_BACKOFF_SECONDS = 60
+
+def follow_chain(max_polls=None):
+    """🛰️ 헤드 추적 모드: 몇 초마다 새 블록만 메모리 상태에 반영하고 모아서 게시
+
+    지갑 상태는 시작할 때 한 번만 로드해 메모리에 두고, 새 블록이 없으면 폴링 한 번에
+    eth_blockNumber 한 번만 호출한다. 변경된 지갑(ranking_sync['dirty'])이
+    FOLLOW_PUBLISH_MIN_CHANGES개를 넘으면 바로, 아니면 FOLLOW_PUBLISH_SECONDS마다 게시한다.
+    max_polls는 테스트용 (None이면 중지될 때까지).
+    """
+    logger.info("🛰️ === 헤드 추적 모드 시작 ===")
+    logger.info(f"📋 폴링 {FOLLOW_POLL_SECONDS:g}초, 게시 간격 {FOLLOW_PUBLISH_SECONDS:g}초 "
+                f"(변경 {FOLLOW_PUBLISH_MIN_CHANGES}개 이상이면 즉시), 확정 깊이 {CONFIRMATION_DEPTH}블록")
+    
+    checkpoint = load_incremental_state()
+    if not checkpoint.get('genesis_scan_completed', False):
+        logger.warning("⚠️ 초기 전체 스캔이 아직 실행되지 않았습니다. 전체 스캔 후 추적 모드를 사용하세요.")
+    
+    # 시작 직후 한 번 게시
+    last_publish = last_backup = -float('inf')
+    last_commit = time.monotonic()
+    uncommitted = False
+    publish_pending = False
+    failures = 0
+    polls = 0
+    
+    def commit():
+        nonlocal uncommitted, last_commit
+        commit_wallet_state(checkpoint)
+        uncommitted = False
+        last_commit = time.monotonic()
+    
+    try:
+        while max_polls is None or polls < max_polls:
+            polls += 1
+            started = time.monotonic()
+            try:
+                latest_block = get_latest_block()
+                if not latest_block:
+                    raise Exception("최신 블록 조회 실패")
+                
+                # 새 블록만 반영 (메모리 상태 유지)
+                if latest_block > checkpoint['last_incremental']['block']:
+                    totals = scan_new_blocks(checkpoint, latest_block, verbose=False)
+                    if totals is not None:
+                        uncommitted = True
+                        if sum(totals):
+                            logger.info(f"⛓️ 블록 {checkpoint['last_incremental']['block']:,}: stake {totals[0]}건, unstake {totals[1]}건 "
+                                        f"(게시 대기 지갑 {len(ranking_sync['dirty']):,}개)")
+                            commit()
+                
+                now = time.monotonic()
+                if uncommitted and now - last_commit >= FOLLOW_COMMIT_SECONDS:
+                    commit()
+                
+                # 게시 (디바운스 + 임계값 + 주기 갱신)
+                changes = len(ranking_sync['dirty'])
+                since_publish = now - last_publish
+                if (changes >= FOLLOW_PUBLISH_MIN_CHANGES
+                        or ((changes or publish_pending) and since_publish >= FOLLOW_PUBLISH_SECONDS)
+                        or since_publish >= FOLLOW_REFRESH_SECONDS):
+                    if uncommitted:
+                        commit()
+                    backup = now - last_backup >= FOLLOW_BACKUP_SECONDS
+                    logger.info(f"📣 게시: 변경 지갑 {changes:,}개, 블록 {checkpoint['last_incremental']['block']:,}")
+                    publish_pending = not publish_leaderboard('incremental', backup=backup)
+                    last_publish = now
+                    if backup:
+                        last_backup = now
+                failures = 0
+            except Exception as e:
+                failures += 1
+                delay = min(FOLLOW_POLL_SECONDS * 2 ** failures, FOLLOW_MAX_BACKOFF_SECONDS)
+                logger.error(f"❌ 추적 오류 ({failures}회 연속): {e} - {delay:.0f}초 후 재시도")
+                logger.error(traceback.format_exc())
+                time.sleep(delay)
+                # 스캔 도중 실패했으면 일부 청크만 반영됐을 수 있으므로 마지막 저장 상태로 되돌림
+                try:
+                    checkpoint = load_incremental_state()
+                    uncommitted = False
+                    publish_pending = True
+                except Exception as reload_error:
+                    logger.error(f"❌ 지갑 상태 재로드 실패: {reload_error}")
+                continue
+            
+            time.sleep(max(0.0, FOLLOW_POLL_SECONDS - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        logger.info("⏹️ 헤드 추적 중지됨")
+    finally:
+        if uncommitted:
+            commit()
+
 def start_scheduler():
     """스케줄러 시작"""
     logger.info("⏰ STAKE 리더보드 스케줄러 시작")
@@ -1447,7 +1566,7 @@ if __name__ == "__main__":
     import sys
     
     logger.info("🥩 STAKE 리더보드 시스템 시작 (Apps Script Web App 연동)")
-    logger.info(f"🔗 RPC URL: {RPC_URL}")
+    logger.info(f"🔗 RPC URL: {', '.join(RPC_URLS)}")
     logger.info(f"📋 스테이킹 컨트랙트: {STAKING_ADDRESS}")
     logger.info(f"🎯 제네시스 블록: {GENESIS_BLOCK:,}")
     logger.info(f"📊 현재 페이즈: {CURRENT_PHASE}/{TOTAL_PHASES}")
@@ -1456,7 +1575,10 @@ if __name__ == "__main__":
     
     try:
         # 커맨드라인 인자 확인
-        if '--incremental' in sys.argv or os.environ.get('INCREMENTAL_MODE') == 'true':
+        if '--follow' in sys.argv or os.environ.get('FOLLOW_MODE') == 'true':
+            follow_chain()
+            
+        elif '--incremental' in sys.argv or os.environ.get('INCREMENTAL_MODE') == 'true':
             logger.info("📈 === 증분 업데이트 모드 ===")
             
             # 1. 증분 데이터 추출
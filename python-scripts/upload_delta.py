@@ -0,0 +1,126 @@
+# === Apps Script 델타 업로드 (마지막 업로드 대비 변경분만) ===
+import json
+import logging
+import os
+import time
+import uuid
+
+from atomic_file import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+# 마지막으로 성공한 업로드 내용 (checkpoint.json과 같은 디렉토리, GitHub Actions 캐시로 보존)
+UPLOAD_BASELINE_FILE = os.environ.get('UPLOAD_BASELINE_FILE', 'upload_baseline.json')
+# 변경 셀(행 × 필드)이 전체의 이 비율을 넘으면 델타 대신 전체 전송
+UPLOAD_DELTA_MAX_RATIO = float(os.environ.get('UPLOAD_DELTA_MAX_RATIO', '0.5'))
+ROW_KEY = 'address'
+# 시간이 흐르기만 해도 모든 지갑에서 바뀌는 열: 델타 비교에서 빼고 수신 측이 as_of 기준으로
+# total_staked / first_stake_time / is_active에서 다시 계산한다 (Code.gs recomputeTimeColumns)
+TIME_DERIVED_FIELDS = ('holding_days', 'time_score', 'phase_score', 'total_score_all_phases',
+                       'airdrop_share_phase', 'airdrop_share_total')
+_MISSING = object()
+
+
+def new_upload_version():
+    """업로드 버전 id (수신 측이 기준 불일치를 감지하는 용도)"""
+    return f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+
+
+def compute_delta(previous, rows, ignore=()):
+    """이전 행 {address: 행}과 새 행 목록 비교 → (inserted, changed, removed)
+
+    changed는 바뀐 필드만 담은 {address, 필드: 값} 패치 목록이다 (ignore 필드는 비교하지 않음).
+    """
+    inserted, changed = [], []
+    seen = set()
+    for row in rows:
+        address = row[ROW_KEY]
+        seen.add(address)
+        before = previous.get(address)
+        if before is None:
+            inserted.append(row)
+        elif before != row:
+            patch = {key: value for key, value in row.items()
+                     if key not in ignore and before.get(key, _MISSING) != value}
+            if not patch:
+                continue
+            patch[ROW_KEY] = address
+            changed.append(patch)
+    removed = [address for address in previous if address not in seen]
+    return inserted, changed, removed
+
+
+class UploadBaseline:
+    """마지막으로 수신 측에 반영된 행과 그 버전
+
+    열 이름 목록 + 행별 값 배열로 저장해 키 반복을 피한다.
+    """
+
+    def __init__(self, path=UPLOAD_BASELINE_FILE):
+        self.path = path
+        self.version = None
+        self.mode = None
+        self.rows = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            logger.warning(f"⚠️ 업로드 기준 파일 손상, 다음 업로드는 전체 전송합니다: {e}")
+            return
+        fields = saved['fields']
+        self.version = saved['version']
+        self.mode = saved.get('mode')
+        self.rows = {values[fields.index(ROW_KEY)]: dict(zip(fields, values)) for values in saved['rows']}
+
+    def save(self, rows, version, mode):
+        """업로드 성공 후 기준 갱신"""
+        fields = list(rows[0]) if rows else [ROW_KEY]
+        atomic_write_json(self.path, {
+            'version': version,
+            'mode': mode,
+            'fields': fields,
+            'rows': [[row.get(field) for field in fields] for row in rows]
+        }, separators=(',', ':'))
+        self.version = version
+        self.mode = mode
+        self.rows = {row[ROW_KEY]: row for row in rows}
+
+    def delta(self, rows, version):
+        """델타 요청 본문 (기준이 없거나 변경이 너무 많으면 None)
+
+        TIME_DERIVED_FIELDS는 비교하지 않고 as_of(전송 시각)만 보내 수신 측이 전체 행을 다시 계산한다.
+        """
+        if self.version is None:
+            return None
+        inserted, changed, removed = compute_delta(self.rows, rows, ignore=TIME_DERIVED_FIELDS)
+        width = len([field for field in rows[0] if field not in TIME_DERIVED_FIELDS]) if rows else 1
+        touched = (len(inserted) + len(removed)) * width + sum(len(patch) for patch in changed)
+        if touched > max(len(rows) * width, 1) * UPLOAD_DELTA_MAX_RATIO:
+            logger.info(f"📦 변경 셀 {touched:,}개 / 전체 {len(rows) * width:,}개 - 전체 전송으로 전환")
+            return None
+        return {
+            'delta': True,
+            'base_version': self.version,
+            'version': version,
+            'as_of': int(time.time()),
+            'total_rows': len(rows),
+            'inserted': inserted,
+            'changed': changed,
+            'removed': removed
+        }
+
+
+_default_baseline = None
+
+
+def get_upload_baseline():
+    """프로세스 공용 업로드 기준"""
+    global _default_baseline
+    if _default_baseline is None:
+        _default_baseline = UploadBaseline()
+    return _default_baseline
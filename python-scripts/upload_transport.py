@@ -0,0 +1,128 @@
+# === Apps Script 업로드 본문 인코딩 (선택적 gzip 압축) ===
+import base64
+import gzip
+import json
+import math
+import os
+
+# none | gzip (gzip이면 {"encoding": "gzip+base64", "payload": "..."} 봉투로 전송,
+# 수신 측 Code.gs가 decodeUploadBody를 포함한 버전으로 배포되어 있어야 함)
+UPLOAD_COMPRESSION = os.environ.get('UPLOAD_COMPRESSION', 'none').lower()
+UPLOAD_COMPRESSION_LEVEL = int(os.environ.get('UPLOAD_COMPRESSION_LEVEL', '6'))
+# 이보다 작은 본문은 압축하지 않음 (base64 오버헤드가 더 큼)
+UPLOAD_COMPRESSION_MIN_BYTES = int(os.environ.get('UPLOAD_COMPRESSION_MIN_BYTES', '2048'))
+
+COMPRESSED_ENCODING = 'gzip+base64'
+
+# === 업로드 행 정제 (Apps Script 쪽 JSON/시트 처리에 안전한 값으로) ===
+
+SANITIZE_MAX_STRING = 1000
+# 줄바꿈/탭 등은 공백, 역슬래시는 /, 큰따옴표는 작은따옴표, 나머지 제어 문자는 삭제
+_STRING_TABLE = str.maketrans({
+    **{chr(c): None for c in range(32)},
+    **{c: ' ' for c in '\n\r\t\b\f\v'},
+    '\\': '/',
+    '"': "'"
+})
+# 열마다 이 개수를 넘는 서로 다른 문자열은 메모하지 않음 (주소처럼 모두 다른 값)
+_MEMO_LIMIT = 1024
+
+
+def sanitize_string(value):
+    """문자열 하나 정제 (치환/제어 문자 삭제 → 길이 제한 → 앞뒤 공백 제거)"""
+    if (value.isprintable() and '"' not in value and '\\' not in value
+            and len(value) <= SANITIZE_MAX_STRING and value == value.strip()):
+        return value
+    cleaned = value.translate(_STRING_TABLE)
+    if len(cleaned) > SANITIZE_MAX_STRING:
+        cleaned = cleaned[:SANITIZE_MAX_STRING - 3] + "..."
+    return cleaned.strip()
+
+
+def sanitize_value(value):
+    """값 하나 정제 (NaN/inf → 0, 실수는 소수 6자리, None → '', 기타 타입 → str)"""
+    if isinstance(value, str):
+        return sanitize_string(value)
+    if isinstance(value, float):
+        return round(value, 6) if math.isfinite(value) else 0
+    if isinstance(value, int):
+        return value
+    if value is None:
+        return ""
+    return str(value)
+
+
+def _sanitize_column(values):
+    """열 하나를 값 타입에 맞는 방식으로 정제"""
+    kinds = set(map(type, values))
+    if kinds <= {int, bool}:
+        return values
+    if kinds == {float}:
+        isfinite = math.isfinite
+        return [round(v, 6) if isfinite(v) else 0 for v in values]
+    if kinds == {str}:
+        memo = {}
+        out = []
+        for value in values:
+            cleaned = memo.get(value)
+            if cleaned is None:
+                cleaned = sanitize_string(value)
+                if len(memo) < _MEMO_LIMIT:
+                    memo[value] = cleaned
+            out.append(cleaned)
+        return out
+    return [sanitize_value(v) for v in values]
+
+
+def sanitize_rows(rows, safe_columns=()):
+    """행 목록 정제 → 새 행 목록 (입력은 변경하지 않음)
+
+    모든 행의 키가 같으면 열 단위로 처리해 정수/불리언 열과 safe_columns(주소처럼
+    정제할 문자가 없는 것이 보장된 열)는 그대로 통과시키고, 반복되는 문자열
+    (등급, 이모지 등)은 한 번만 정제한다.
+    """
+    if not rows:
+        return []
+    keys = list(rows[0])
+    key_set = rows[0].keys()
+    if any(row.keys() != key_set for row in rows):
+        return [{key: sanitize_value(value) for key, value in row.items()} for row in rows]
+    columns = [[row[key] for row in rows] for key in keys]
+    columns = [values if key in safe_columns else _sanitize_column(values)
+               for key, values in zip(keys, columns)]
+    return [dict(zip(keys, values)) for values in zip(*columns)]
+
+
+def encode_upload_body(request_data, compression=None):
+    """요청 dict → (전송할 JSON 문자열, 압축 전 바이트 수)
+
+    Apps Script doPost는 본문을 문자열(e.postData.contents)로만 받으므로 gzip 바이트는
+    base64로 감싸 JSON 봉투에 넣는다. 수신 측 계약은 apps-script/Code.gs의
+    decodeUploadBody 참고.
+    """
+    compression = (compression or UPLOAD_COMPRESSION).lower()
+    if compression == 'none':
+        text = json.dumps(request_data, ensure_ascii=True, separators=(',', ':'))
+        return text, len(text)
+
+    raw = json.dumps(request_data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if len(raw) < UPLOAD_COMPRESSION_MIN_BYTES:
+        text = json.dumps(request_data, ensure_ascii=True, separators=(',', ':'))
+        return text, len(text)
+    if compression != 'gzip':
+        raise ValueError(f"지원하지 않는 압축 방식: {compression}")
+    payload = base64.b64encode(gzip.compress(raw, compresslevel=UPLOAD_COMPRESSION_LEVEL, mtime=0))
+    envelope = {
+        'encoding': COMPRESSED_ENCODING,
+        'raw_size': len(raw),
+        'payload': payload.decode('ascii')
+    }
+    return json.dumps(envelope, separators=(',', ':')), len(raw)
+
+
+def decode_upload_body(text):
+    """encode_upload_body의 역변환 (테스트/디버그용)"""
+    data = json.loads(text)
+    if isinstance(data, dict) and data.get('encoding') == COMPRESSED_ENCODING:
+        return json.loads(gzip.decompress(base64.b64decode(data['payload'])).decode('utf-8'))
+    return data
@@ -0,0 +1,219 @@
+# === 지갑 상태 컨테이너 (20바이트 주소 → 정수 id, 컬럼별 타입 배열) ===
+import numpy as np
+
+# 컬럼 이름 → dtype (타임스탬프 0은 "없음")
+WALLET_COLUMNS = {
+    'total_staked': np.float64,
+    'stake_count': np.int32,
+    'unstake_count': np.int32,
+    'is_active': np.bool_,
+    'first_stake_time': np.int64,
+    'last_action_time': np.int64,
+}
+
+
+def address_key(address):
+    """'0x…' 주소 → 20바이트 키"""
+    return bytes.fromhex(address[2:] if address.startswith('0x') else address)
+
+
+def address_hex(key):
+    """20바이트 키 → 소문자 '0x…' 주소"""
+    return '0x' + key.hex()
+
+
+class WalletState:
+    """지갑별 집계 상태를 컬럼 배열로 보관
+
+    지갑 하나에 dict를 두는 대신 주소를 정수 id로 매핑하고 컬럼마다
+    numpy 배열 한 칸씩만 사용한다. 트랜잭션 이력은 이벤트 저장소에 있다.
+    """
+
+    def __init__(self, capacity=1024):
+        self._ids = {}
+        self._keys = []
+        self._columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in WALLET_COLUMNS.items()}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, address):
+        return address_key(address) in self._ids
+
+    def clear(self):
+        """모든 지갑 삭제"""
+        self._ids.clear()
+        self._keys.clear()
+        for column in self._columns.values():
+            column[:] = 0
+
+    # === id ===
+
+    def _grow(self, size):
+        """배열 용량을 size 이상으로 확장 (2배씩)"""
+        capacity = len(self._columns['total_staked'])
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            self._columns[name] = grown
+
+    def id_of(self, address, create=False):
+        """주소 → id (없으면 create=True일 때 새로 할당, 아니면 None)"""
+        key = address_key(address)
+        wallet_id = self._ids.get(key)
+        if wallet_id is None and create:
+            wallet_id = len(self._keys)
+            self._grow(wallet_id + 1)
+            self._ids[key] = wallet_id
+            self._keys.append(key)
+            self._columns['is_active'][wallet_id] = True
+        return wallet_id
+
+    def ids_for(self, addresses):
+        """주소 목록 → id 배열"""
+        ids = self._ids
+        return np.fromiter((ids[address_key(a)] for a in addresses), dtype=np.int64, count=len(addresses))
+
+    def address(self, wallet_id):
+        """id → 주소"""
+        return address_hex(self._keys[wallet_id])
+
+    def addresses(self):
+        """id 순서의 주소 목록"""
+        return [address_hex(key) for key in self._keys]
+
+    # === 갱신 ===
+
+    def record_stake(self, address, amount, timestamp):
+        """스테이킹 반영 → id"""
+        i = self.id_of(address, create=True)
+        c = self._columns
+        c['total_staked'][i] += amount
+        c['stake_count'][i] += 1
+        c['is_active'][i] = True
+        if not c['first_stake_time'][i]:
+            c['first_stake_time'][i] = timestamp or 0
+        c['last_action_time'][i] = timestamp or 0
+        return i
+
+    def record_unstake(self, address, timestamp):
+        """언스테이킹 시도 반영 → id"""
+        i = self.id_of(address, create=True)
+        c = self._columns
+        c['unstake_count'][i] += 1
+        c['is_active'][i] = False
+        c['last_action_time'][i] = timestamp or 0
+        return i
+
+    def truncate(self, count):
+        """id가 count 이상인 지갑 삭제 (가장 최근에 생긴 지갑부터) → 삭제된 주소 목록"""
+        removed = self._keys[count:]
+        if not removed:
+            return []
+        for key in removed:
+            del self._ids[key]
+        del self._keys[count:]
+        for column in self._columns.values():
+            column[count:count + len(removed)] = 0
+        return [address_hex(key) for key in removed]
+
+    def merge(self, keys, columns):
+        """이후 블록 구간만으로 만든 부분 집계(주소 키, 컬럼)를 합침 → 새로 생긴 지갑 수
+
+        샤드 병합용으로 블록 순서대로 호출한다. 합계/횟수는 더하고, 첫 스테이킹 시각은
+        아직 없을 때만 채우며, 마지막 활동 시각과 활성 여부는 그 구간의 마지막 이벤트가
+        정하므로 부분 집계 값으로 덮어쓴다. 새 지갑은 부분 집계의 순서대로 id를 받는다.
+        """
+        before = len(self._keys)
+        ids = np.empty(len(keys), dtype=np.int64)
+        for n, key in enumerate(keys):
+            wallet_id = self._ids.get(key)
+            if wallet_id is None:
+                wallet_id = self._ids[key] = len(self._keys)
+                self._keys.append(key)
+            ids[n] = wallet_id
+        self._grow(len(self._keys))
+
+        n = len(keys)
+        c = self._columns
+        for name in ('total_staked', 'stake_count', 'unstake_count'):
+            c[name][ids] += np.asarray(columns[name][:n], dtype=c[name].dtype)
+        first = c['first_stake_time'][ids]
+        c['first_stake_time'][ids] = np.where(first == 0, np.asarray(columns['first_stake_time'][:n]), first)
+        c['last_action_time'][ids] = columns['last_action_time'][:n]
+        c['is_active'][ids] = columns['is_active'][:n]
+        return len(self._keys) - before
+
+    def set_wallet(self, address, **values):
+        """지갑 값 직접 설정 (백업 복원 등)"""
+        i = self.id_of(address, create=True)
+        for name, value in values.items():
+            self._columns[name][i] = value or 0
+        return i
+
+    # === 조회 ===
+
+    def columns(self, ids=None):
+        """컬럼 배열 (ids를 주면 그 순서로 뽑은 사본, 아니면 id 순서 뷰)"""
+        n = len(self._keys)
+        if ids is None:
+            return {name: column[:n] for name, column in self._columns.items()}
+        return {name: column[ids] for name, column in self._columns.items()}
+
+    def row(self, address):
+        """지갑 하나를 dict로 (없으면 None, 타임스탬프 0은 None)"""
+        i = self.id_of(address)
+        if i is None:
+            return None
+        return self._row(i)
+
+    def _row(self, i):
+        c = self._columns
+        return {
+            'total_staked': float(c['total_staked'][i]),
+            'stake_count': int(c['stake_count'][i]),
+            'unstake_count': int(c['unstake_count'][i]),
+            'is_active': bool(c['is_active'][i]),
+            'first_stake_time': int(c['first_stake_time'][i]) or None,
+            'last_action_time': int(c['last_action_time'][i]) or None,
+        }
+
+    def items(self):
+        """(주소, dict) 순회 (출력/디버그용)"""
+        for i, key in enumerate(self._keys):
+            yield address_hex(key), self._row(i)
+
+    @property
+    def nbytes(self):
+        """컬럼 배열 + 주소 키 메모리 (대략)"""
+        n = len(self._keys)
+        return sum(column[:n].nbytes for column in self._columns.values()) + n * 20
+
+    # === 직렬화 ===
+
+    def to_dict(self):
+        """JSON 저장용 컬럼 dict"""
+        data = {'addresses': self.addresses()}
+        data.update({name: column.tolist() for name, column in self.columns().items()})
+        return data
+
+    def load_dict(self, data):
+        """to_dict() 결과로 교체"""
+        self.load_columns([address_key(a) for a in data['addresses']], data)
+
+    def address_keys(self):
+        """id 순서의 20바이트 주소 키 목록"""
+        return self._keys
+
+    def load_columns(self, keys, columns):
+        """주소 키 목록과 컬럼 배열(또는 리스트)로 교체 (값은 복사)"""
+        self.clear()
+        self._keys = list(keys)
+        self._ids = dict(zip(self._keys, range(len(self._keys))))
+        self._grow(len(self._keys))
+        for name, dtype in WALLET_COLUMNS.items():
+            self._columns[name][:len(self._keys)] = np.asarray(columns[name], dtype=dtype)
@@ -7,6 +7,14 @@ from datetime import datetime, timezone
 import time
 from collections import defaultdict
 import json
+import os
+import sys
+
+# 공용 RPC 전송 계층 (python-scripts/rpc_transport.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'python-scripts'))
+from endpoint_pool import EndpointPool
+from chunk_scanner import scan_range
+from event_store import get_event_store
 
 class STAKETokenTracker:
     def __init__(self):
@@ -20,7 +28,7 @@ class STAKETokenTracker:
             "https://1rpc.io/base",
             "https://base.gateway.tenderly.co"
         ]
-        self.current_rpc = 0
+        self.pool = EndpointPool(self.rpc_urls)
         
         # 컨트랙트 주소
         self.staking_address = "0xBa13ae24684bee910820Be1Fcf52067332F8412f"
@@ -55,27 +63,12 @@ class STAKETokenTracker:
         
         print("✅ 초기화 완료")
     
-    def get_rpc_url(self):
-        """RPC URL 순환"""
-        url = self.rpc_urls[self.current_rpc]
-        self.current_rpc = (self.current_rpc + 1) % len(self.rpc_urls)
-        return url
-    
     def make_rpc_call(self, method, params, retry=3):
         """RPC 호출 (재시도 포함)"""
         for attempt in range(retry):
             try:
-                rpc_url = self.get_rpc_url()
-                payload = {
-                    "jsonrpc": "2.0",
-                    "method": method,
-                    "params": params,
-                    "id": 1
-                }
-                
-                response = requests.post(rpc_url, json=payload, timeout=15)
-                response.raise_for_status()
-                result = response.json()
+                # 상태 점수가 좋은 엔드포인트 우선, 실패 시 다음 엔드포인트로 전환
+                result = self.pool.call(method, params, raise_for_status=True)
                 
                 if 'error' in result:
                     print(f"RPC 오류: {result['error']}")
@@ -272,129 +265,171 @@ class STAKETokenTracker:
                 
             except Exception as e:
                 print(f"❌ {e}")
-            
-            time.sleep(0.3)  # API 제한 고려
         
         print(f"🎯 총 발견: {len(found_transactions)}개 트랜잭션")
         return found_transactions
     
+    def fetch_scan_chunk(self, start_block, end_block):
+        """청크 하나 조회 (워커 스레드) → (로그 수, 트랜잭션 레코드 목록) / RPC 오류 시 None"""
+        result = self.make_rpc_call("eth_getLogs", [{
+            "fromBlock": hex(start_block),
+            "toBlock": hex(end_block),
+            "address": self.staking_address
+        }])
+        
+        if not result or 'result' not in result:
+            return None
+        
+        logs = result['result']
+        records = []
+        
+        # 트랜잭션별 첫 로그 인덱스 (이벤트 저장소 키, stake_leaderboard_system과 같은 기준)
+        log_indexes = {}
+        for log in logs:
+            log_index = int(log.get('logIndex', '0x0'), 16)
+            tx_hash = log['transactionHash']
+            log_indexes[tx_hash] = min(log_index, log_indexes.get(tx_hash, log_index))
+        
+        # 트랜잭션 조회 (로그 순서 유지)
+        tx_hashes = list(log_indexes)
+        
+        for tx_hash in tx_hashes:
+            try:
+                tx_result = self.make_rpc_call("eth_getTransactionByHash", [tx_hash])
+                
+                if not tx_result or 'result' not in tx_result or not tx_result['result']:
+                    continue
+                
+                tx_data = tx_result['result']
+                input_data = tx_data.get('input', '0x')
+                
+                if len(input_data) < 10:
+                    continue
+                
+                # 블록 타임스탬프
+                block_result = self.make_rpc_call("eth_getBlockByNumber", [tx_data['blockNumber'], False])
+                timestamp = 0
+                if block_result and 'result' in block_result and block_result['result']:
+                    timestamp = int(block_result['result']['timestamp'], 16)
+                
+                records.append({
+                    'tx_hash': tx_hash,
+                    'log_index': log_indexes[tx_hash],
+                    'input': input_data,
+                    'from': tx_data['from'].lower(),
+                    'block': int(tx_data['blockNumber'], 16),
+                    'timestamp': timestamp
+                })
+            
+            except Exception as e:
+                continue
+        
+        return len(logs), records
+    
+    def apply_scan_chunk(self, records):
+        """조회된 트랜잭션을 staking_data에 반영 → (stake 수, unstake 수)"""
+        stake_txs = 0
+        unstake_txs = 0
+        events = []
+        
+        for record in records:
+            method_id = record['input'][:10]
+            from_address = record['from']
+            timestamp = record['timestamp']
+            
+            if method_id == self.stake_method_id:
+                # Stake 트랜잭션
+                amount = self.decode_stake_amount(record['input'])
+                
+                self.staking_data[from_address]['total_staked'] += amount
+                self.staking_data[from_address]['stake_count'] += 1
+                self.staking_data[from_address]['is_active'] = True
+                
+                if not self.staking_data[from_address]['first_stake_time']:
+                    self.staking_data[from_address]['first_stake_time'] = timestamp
+                
+                self.staking_data[from_address]['last_action_time'] = timestamp
+                self.staking_data[from_address]['transactions'].append({
+                    'type': 'stake',
+                    'amount': amount,
+                    'timestamp': timestamp,
+                    'block': record['block'],
+                    'tx_hash': record['tx_hash']
+                })
+                
+                events.append({'type': 'stake', 'address': from_address, 'amount': amount,
+                               'block': record['block'], 'log_index': record['log_index'],
+                               'timestamp': timestamp, 'hash': record['tx_hash']})
+                stake_txs += 1
+                
+                date_str = datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%m-%d %H:%M')
+                print(f"     ✅ Stake: {from_address[:8]}... → {amount:.2f} STAKE ({date_str})")
+                
+            elif method_id == self.unstake_method_id:
+                # Unstake 트랜잭션
+                self.staking_data[from_address]['unstake_count'] += 1
+                self.staking_data[from_address]['is_active'] = False
+                self.staking_data[from_address]['last_action_time'] = timestamp
+                self.staking_data[from_address]['transactions'].append({
+                    'type': 'unstake',
+                    'timestamp': timestamp,
+                    'block': record['block'],
+                    'tx_hash': record['tx_hash']
+                })
+                
+                events.append({'type': 'unstake', 'address': from_address,
+                               'block': record['block'], 'log_index': record['log_index'],
+                               'timestamp': timestamp, 'hash': record['tx_hash']})
+                unstake_txs += 1
+                
+                date_str = datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%m-%d %H:%M')
+                print(f"     ❌ Jeet: {from_address[:8]}... ({date_str})")
+        
+        # 원본 이벤트 보존 ((tx_hash, log_index) 키가 stake_leaderboard_system 기록과 일치)
+        get_event_store().add_events(events)
+        return stake_txs, unstake_txs
+    
     def full_scan_from_launch(self, save_to_file=True):
-        """런칭일부터 전체 스캔"""
+        """런칭일부터 전체 스캔 (청크 동시 조회, 블록 순서대로 반영)"""
         print("🚀 런칭일부터 전체 스캔 시작...")
         
         launch_block, latest_block = self.find_launch_block()
-        total_blocks = latest_block - launch_block
+        total_blocks = max(latest_block - launch_block, 1)
         
         print(f"📊 검색 범위: {launch_block:,} → {latest_block:,} ({total_blocks:,}블록)")
         
-        chunk_size = 1000
-        total_stake_txs = 0
-        total_unstake_txs = 0
+        totals = {'stake': 0, 'unstake': 0}
         
-        for start_block in range(launch_block, latest_block + 1, chunk_size):
-            end_block = min(start_block + chunk_size - 1, latest_block)
+        def apply_chunk(start_block, end_block, chunk):
             progress = (start_block - launch_block) / total_blocks * 100
-            
             print(f"\n🔄 진행률 {progress:.1f}% | 블록 {start_block:,} → {end_block:,}")
             
+            if chunk is None:
+                print("   ❌ RPC 오류")
+                return
+            
+            log_count, records = chunk
+            if not log_count:
+                print("   ✅ 활동 없음")
+                return
+            
+            print(f"   📋 {log_count}개 로그 처리 중...")
+            stake_txs, unstake_txs = self.apply_scan_chunk(records)
+            totals['stake'] += stake_txs
+            totals['unstake'] += unstake_txs
+        
+        def fetch_chunk(start_block, end_block):
             try:
-                # 로그 검색
-                result = self.make_rpc_call("eth_getLogs", [{
-                    "fromBlock": hex(start_block),
-                    "toBlock": hex(end_block),
-                    "address": self.staking_address
-                }])
-                
-                if not result or 'result' not in result:
-                    print("   ❌ RPC 오류")
-                    continue
-                
-                logs = result['result']
-                if not logs:
-                    print("   ✅ 활동 없음")
-                    continue
-                
-                print(f"   📋 {len(logs)}개 로그 처리 중...")
-                
-                # 트랜잭션 처리
-                tx_hashes = list(set(log['transactionHash'] for log in logs))
-                
-                for tx_hash in tx_hashes:
-                    try:
-                        tx_result = self.make_rpc_call("eth_getTransactionByHash", [tx_hash])
-                        
-                        if not tx_result or 'result' not in tx_result or not tx_result['result']:
-                            continue
-                        
-                        tx_data = tx_result['result']
-                        input_data = tx_data.get('input', '0x')
-                        
-                        if len(input_data) < 10:
-                            continue
-                        
-                        method_id = input_data[:10]
-                        from_address = tx_data['from'].lower()
-                        
-                        # 블록 타임스탬프
-                        block_result = self.make_rpc_call("eth_getBlockByNumber", [tx_data['blockNumber'], False])
-                        timestamp = 0
-                        if block_result and 'result' in block_result and block_result['result']:
-                            timestamp = int(block_result['result']['timestamp'], 16)
-                        
-                        # 트랜잭션 처리
-                        if method_id == self.stake_method_id:
-                            # Stake 트랜잭션
-                            amount = self.decode_stake_amount(input_data)
-                            
-                            self.staking_data[from_address]['total_staked'] += amount
-                            self.staking_data[from_address]['stake_count'] += 1
-                            self.staking_data[from_address]['is_active'] = True
-                            
-                            if not self.staking_data[from_address]['first_stake_time']:
-                                self.staking_data[from_address]['first_stake_time'] = timestamp
-                            
-                            self.staking_data[from_address]['last_action_time'] = timestamp
-                            self.staking_data[from_address]['transactions'].append({
-                                'type': 'stake',
-                                'amount': amount,
-                                'timestamp': timestamp,
-                                'block': int(tx_data['blockNumber'], 16),
-                                'tx_hash': tx_hash
-                            })
-                            
-                            total_stake_txs += 1
-                            
-                            date_str = datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%m-%d %H:%M')
-                            print(f"     ✅ Stake: {from_address[:8]}... → {amount:.2f} STAKE ({date_str})")
-                            
-                        elif method_id == self.unstake_method_id:
-                            # Unstake 트랜잭션
-                            self.staking_data[from_address]['unstake_count'] += 1
-                            self.staking_data[from_address]['is_active'] = False
-                            self.staking_data[from_address]['last_action_time'] = timestamp
-                            self.staking_data[from_address]['transactions'].append({
-                                'type': 'unstake',
-                                'timestamp': timestamp,
-                                'block': int(tx_data['blockNumber'], 16),
-                                'tx_hash': tx_hash
-                            })
-                            
-                            total_unstake_txs += 1
-                            
-                            date_str = datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%m-%d %H:%M')
-                            print(f"     ❌ Jeet: {from_address[:8]}... ({date_str})")
-                    
-                    except Exception as e:
-                        continue
-                
+                return self.fetch_scan_chunk(start_block, end_block)
             except Exception as e:
                 print(f"   ❌ 블록 스캔 오류: {e}")
-            
-            time.sleep(0.5)
+                return None
+        
+        scan_range(launch_block, latest_block, fetch_chunk, apply_chunk, chunk_size=1000)
         
         print(f"\n🎉 스캔 완료!")
-        print(f"   총 Stake 트랜잭션: {total_stake_txs:,}개")
-        print(f"   총 Unstake 트랜잭션: {total_unstake_txs:,}개")
+        print(f"   총 Stake 트랜잭션: {totals['stake']:,}개")
+        print(f"   총 Unstake 트랜잭션: {totals['unstake']:,}개")
         print(f"   고유 지갑 수: {len(self.staking_data):,}개")
         
         if save_to_file:
@@ -0,0 +1,5 @@
+# python-scripts의 모듈은 같은 디렉토리 기준으로 서로 import하므로 경로에 추가
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'python-scripts'))
@@ -0,0 +1,112 @@
+import random
+
+from ranking import RANKING_CHANGE_SECONDS, RANKING_SNAPSHOT_SECONDS, RankingEngine
+
+START = 1_748_000_000
+
+
+def random_wallets(rng, count):
+    return {f"0x{rng.getrandbits(160):040x}": (rng.choice([0.0, rng.uniform(1, 1e6)]),
+                                              START + rng.randrange(0, 90 * 86400))
+            for _ in range(count)}
+
+
+def rebuilt(wallets, now):
+    engine = RankingEngine()
+    engine.rebuild(wallets, now)
+    return engine
+
+
+def test_update_matches_rebuild_after_random_changes():
+    rng = random.Random(7)
+    wallets = random_wallets(rng, 2000)
+    now = START + 100 * 86400
+    engine = rebuilt(wallets, now)
+
+    for _ in range(30):
+        now += rng.randrange(60, 6 * 3600)
+        changes = {}
+        # 기존 지갑 수량 변경/제거 + 신규 지갑
+        for address in rng.sample(sorted(wallets), 25):
+            staked, first = wallets[address]
+            changes[address] = (0.0 if rng.random() < 0.2 else staked + rng.uniform(1, 1e5), first or now)
+        changes.update({f"0x{rng.getrandbits(160):040x}": (rng.uniform(1, 1e6), now) for _ in range(10)})
+        wallets.update(changes)
+
+        previous = engine.order[:]
+        deltas = engine.update(changes, now)
+        expected = rebuilt(wallets, now).order
+        assert engine.order == expected
+
+        for address, (old, new) in deltas.items():
+            assert old == (previous.index(address) + 1 if address in previous else None)
+            assert new == (expected.index(address) + 1 if address in expected else None)
+
+
+def test_update_after_long_gap_matches_rebuild():
+    rng = random.Random(11)
+    wallets = random_wallets(rng, 500)
+    engine = rebuilt(wallets, START + 10 * 86400)
+    # 교환이 많아 전체 재정렬로 넘어가는 경우
+    now = START + 400 * 86400
+    engine.update({}, now)
+    assert engine.order == rebuilt(wallets, now).order
+
+
+def test_save_load_round_trip(tmp_path):
+    rng = random.Random(3)
+    wallets = random_wallets(rng, 300)
+    now = START + 50 * 86400
+    engine = rebuilt(wallets, now)
+    engine.record_snapshot(now)
+    path = tmp_path / 'ranking_state.json'
+    engine.save(path)
+
+    loaded = RankingEngine.load(path)
+    later = now + 3 * 86400
+    changes = {address: (1e7, now) for address in rng.sample(sorted(wallets), 5)}
+    wallets.update(changes)
+    assert loaded.update(changes, later) == engine.update(changes, later)
+    assert loaded.order == engine.order == rebuilt(wallets, later).order
+    assert loaded.snapshots == engine.snapshots
+
+
+def test_changes_compare_against_snapshot_about_a_day_old():
+    rng = random.Random(5)
+    wallets = random_wallets(rng, 200)
+    now = START + 30 * 86400
+    engine = rebuilt(wallets, now)
+    snapshots = {}
+    # 1시간마다 실행, 스냅샷은 RANKING_SNAPSHOT_SECONDS마다
+    for hour in range(60):
+        t = now + hour * 3600
+        changes = {address: (wallets[address][0] + rng.uniform(1, 1e6), wallets[address][1])
+                   for address in rng.sample(sorted(wallets), 5)}
+        if hour % 7 == 0:
+            changes[f"0x{rng.getrandbits(160):040x}"] = (rng.uniform(1, 1e6), t)
+        wallets.update(changes)
+        engine.update(changes, t)
+        if engine.record_snapshot(t):
+            snapshots[t] = {address: (i, engine.score(address, t)) for i, address in enumerate(engine.order, 1)}
+
+        old = [s for s in snapshots if t - s >= RANKING_CHANGE_SECONDS]
+        if not old:
+            # 하루 이상 지난 스냅샷이 아직 없으면 변동 0
+            assert engine.reference_snapshot(t) is None
+            assert engine.change_of(engine.order[0], 1, t) == (0, 0.0)
+            continue
+        reference = snapshots[max(old)]
+        assert engine.reference_snapshot(t)['as_of'] == max(old)
+        assert RANKING_CHANGE_SECONDS <= t - max(old) < RANKING_CHANGE_SECONDS + RANKING_SNAPSHOT_SECONDS
+        latest = snapshots[max(snapshots)]
+        for rank, address in enumerate(engine.order, 1):
+            if address in reference:
+                # 점수 변동은 최신 스냅샷 기준이라 실행마다가 아니라 스냅샷마다 바뀜
+                score_change = latest[address][1] - reference[address][1] if address in latest else 0.0
+                expected = (reference[address][0] - rank, score_change)
+            else:
+                expected = (0, 0.0)
+            assert engine.change_of(address, rank, t) == expected
+
+    # 비교 대상보다 오래된 스냅샷은 정리됨
+    assert len(engine.snapshots) <= RANKING_CHANGE_SECONDS // RANKING_SNAPSHOT_SECONDS + 2
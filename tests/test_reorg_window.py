@@ -0,0 +1,127 @@
+import json
+import random
+
+from reorg_window import TentativeWindow
+from wallet_state import WalletState
+
+HEAD = 200
+DEPTH = 12
+
+
+class Chain:
+    """블록 해시만 흉내 내는 체인 (fork 이후 블록은 해시가 바뀜)"""
+
+    def __init__(self):
+        self.salt = {}
+
+    def fork(self, from_block):
+        for block in range(from_block, HEAD + 1):
+            self.salt[block] = self.salt.get(block, 0) + 1
+
+    def block_hash(self, block):
+        return f"0x{block:08x}{self.salt.get(block, 0):04x}"
+
+    def fetch_hashes(self, blocks):
+        return {block: self.block_hash(block) for block in blocks}
+
+
+def make_events(chain, seed=1):
+    rng = random.Random(seed)
+    addresses = [f"0x{rng.getrandbits(160):040x}" for _ in range(30)]
+    events = []
+    for block in sorted(rng.sample(range(100, HEAD + 1), 60)):
+        for _ in range(rng.randrange(1, 4)):
+            stake = rng.random() < 0.75
+            events.append({
+                'type': 'stake' if stake else 'unstake',
+                # 미확정 구간에서 처음 나타나는 지갑도 섞이도록
+                'address': rng.choice(addresses[:20] if block <= HEAD - DEPTH else addresses),
+                'amount': rng.uniform(1, 100) if stake else 0,
+                'block': block,
+                'block_hash': chain.block_hash(block),
+                'timestamp': 1_748_250_000 + 2 * block
+            })
+    return events
+
+
+def apply(state, event, window=None):
+    if window is not None:
+        window.record(event, state)
+    if event['type'] == 'stake':
+        state.record_stake(event['address'], event['amount'], event['timestamp'])
+    else:
+        state.record_unstake(event['address'], event['timestamp'])
+
+
+def scan(chain, events):
+    """확정 구간은 기록 없이, 미확정 구간은 기록하며 적용"""
+    state = WalletState()
+    window = TentativeWindow(DEPTH)
+    for event in events:
+        if event['block'] <= HEAD - DEPTH:
+            apply(state, event)
+    window.begin(HEAD, chain.fetch_hashes)
+    for event in events:
+        if event['block'] > HEAD - DEPTH:
+            apply(state, event, window)
+    return state, window
+
+
+def state_before(events, block):
+    state = WalletState()
+    for event in events:
+        if event['block'] < block:
+            apply(state, event)
+    return state
+
+
+def test_unchanged_chain_needs_no_rollback():
+    chain = Chain()
+    _, window = scan(chain, make_events(chain))
+    assert window.validate(chain.fetch_hashes) is None
+
+
+def test_rollback_restores_state_before_reorged_blocks():
+    chain = Chain()
+    events = make_events(chain)
+    state, window = scan(chain, events)
+    tentative_blocks = sorted({e['block'] for e in events if e['block'] > HEAD - DEPTH})
+    fork_block = tentative_blocks[len(tentative_blocks) // 2]
+
+    chain.fork(fork_block)
+    resume = window.validate(chain.fetch_hashes)
+    # 해시가 그대로인 마지막 이벤트 블록 다음부터 다시 스캔
+    assert resume == max(b for b in tentative_blocks if b < fork_block) + 1
+
+    touched = window.rollback(resume, state)
+    expected = state_before(events, resume)
+    assert state.to_dict() == expected.to_dict()
+    assert touched == {e['address'] for e in events if e['block'] >= resume}
+    assert window.head == resume - 1
+
+
+def test_rollback_after_snapshot_round_trip():
+    # 윈도우는 스냅샷 메타(JSON)에 저장됐다가 다음 실행에서 로드된다
+    chain = Chain()
+    events = make_events(chain, seed=2)
+    state, window = scan(chain, events)
+    restored = TentativeWindow(DEPTH)
+    restored.load(json.loads(json.dumps(window.to_dict())))
+
+    chain.fork(HEAD - DEPTH + 1)
+    resume = restored.validate(chain.fetch_hashes)
+    assert resume == HEAD - DEPTH + 1
+    restored.rollback(resume, state)
+    assert state.to_dict() == state_before(events, resume).to_dict()
+
+
+def test_reorg_deeper_than_window_rolls_back_whole_window():
+    chain = Chain()
+    events = make_events(chain, seed=3)
+    state, window = scan(chain, events)
+
+    chain.fork(HEAD - DEPTH - 5)
+    resume = window.validate(chain.fetch_hashes)
+    assert resume == HEAD - DEPTH + 1
+    window.rollback(resume, state)
+    assert state.to_dict() == state_before(events, resume).to_dict()
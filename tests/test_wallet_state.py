@@ -0,0 +1,81 @@
+import random
+
+import numpy as np
+
+from shard_scan import plan_shards
+from wallet_state import WalletState
+
+GENESIS = 31_502_159
+
+
+def fixed_events(seed=1, count=3000):
+    """블록 순서의 stake/unstake 이벤트 (일부 주소에 몰리도록)"""
+    rng = random.Random(seed)
+    addresses = [f"0x{rng.getrandbits(160):040x}" for _ in range(150)]
+    events = []
+    block = GENESIS
+    for _ in range(count):
+        block += rng.randrange(1, 40)
+        address = rng.choice(addresses[:20]) if rng.random() < 0.5 else rng.choice(addresses)
+        stake = rng.random() < 0.8
+        events.append({
+            'type': 'stake' if stake else 'unstake',
+            'address': address,
+            'amount': rng.uniform(0.1, 1000) if stake else 0,
+            'block': block,
+            'timestamp': 1_748_250_000 + 2 * (block - GENESIS)
+        })
+    return events
+
+
+def apply(state, events):
+    for event in events:
+        if event['type'] == 'stake':
+            state.record_stake(event['address'], event['amount'], event['timestamp'])
+        else:
+            state.record_unstake(event['address'], event['timestamp'])
+    return state
+
+
+def assert_same_state(actual, expected):
+    assert actual.addresses() == expected.addresses()
+    for name, column in expected.columns().items():
+        np.testing.assert_allclose(actual.columns()[name], column, err_msg=name)
+
+
+def test_sharded_merge_matches_single_pass():
+    events = fixed_events()
+    expected = apply(WalletState(), events)
+
+    merged = WalletState()
+    shards = plan_shards(GENESIS, events[-1]['block'], 7, min_blocks=1)
+    assert len(shards) == 7
+    for start, end in shards:
+        partial = apply(WalletState(), [e for e in events if start <= e['block'] <= end])
+        merged.merge(partial.address_keys(), partial.columns())
+
+    assert_same_state(merged, expected)
+
+
+def test_merge_onto_restored_state():
+    # 중단된 전체 스캔을 이어서 할 때: 복원된 상태 위에 이후 구간 샤드를 병합
+    events = fixed_events(seed=2)
+    expected = apply(WalletState(), events)
+    split = events[len(events) // 3]['block']
+
+    state = apply(WalletState(), [e for e in events if e['block'] < split])
+    for start, end in plan_shards(split, events[-1]['block'], 4, min_blocks=1):
+        partial = apply(WalletState(), [e for e in events if start <= e['block'] <= end])
+        added = len(set(partial.addresses()) - set(state.addresses()))
+        assert state.merge(partial.address_keys(), partial.columns()) == added
+
+    assert_same_state(state, expected)
+
+
+def test_empty_shard_merge_is_noop():
+    events = fixed_events(seed=3, count=200)
+    state = apply(WalletState(), events)
+    before = state.to_dict()
+    empty = WalletState()
+    assert state.merge(empty.address_keys(), empty.columns()) == 0
+    assert state.to_dict() == before